@@ -4,6 +4,11 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
 import arxiv_bot as ab
+import arxiv_lib as al
+import update_dispatcher as ud
+import log_writer as lw
+import validator_store as vs
+import send_queue as sq
 import yaml
 import datetime
 from telepot.loop import MessageLoop
@@ -13,13 +18,73 @@ with open(os.path.join('Data','bot_details.yaml'), 'r') as file_input:
 
 # Set up the ArXivBot
 
-bot = ab.ArxivBot(detail['token'], detail['database_name'], detail['database_user'], detail['database_password'])
+bot = ab.ArxivBot(detail['token'], detail['database_name'], detail['database_user'], detail['database_password'],
+				  db_min_connections = detail.get('database_min_connections', 1),
+				  db_max_connections = detail.get('database_max_connections', 10))
 bot.set_email_feedback(detail['email'])
 
-# Start running the service
+# The links can point to a local stand-in of the arXiv (see benchmarks/arxiv_stand_in.py)
+
+bot.arxiv_search_link = detail.get('arxiv_search_link', bot.arxiv_search_link)
+bot.arxiv_rss_link = detail.get('arxiv_rss_link', bot.arxiv_rss_link)
+
+if 'arxiv_fair_time' in detail:
+	bot.arxiv_fair_time = detail['arxiv_fair_time']
+	al.RATE_LIMITER.set_interval(bot.arxiv_fair_time)
+
+bot.set_log_writer(lw.BatchLogWriter(bot.database_pool,
+									  batch_size = detail.get('log_batch_size', 100),
+									  flush_interval = detail.get('log_flush_interval', 2.),
+									  max_queued_rows = detail.get('log_max_queued_rows', 10000),
+									  overflow_policy = detail.get('log_overflow_policy', 'drop')))
+
+bot.set_send_queue(sq.SendQueue(bot.send_directly,
+								global_interval = 1. / detail.get('telegram_messages_per_second', 30),
+								chat_interval = 1. / detail.get('telegram_chat_messages_per_second', 1),
+								number_workers = detail.get('send_workers', 4),
+								error_function = bot.handle_send_error))
+
+if 'feed_validators_file' in detail:
+	bot.set_validator_store(vs.ValidatorStore(detail['feed_validators_file']))
+
+al.USE_STREAMING_PARSER = detail.get('feed_parser', 'streaming') == 'streaming'
+
+if detail.get('preload_preferences', False):
+	bot.load_preferences()
+
+if detail.get('preference_notifications', False):
+	bot.listen_to_preference_changes()
+
+if detail.get('warm_feeds', False):
+	bot.start_warming_feeds(delay = detail.get('warm_feeds_delay', 300),
+							usage_days = detail.get('warm_feeds_usage_days', 7),
+							max_categories = detail.get('warm_feeds_max_categories', None))
+
+if detail.get('daily_digest', False):
+	bot.digest_batch_size = detail.get('daily_digest_batch_size', 100)
+	bot.start_daily_digest(delay = detail.get('daily_digest_delay', 900),
+						   retry_time = detail.get('daily_digest_retry_time', 600))
+
+if 'search_cache_megabytes' in detail:
+	bot.search_cache.set_limits(bot.search_cache.max_entries, max_bytes = detail['search_cache_megabytes'] * 1024 * 1024)
+
+# Start running the service (the messages are handled one at a time, unless the update_mode is 'threaded')
+
+dispatcher = None
+
+if detail.get('update_mode', 'serial') == 'threaded':
+	dispatcher = ud.UpdateDispatcher(bot.handle_and_report,
+									 bot.update_chat_identity,
+									 number_workers = detail.get('number_workers', 8),
+									 max_queued_updates = detail.get('max_queued_updates', 1000),
+									 serialize_per_chat = detail.get('serialize_per_chat', True))
+	dispatcher.start()
+	message_loop = MessageLoop(bot, dispatcher.submit)
+else:
+	message_loop = MessageLoop(bot)
 
 try:
-	MessageLoop(bot).run_forever()
+	message_loop.run_forever()
 except:
 	error_time = datetime.datetime.utcnow()
 	error_time_string = error_time.strftime("%d %b %Y %H:%M:%S")
@@ -27,4 +92,9 @@ except:
 	message_on_stdout = 'Error occurred during message_loop.\n' + error_time_string + ' - ' + exception_type.__name__ + ' - ' + str(exception_description)
 	print message_on_stdout
 
+if dispatcher != None:
+	dispatcher.stop(timeout = 30)
+
+bot.close()
+
 del bot
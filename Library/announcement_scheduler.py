@@ -0,0 +1,206 @@
+import datetime as dt
+import threading
+import sys
+import arxiv_lib as al
+
+## @package Library.announcement_scheduler
+#  Micro-library implementing the warm-up of the feed cache after each announcement of the arXiv.
+#
+#  Soon after an announcement, the users ask for the new submissions of their favourite
+#  categories, and the first user of each category waits for the download of the feed.
+#  The scheduler defined here wakes up a few minutes after each announcement, and loads
+#  the feeds of the categories which are going to be requested (the most used first), so
+#  that the users find them in the cache. The feeds are loaded one at a time, so that the
+#  requests respect the fair-use policy of the arXiv (see @ref arxiv_lib.RATE_LIMITER).
+
+## This class runs the warm-up of the feeds in a background thread, after each announcement of the arXiv.
+#
+#  The categories are given by the category_function (a function with no arguments returning the
+#  list of categories, ordered by importance), and each of them is loaded with the warm_function.
+#  The report of each warm-up (when it started, how long it took, and which categories failed) is
+#  kept in the scheduler, and passed to the report_function. The same scheduler is used to send
+#  the daily digest to the subscribers, with a warm_function broadcasting the feed of each category.
+#
+#  If a retry_time is given, the failed categories are tried again every retry_time seconds, until
+#  they succeed or the next warm-up comes (for example, when the arXiv is late with the new feeds).
+class AnnouncementScheduler(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param category_function The function returning the list of categories to load
+	#  @param warm_function The function called with each category to load its feed
+	#  @param delay The number of seconds to wait after the announcement (optional, default is 300)
+	#  @param report_function The function called with the report of each warm-up (optional, default is None)
+	#  @param clock A function returning the current UTC time (optional, default is datetime.utcnow)
+	#  @param retry_time The number of seconds before trying the failed categories again (optional, default is None, no retry)
+	def __init__(self, category_function, warm_function, delay = 300, report_function = None, clock = dt.datetime.utcnow, retry_time = None):
+
+		if delay < 0:
+			raise ValueError('The delay after the announcement cannot be negative.')
+
+		if retry_time != None and retry_time <= 0:
+			raise ValueError('The time before retrying the failed categories has to be positive.')
+
+		## The function returning the list of categories to load
+		self.category_function = category_function
+
+		## The function called with each category to load its feed
+		self.warm_function = warm_function
+
+		## The number of seconds to wait after the announcement
+		self.delay = delay
+
+		## The function called with the report of each warm-up
+		self.report_function = report_function
+
+		## The function returning the current UTC time
+		self.clock = clock
+
+		## The number of seconds before trying the failed categories again (None if they are not tried again)
+		self.retry_time = retry_time
+
+		## The report of the last warm-up (None if no warm-up has been done)
+		self.last_report = None
+
+		## The number of warm-ups done
+		self.warm_ups = 0
+
+		self.stopping = threading.Event()
+		self.scheduler_thread = None
+
+	## This method starts the background thread.
+	#
+	#  @param self The object pointer
+	#  @param run_now Whether to run a warm-up straight away, before waiting for the next announcement (optional, default is False)
+	def start(self, run_now = False):
+
+		if self.scheduler_thread != None:
+			return None
+
+		self.stopping.clear()
+		self.scheduler_thread = threading.Thread(target = self.work, args = (run_now,), name = 'AnnouncementScheduler')
+		self.scheduler_thread.daemon = True
+		self.scheduler_thread.start()
+
+	## This method stops the background thread (a warm-up in progress is interrupted after the current category).
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait for the background thread (optional, default is None, no limit)
+	def stop(self, timeout = None):
+
+		self.stopping.set()
+
+		if self.scheduler_thread != None:
+			self.scheduler_thread.join(timeout)
+			self.scheduler_thread = None
+
+	## This method returns the UTC time of the next warm-up.
+	#
+	#  @param self The object pointer
+	#  @param utc_time A datetime object with the UTC time
+	def next_warm_up_time(self, utc_time):
+
+		delay = dt.timedelta(seconds = self.delay)
+
+		return al.next_announcement_time(utc_time - delay) + delay
+
+	## This method is run by the background thread, and waits for the next announcement until the scheduler is stopped.
+	#
+	#  @param self The object pointer
+	#  @param run_now Whether to run a warm-up before waiting for the next announcement (optional, default is False)
+	def work(self, run_now = False):
+
+		if run_now:
+			self.warm_up_with_retries()
+
+		while not self.stopping.is_set():
+			now = self.clock()
+			waiting_time = (self.next_warm_up_time(now) - now).total_seconds()
+			if self.stopping.wait(waiting_time):
+				return None
+			self.warm_up_with_retries()
+
+	## This method runs a warm-up, and tries the failed categories again until the next warm-up (if a retry_time is given).
+	#
+	#  The method returns the report of the last attempt.
+	#
+	#  @param self The object pointer
+	def warm_up_with_retries(self):
+
+		report = self.warm_up()
+
+		if self.retry_time == None:
+			return report
+
+		next_warm_up = self.next_warm_up_time(self.clock())
+		retry_delay = dt.timedelta(seconds = self.retry_time)
+
+		while len(report['failed_categories']) > 0 and self.clock() + retry_delay < next_warm_up:
+			if self.stopping.wait(self.retry_time):
+				break
+			# If the list of categories could not be obtained, all of them are tried again
+			failed_categories = report['failed_categories']
+			report = self.warm_up(None if None in failed_categories else sorted(failed_categories))
+
+		return report
+
+	## This method loads the feeds of the categories, and returns the report of the warm-up.
+	#
+	#  The report is a dictionary with the start_time, the duration (in seconds), the list of loaded
+	#  categories, and the dictionary of failed categories in the form {category : error}.
+	#
+	#  @param self The object pointer
+	#  @param categories The list of categories to load (optional, default is None, the ones given by the category_function)
+	def warm_up(self, categories = None):
+
+		start_time = self.clock()
+		loaded_categories = []
+		failed_categories = {}
+
+		try:
+			if categories == None:
+				categories = self.category_function()
+		except:
+			exception_type, exception_description, traceback = sys.exc_info()
+			categories = []
+			failed_categories[None] = exception_type.__name__ + ' - ' + str(exception_description)
+
+		for category in categories:
+			if self.stopping.is_set():
+				break
+			try:
+				self.warm_function(category)
+			except:
+				exception_type, exception_description, traceback = sys.exc_info()
+				failed_categories[category] = exception_type.__name__ + ' - ' + str(exception_description)
+			else:
+				loaded_categories.append(category)
+
+		report = {'start_time' : start_time,
+				  'duration' : (self.clock() - start_time).total_seconds(),
+				  'loaded_categories' : loaded_categories,
+				  'failed_categories' : failed_categories}
+
+		self.last_report = report
+		self.warm_ups += 1
+
+		if self.report_function != None:
+			self.report_function(report)
+
+		return report
+
+## This function prints on the stdout the report of a warm-up.
+#
+#  @param report The dictionary returned by @ref AnnouncementScheduler.warm_up
+#  @param task The name of the task in the report (optional, default is 'Warm-up')
+def print_warm_up_report(report, task = 'Warm-up'):
+
+	start_time_string = report['start_time'].strftime("%d %b %Y %H:%M:%S")
+	message_on_stdout = (task + ' of ' + str(len(report['loaded_categories'])) + ' feeds.\n' + start_time_string +
+						 ' - ' + str(report['duration']) + ' seconds - ' + str(len(report['failed_categories'])) + ' failed')
+
+	for category, error in sorted(report['failed_categories'].iteritems()):
+		message_on_stdout += '\n' + str(category) + ' - ' + error
+
+	print message_on_stdout
@@ -1,13 +1,19 @@
 import telepot
 import requests
 import datetime
-import time
 import sys
 import random
 import psycopg2
 import arxiv_lib as al
+import arxiv_cache as ac
+import database_pool as dp
+import log_writer as lw
+import validator_store as vs
+import announcement_scheduler as asch
 import emoji_detect as emjd
-from customised_exceptions import NoArgumentError, GetRequestError, UnknownError, NoCategoryError
+import send_queue as sq
+import message_packing as mp
+from customised_exceptions import NoArgumentError, GetRequestError, UnknownError, NoCategoryError, StaleFeedError
 from telepot.namedtuple import InlineKeyboardMarkup, InlineKeyboardButton
 
 ## @package Library.arxiv_bot
@@ -24,7 +30,7 @@ from telepot.namedtuple import InlineKeyboardMarkup, InlineKeyboardButton
 class ArxivBot(telepot.Bot):
 
 	## Class constructor
-	def __init__(self, token, db_name, db_user, db_password):
+	def __init__(self, token, db_name, db_user, db_password, db_min_connections = 1, db_max_connections = 10):
 
 		super(ArxivBot, self).__init__(token)
 
@@ -40,6 +46,9 @@ class ArxivBot(telepot.Bot):
 		## The maximum number of results shown from a search using API
 		self.max_api_result_number = 10
 
+		## The number of results downloaded at once from the API, and then shown in pages (a multiple of max_api_result_number)
+		self.api_prefetch_window = 50
+
 		## The maximum number of keywords used in a search
 		self.max_number_keywords = 10
 
@@ -49,8 +58,15 @@ class ArxivBot(telepot.Bot):
 		## The maximum number of characters in a single Telegram message
 		self.max_characters_chat = 4096
 
-		## The number of seconds to wait after using the API (set by arXiv)
+		## The number of seconds to wait between two requests to the same arXiv host (set by arXiv)
 		self.arxiv_fair_time = 3
+		al.RATE_LIMITER.set_interval(self.arxiv_fair_time)
+
+		## The cache of the RSS feeds (shared among all the users)
+		self.feed_cache = ac.FEED_CACHE
+
+		## The cache of the API searches, used when moving between the pages of results (shared among all the users)
+		self.search_cache = ac.SEARCH_CACHE
 
 		## The name of the PostgreSQL database
 		self.database_name = db_name
@@ -61,12 +77,45 @@ class ArxivBot(telepot.Bot):
 		## The password of the PostgreSQL database
 		self.database_password = db_password
 
+		## The pool of connections to the PostgreSQL database (shared by all the threads handling the messages)
+		self.database_pool = dp.DatabasePool({'dbname' : db_name, 'user' : db_user, 'password' : db_password},
+											 min_connections = db_min_connections,
+											 max_connections = db_max_connections)
+
+		## The writer saving the chat and error logs into the database in the background
+		self.log_writer = lw.BatchLogWriter(self.database_pool)
+
+		## The cache of the favourite categories of the users (written together with the database)
+		self.preference_cache = ac.PreferenceCache()
+
+		## The database channel on which the changes of preferences are notified to the other processes (None if not used)
+		self.preference_channel = None
+
+		## The listener receiving the changes of preferences made by the other processes
+		self.preference_listener = None
+
+		## The HTTP session used for the requests to the arXiv (keeps the connections open between requests)
+		self.arxiv_session = al.create_session()
+
+		## The store of the validators of the RSS feeds, used to make conditional requests to the arXiv
+		self.validator_store = vs.ValidatorStore()
+
+		## The scheduler loading the feeds after each announcement (None if not used)
+		self.announcement_scheduler = None
+
+		## The scheduler sending the daily digest after each announcement (None if not used)
+		self.digest_scheduler = None
+
+		## The number of subscribers to whom the daily digest is sent before saving the progress of the broadcast
+		self.digest_batch_size = 100
+
+		## The queue of the messages sent to Telegram, which respects the global and per-chat limits
+		self.send_queue = sq.SendQueue(self.send_directly, error_function = self.handle_send_error)
+
 	## Class destructor
 	def __del__(self):
 
-		super(ArxivBot, self).__del__()
-
-		self.close_connection_with_database()
+		self.close()
 
 	## This method allows for the injection of the email address for the feedbacks
 	#
@@ -77,6 +126,36 @@ class ArxivBot(telepot.Bot):
 		## The email address for the feedbacks
 		self.feedback_address = email_address
 
+	## This method allows for the injection of the writer used for the chat and error logs
+	#
+	#  @param self The object pointer
+	#  @param log_writer The log_writer.BatchLogWriter object
+	def set_log_writer(self, log_writer):
+
+		self.log_writer.close()
+
+		self.log_writer = log_writer
+
+	## This method allows for the injection of the queue used for the messages sent to Telegram
+	#
+	#  @param self The object pointer
+	#  @param send_queue The send_queue.SendQueue object (its send_function should be @ref send_directly)
+	def set_send_queue(self, send_queue):
+
+		self.send_queue.close()
+
+		self.send_queue = send_queue
+
+	## This method allows for the injection of the store used for the conditional requests of the RSS feeds
+	#
+	#  @param self The object pointer
+	#  @param validator_store The validator_store.ValidatorStore object
+	def set_validator_store(self, validator_store):
+
+		self.validator_store.close()
+
+		self.validator_store = validator_store
+
 	## This method receives the message sent by the user and processes it depending on the different "flavour" associated to it.
 	#
 	#  **NOTE**: Most of the "flavours" are not implemented yet. Some might be implemented in the future.
@@ -98,13 +177,51 @@ class ArxivBot(telepot.Bot):
 		else:
 			raise telepot.BadFlavor(msg)
 
+	## This method handles the message, and is used by the worker threads of the update_dispatcher.UpdateDispatcher.
+	#
+	#  Since the message is handled in a separate thread, any error is printed on the stdout, and then
+	#  raised again so that the dispatcher counts it among its failures (the worker is not stopped).
+	#
+	#  @param self The object pointer
+	#  @param msg The message received from the user
+	def handle_and_report(self, msg):
+
+		try:
+			self.handle(msg)
+		except:
+			error_time = datetime.datetime.utcnow()
+			error_time_string = error_time.strftime("%d %b %Y %H:%M:%S")
+			exception_type, exception_description, traceback = sys.exc_info()
+			message_on_stdout = 'Error occurred while handling a message.\n' + error_time_string + ' - ' + exception_type.__name__ + ' - ' + str(exception_description)
+			print message_on_stdout
+			raise
+
+	## This method returns the identity of the chat a message comes from (or None if it cannot be found).
+	#
+	#  The identity is used by the update_dispatcher.UpdateDispatcher to handle in order the messages of the same chat.
+	#
+	#  @param self The object pointer
+	#  @param msg The message received from the user
+	def update_chat_identity(self, msg):
+
+		try:
+			if telepot.flavor(msg) == 'callback_query' and 'message' in msg:
+				return msg['message']['chat']['id']
+			if telepot.flavor(msg) == 'chat':
+				return msg['chat']['id']
+			return msg['from']['id']
+		except:
+			return None
+
 	## This method is called by the @ref handle method when the "flavour" of the message is 'chat'.
 	#
-	#  The user is allowed to send four different commands:
+	#  The user is allowed to send seven different commands:
 	#
 	#  - `/search` : perform a simple search in the arXiv
 	#  - `/today` : search the papers of the day in a given category of the arXiv
 	#  - `/set` : set the category where to search for the new submission
+	#  - `/subscribe` : receive every day the new submissions to the favourite category
+	#  - `/unsubscribe` : stop receiving the daily submissions
 	#  - `/feedback` : the user can use the command to send a feedback
 	#  - `/help` : send an help message to the user
 	#
@@ -149,6 +266,10 @@ class ArxivBot(telepot.Bot):
 		elif command == '/today' and len(text_message_list) == 2:
 			command_argument = text_message_list[1]
 			self.do_today_search( command_argument , chat_id )
+		elif command == '/subscribe' and len(text_message_list) == 1:
+			self.set_subscription( True, chat_id )
+		elif command == '/unsubscribe' and len(text_message_list) == 1:
+			self.set_subscription( False, chat_id )
 		elif command == '/feedback':
 			command_argument = text_message_list[1:]
 			self.give_feedback( command_argument, chat_id )
@@ -213,7 +334,8 @@ class ArxivBot(telepot.Bot):
 	#  the website, parses the results, and sends them to the user.
 	#
 	#  **NOTE**: No more than 10 results are shown due to the limitations on the screen of mobile phones.
-	#  The user can nevertheless view more results using the next button.
+	#  The user can nevertheless view more results using the next button. The results of the next
+	#  pages are downloaded together with the first one (see @ref api_prefetch_window).
 	#
 	#  @param self The object pointer
 	#  @param argument A list of Unicode strings which define the search
@@ -226,9 +348,10 @@ class ArxivBot(telepot.Bot):
 			return None
 
 		initial_result_number = 0
+		block_start = self.prefetch_block_start( initial_result_number )
 
 		try:
-			easy_search_link = al.simple_search(argument, self.arxiv_search_link, initial_result_number, self.max_api_result_number)
+			easy_search_link = al.simple_search(argument, self.arxiv_search_link, block_start, self.api_prefetch_window)
 		except NoArgumentError:
 			self.sendMessage(chat_identity, u'Please provide some arguments for your arXiv search.')
 			return None
@@ -238,24 +361,34 @@ class ArxivBot(telepot.Bot):
 			return None
 
 		try:
-			search_list, total_results = self.search_and_format_API( easy_search_link, chat_identity )
+			search_result = self.cached_search_and_format_API( easy_search_link, chat_identity )
+		except:
+			return None
+
+		search_list, total_results = self.select_page_of_results( search_result, initial_result_number, block_start )
+
+		try:
+			search_list = self.complete_page_of_results( argument, search_list, initial_result_number, total_results, chat_identity )
 		except:
 			return None
 
-		message_result = self.prepare_message_api( argument, initial_result_number, search_list, total_results)
+		if len(search_list) == 0:
+			self.sendMessage(chat_identity, u'No result has been found for your search. Try again!')
+			return None
 
-		if total_results <= self.max_api_result_number:
+		message_result, number_results_shown = self.prepare_message_api( argument, initial_result_number, search_list, total_results)
+
+		if total_results <= number_results_shown:
 			self.send_message_safely( chat_identity, message_result )
 		else:
-			keyboard = self.search_prev_next_keyboard( initial_result_number, total_results, self.max_api_result_number )
+			keyboard = self.search_prev_next_keyboard( initial_result_number, total_results, number_results_shown )
 			self.send_message_safely( chat_identity, message_result, markup = keyboard )
 
-		time.sleep( self.arxiv_fair_time )
-
 	## This method is used when the user clicks the next/previous buttons.
 	#
 	#  The method composes the arXiv link to which the requests is sent, makes a requests to
-	#  the website, parses the results, and edit the previous message.
+	#  the website, parses the results, and edit the previous message. If the page belongs to
+	#  a block of results which has already been downloaded, no request is sent to the arXiv.
 	#
 	#  @param self The object pointer
 	#  @param argument A list of Unicode strings which define the search
@@ -265,8 +398,10 @@ class ArxivBot(telepot.Bot):
 	#  @param msg_identity The identity number associated to the message, so we can edit the message
 	def do_easy_search_query(self, argument, start_number, chat_identity, query_identity, msg_identity):
 
+		block_start = self.prefetch_block_start( start_number )
+
 		try:
-			easy_search_link = al.simple_search(argument, self.arxiv_search_link, start_number, self.max_api_result_number)
+			easy_search_link = al.simple_search(argument, self.arxiv_search_link, block_start, self.api_prefetch_window)
 		except NoArgumentError:
 			self.sendMessage(chat_identity, u'Please provide some arguments for the search.')
 			return None
@@ -276,16 +411,25 @@ class ArxivBot(telepot.Bot):
 			return None
 
 		try:
-			search_list, total_results = self.search_and_format_API( easy_search_link, chat_identity )
+			search_result = self.cached_search_and_format_API( easy_search_link, chat_identity )
 		except:
 			return None
 
-		message_result = self.prepare_message_api( argument, start_number, search_list, total_results)
+		search_list, total_results = self.select_page_of_results( search_result, start_number, block_start )
 
-		keyboard = self.search_prev_next_keyboard( start_number, total_results, self.max_api_result_number )
-		self.edit_message_safely(message_result, query_identity, msg_identity, keyboard)
+		try:
+			search_list = self.complete_page_of_results( argument, search_list, start_number, total_results, chat_identity )
+		except:
+			return None
 
-		time.sleep( self.arxiv_fair_time )
+		if len(search_list) == 0:
+			self.sendMessage(chat_identity, u'No result has been found for your search. Try again!')
+			return None
+
+		message_result, number_results_shown = self.prepare_message_api( argument, start_number, search_list, total_results)
+
+		keyboard = self.search_prev_next_keyboard( start_number, total_results, number_results_shown )
+		self.edit_message_safely(message_result, query_identity, msg_identity, keyboard)
 
 	## This method is used when the user calls the `/set` command.
 	#
@@ -305,28 +449,63 @@ class ArxivBot(telepot.Bot):
 			self.send_message_safely(chat_identity, u'Please use the arXiv subjects.\nSee http://arxitics.com/help/categories for further information.')
 			return None
 
-		if self.preference_exists( chat_identity ):
-			self.overwrite_preference( chat_identity, arxiv_category )
+		is_new_preference = self.save_preference( chat_identity, arxiv_category )
+
+		if is_new_preference == None:
+			return None
+		elif not is_new_preference:
 			self.send_message_safely(chat_identity, u'Your preferred category has been updated!\nNow use /today to get the daily submissions to this category.')
 		else:
-			self.add_preference( chat_identity, arxiv_category )
 			self.send_message_safely(chat_identity, u'Your preferred category has been recorded!\nNow use /today to get the daily submissions to this category.')
 
+	## This method is used when the user calls the `/subscribe` or `/unsubscribe` command.
+	#
+	#  The subscribed users receive the new submissions to their favourite category after each
+	#  announcement of the arXiv (see @ref broadcast_digest). The favourite category has to be set first.
+	#
+	#  @param self The object pointer
+	#  @param is_subscribed Whether the user wants to receive the daily digest
+	#  @param chat_identity The identity number associated to the chat
+	def set_subscription(self, is_subscribed, chat_identity):
+
+		try:
+			sql_command = "UPDATE preferences SET subscribed = %s WHERE user_identity = %s RETURNING category;"
+			with self.database_pool.cursor() as cursor:
+				cursor.execute(sql_command, (is_subscribed, chat_identity))
+				category_tuple = cursor.fetchone()
+		except psycopg2.Error as PGE:
+			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
+			self.save_known_error_log(chat_identity, PGE)
+			return None
+		except:
+			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
+			self.save_unknown_error_log(chat_identity, 'arxiv_bot.set_subscription')
+			return None
+
+		if category_tuple == None and is_subscribed:
+			self.send_message_safely(chat_identity, u'Please /set your favourite category first, then /subscribe to it.')
+		elif is_subscribed:
+			self.send_message_safely(chat_identity, u'You will receive the new submissions to <b>' + category_tuple[0] + u'</b> every day!\nUse /unsubscribe to stop.')
+		else:
+			self.send_message_safely(chat_identity, u'You will not receive the daily submissions any more.')
+
 	## This method looks at the RSS feed of a category set by the user.
 	#
 	#  If the category is not set, the Bot will notify the user about the
-	#  usage of the `/today` command.
+	#  usage of the `/today` command. The category is read from the preference
+	#  cache, and the database is used only if the user is not in the cache.
 	#
 	#  @param self The object pointer
 	#  @param chat_identity The identity number associated to the chat
 	def do_today_search_with_set_preference(self, chat_identity):
 
-		if self.preference_exists( chat_identity ):
-			preferred_category = self.search_for_category( chat_identity )
-			if preferred_category == None:
-				self.sendMessage(chat_identity, u'An unknown error occurred while checking your preferences. \U0001F631')
-				self.save_unknown_error_log(chat_identity, 'arxiv_bot.do_today_search_with_set_preference')
+		is_known, preferred_category = self.preference_cache.lookup( chat_identity )
+		if not is_known:
+			is_known, preferred_category = self.search_for_category( chat_identity )
+			if not is_known:
 				return None
+
+		if preferred_category != None:
 			self.do_today_search( preferred_category, chat_identity )
 		else:
 			message = (u"You have not /set your favourite arXiv category. "
@@ -347,6 +526,8 @@ class ArxivBot(telepot.Bot):
 	#  **NOTE** : Only for this kind of search, we allow for a maximum of 50 results.
 	#  If more results are presents, the user is notified.
 	#
+	#  The feed is downloaded only once per announcement, and then it is taken from the @ref feed_cache.
+	#
 	#  @param self The object pointer
 	#  @param arxiv_category The arXiv category we are interested in (ONLY one category for limiting the number of results)
 	#  @param chat_identity The identity number associated to the chat
@@ -362,8 +543,10 @@ class ArxivBot(telepot.Bot):
 			self.save_unknown_error_log(chat_identity, 'arxiv_lib.search_day_submissions')
 			return None
 
+		load_feed = lambda: self.search_and_format_RSS( today_search_link, chat_identity )
+
 		try:
-			search_list, feed_date = self.search_and_format_RSS( today_search_link, chat_identity )
+			search_list, feed_date = self.feed_cache.get( arxiv_category, load_feed )
 		except:
 			return None
 
@@ -429,6 +612,7 @@ class ArxivBot(telepot.Bot):
 				   u"- /set your favourite arXiv category\n"
 				   u"    <i>e.g. /set " + example_category + u"</i>\n"
 				   u"           <i>/today</i>\n\n"
+				   u"- /subscribe to receive the submissions to your favourite category every day\n\n"
 				   u"- send us your /feedback\n"
 				   u"    <i>e.g. /feedback I like this bot!</i>\n\n"
 				   u"Enjoy your search! \U0001F609"
@@ -483,15 +667,100 @@ class ArxivBot(telepot.Bot):
 
 		return search_list, total_results
 
+	## This method returns the results of an API search, taking them from the @ref search_cache if possible.
+	#
+	#  The method returns the tuple (search_list, total_results) given by @ref search_and_format_API.
+	#
+	#  @param self The object pointer
+	#  @param search_link The arXiv link for the request
+	#  @param chat_identity The identity number associated to the chat
+	def cached_search_and_format_API(self, search_link, chat_identity):
+
+		search_result = self.search_cache.lookup(search_link)
+
+		if search_result != None:
+			return search_result
+
+		try:
+			search_result = self.search_and_format_API(search_link, chat_identity)
+		except:
+			raise
+
+		self.search_cache.store(search_link, search_result)
+
+		return search_result
+
+	## This method returns the number of the first result of the block which contains the given result.
+	#
+	#  The results of the API searches are downloaded in blocks of @ref api_prefetch_window results.
+	#
+	#  @param self The object pointer
+	#  @param start_number The number of the first result shown
+	def prefetch_block_start(self, start_number):
+
+		return start_number - start_number % self.api_prefetch_window
+
+	## This method selects the page of results to show from a block of downloaded results.
+	#
+	#  The method returns the list of (at most max_api_result_number) results to show, and the total number of results.
+	#
+	#  @param self The object pointer
+	#  @param search_result The tuple (search_list, total_results) for the whole block
+	#  @param start_number The number of the first result shown
+	#  @param block_start The number of the first result of the block
+	def select_page_of_results(self, search_result, start_number, block_start):
+
+		block_list, total_results = search_result
+		page_start = start_number - block_start
+
+		return block_list[page_start : page_start + self.max_api_result_number], total_results
+
+	## This method completes a page of results which is cut at the end of its block, with the first results of the following blocks.
+	#
+	#  The pages start right after the last result shown (see @ref search_prev_next_keyboard), so they can cross
+	#  the end of a block. The following blocks are taken from the @ref search_cache, or downloaded, until the page
+	#  has max_api_result_number results (or all the remaining ones). The exceptions are passed to the caller.
+	#
+	#  @param self The object pointer
+	#  @param argument A list of Unicode strings which define the search
+	#  @param search_list The results of the page selected with @ref select_page_of_results
+	#  @param start_number The number of the first result shown
+	#  @param total_results The total number of results associated with the search
+	#  @param chat_identity The identity number associated to the chat
+	def complete_page_of_results(self, argument, search_list, start_number, total_results, chat_identity):
+
+		page_length = min(self.max_api_result_number, total_results - start_number)
+		block_end = self.prefetch_block_start( start_number ) + self.api_prefetch_window
+
+		while len(search_list) < page_length and start_number + len(search_list) == block_end:
+			next_search_link = al.simple_search(argument, self.arxiv_search_link, block_end, self.api_prefetch_window)
+			block_list, block_total_results = self.cached_search_and_format_API( next_search_link, chat_identity )
+			search_list = search_list + block_list[: page_length - len(search_list)]
+			block_end += self.api_prefetch_window
+
+		return search_list
+
 	## This method is used in the RSS feed methods to send the request to the arXiv, parse the result, and format it accordingly.
 	# 
+	#  The request is conditional (see @ref validator_store), and if the feed has not been modified, the
+	#  papers reviewed the previous time are returned, without parsing the feed again.
+	#
 	#  @param self The object pointer
 	#  @param search_link The arXiv link for the request
 	#  @param chat_identity The identity number associated to the chat
 	def search_and_format_RSS(self, search_link, chat_identity):
 
 		try:
-			search_dictionary = self.send_and_parse_request(search_link, chat_identity)
+			search_response = self.send_request(search_link, chat_identity, self.validator_store)
+		except:
+			raise
+
+		search_result = self.validator_store.parsed_response(search_link, search_response)
+		if search_result != None:
+			return search_result
+
+		try:
+			search_dictionary = self.parse_request_response(search_response, chat_identity)
 		except:
 			raise
 
@@ -528,11 +797,13 @@ class ArxivBot(telepot.Bot):
 			self.save_unknown_error_log(chat_identity, 'arxiv_lib.find_date_RSS')
 			raise
 
+		self.validator_store.remember_parsed_response(search_link, search_response, (search_list, feed_date))
+
 		return search_list, feed_date
 
 	## This method sends the request to the arXiv and parse the response.
 	# 
-	#  This method is used in the search_and_format methods, both for API search and RSS feed.
+	#  This method is used in the search_and_format_API method.
 	#
 	#  @param self The object pointer
 	#  @param search_link The arXiv link for the request
@@ -540,7 +811,30 @@ class ArxivBot(telepot.Bot):
 	def send_and_parse_request(self, search_link, chat_identity):
 
 		try:
-			search_response = al.request_to_arxiv(search_link)
+			search_response = self.send_request(search_link, chat_identity)
+		except:
+			raise
+
+		try:
+			search_dictionary = self.parse_request_response(search_response, chat_identity)
+		except:
+			raise
+
+		return search_dictionary
+
+	## This method sends the request to the arXiv, and returns the response.
+	#
+	#  When a validator store is given, the request is conditional (see @ref validator_store), and if the
+	#  response has not been modified, the body received the previous time is returned.
+	#
+	#  @param self The object pointer
+	#  @param search_link The arXiv link for the request
+	#  @param chat_identity The identity number associated to the chat
+	#  @param validator_store The validator_store.ValidatorStore used for the request (optional, default is None)
+	def send_request(self, search_link, chat_identity, validator_store = None):
+
+		try:
+			search_response = al.request_to_arxiv(search_link, self.arxiv_session, validator_store)
 		except TypeError as TE:
 			self.sendMessage(chat_identity, u'The url got corrupted. Try again!')
 			self.save_known_error_log(chat_identity, TE)
@@ -558,6 +852,15 @@ class ArxivBot(telepot.Bot):
 			self.save_unknown_error_log(chat_identity, 'arxiv_lib.request_to_arxiv')
 			raise
 
+		return search_response
+
+	## This method parses the response of the arXiv.
+	#
+	#  @param self The object pointer
+	#  @param search_response The response returned by @ref send_request
+	#  @param chat_identity The identity number associated to the chat
+	def parse_request_response(self, search_response, chat_identity):
+
 		try:
 			search_dictionary = al.parse_response(search_response)
 		except TypeError as TE:
@@ -574,7 +877,11 @@ class ArxivBot(telepot.Bot):
 	## This method formats the results of the search and prepares the message to be sent to the user.
 	#
 	#  The method prepares a message where all entries have a title, author's list, date (when the paper was published), and link.
-	#  **NOTE**: Since only 10 results can be shown, we do not have to worry about exceeding the size limit for the message.
+	#  **NOTE**: Since the message can be edited, it is never split. The results which do not fit in the size limit
+	#  of Telegram are left out (see @ref message_packing.fit_items), which can only happen with very long author lists,
+	#  and the first result is cut if it is longer than a message (see @ref message_packing.truncate_item).
+	#  The method returns the tuple (message, number of results shown), so that the next page starts from the first
+	#  result left out.
 	#
 	#  @param self The object pointer
 	#  @param argument The keywords used in the search
@@ -586,18 +893,31 @@ class ArxivBot(telepot.Bot):
 		result_counter = start_num + 1
 		separator = ' '
 		keywords = separator.join(argument)
-		message_result = 'Your search keywords are:\n'+keywords+'\n\n'
+		message_items = ['Your search keywords are:\n'+keywords+'\n\n']
+		item_lengths = [mp.telegram_length(message_items[0])]
 		
 		for result in search_list:
-			new_item = '<b>' + str(result_counter) + '</b>. <em>' + result['title'] + '</em>\n' + result['authors'] + '\n<em>Submitted on ' + result['date'].strftime('%d %b %Y') + '</em>\n' + result['link'] + '\n\n'
-			message_result += new_item
+			number = str(result_counter)
+			message_items.append('<b>' + number + '</b>. ' + result.fragment)
+			item_lengths.append(len(number) + 2 + result.fragment_length)
 			result_counter += 1
 		
+		total_number_info = ''
 		if total_results > self.max_api_result_number:
 			total_number_info = 'There are ' + str(total_results) + ' results associated with this search.'
-			message_result += total_number_info
 
-		return message_result
+		# The first item is the header with the keywords
+		number_items = mp.count_fitting_items(message_items, total_number_info, self.max_characters_chat, item_lengths)
+
+		# A first result longer than a message is cut, so that the next page always moves forward
+		if number_items < 2 and len(message_items) > 1:
+			available_length = self.max_characters_chat - item_lengths[0] - mp.telegram_length(total_number_info) - 2
+			message_items[1] = mp.truncate_item(message_items[1], available_length) + u'\n\n'
+			number_items = 2
+
+		message = u''.join(message_items[:number_items]) + total_number_info
+
+		return message, max(number_items - 1, 0)
 
 	## This method formats the result of the today RSS feed and send it to the user.
 	#
@@ -610,58 +930,60 @@ class ArxivBot(telepot.Bot):
 	#  @param remaining_results The remaining results which have not been shown
 	def send_results_back_rss(self, chat_identity, search_list, remaining_results, arxiv_category, feed_date):
 
+		messages = self.prepare_messages_rss(search_list, remaining_results, arxiv_category, feed_date)
+
+		self.send_split_message( chat_identity, messages )
+
+	## This method formats the result of the today RSS feed, and returns the list of messages to be sent.
+	#
+	#  The messages do not depend on the user, so the same list can be sent to all the subscribers of a category.
+	#  The results are packed in the smallest number of messages allowed by Telegram (see @ref message_packing.pack_items).
+	#  The fragment of each paper is rendered once and kept in the cached feed (see arxiv_lib.Paper.fragment),
+	#  so only the numbering, the header and the footer are added here.
+	#
+	#  @param self The object pointer
+	#  @param search_list The unformatted list with all details about the results (prepared with the @ref search_and_format_RSS method)
+	#  @param remaining_results The remaining results which have not been shown
+	#  @param arxiv_category The arXiv category of the feed
+	#  @param feed_date The date of the feed
+	def prepare_messages_rss(self, search_list, remaining_results, arxiv_category, feed_date):
+
 		result_counter = 1
 		today = feed_date + datetime.timedelta(days=1)
-		message_result = 'List of submissions to <b>' + arxiv_category + '</b> for today ' + today.strftime("%a, %d %b %y") + '.\n\n'
+		message_items = ['List of submissions to <b>' + arxiv_category + '</b> for today ' + today.strftime("%a, %d %b %y") + '.\n\n']
+		item_lengths = [mp.telegram_length(message_items[0])]
 		
 		for result in search_list:
-			new_item = '<b>' + str(result_counter) + '</b>. <em>' + result['title'] + '</em>\n' + result['authors'] + '\n'+result['link'] + '\n\n'
-			try:
-				message_result = self.check_size_and_split_message(message_result, new_item, chat_identity)
-			except:
-				return None
+			number = str(result_counter)
+			message_items.append('<b>' + number + '</b>. ' + result.fragment)
+			item_lengths.append(len(number) + 2 + result.fragment_length)
 			result_counter += 1
 		
 		if remaining_results > 0:
 			remaining_information = ('There are ' + str(remaining_results) + ' remaining submissions today.\n'
 									 'Consider visiting the arXiv web-page to see them.'
 									)
-			try:
-				message_result = self.check_size_and_split_message(message_result, remaining_information, chat_identity)
-			except:
-				return None
+			message_items.append(remaining_information)
+			item_lengths.append(mp.telegram_length(remaining_information))
 
-		self.send_message_safely( chat_identity, message_result )
+		return mp.pack_items(message_items, self.max_characters_chat, item_lengths)
 
-	## This method checks the length of the message, and divides it if the maximum number of characters is exceeded.
+	## This method sends a message divided into chunks.
 	#
-	#  The method is used in the @ref send_results_back_rss method.
+	#  The chunks are sent in order by the @ref send_queue.
 	#
 	#  @param self The object pointer
-	#  @param message The message to check and possibly send
-	#  @param new_item The new result to add to the message
 	#  @param chat_identity The identity number associated to the chat
-	def check_size_and_split_message(self, message, new_item, chat_identity):
+	#  @param messages The list of chunks (prepared with the @ref prepare_messages_rss method)
+	def send_split_message(self, chat_identity, messages):
 
-		message_would_exceed = len(message) + len(new_item) >= self.max_characters_chat
-		if message_would_exceed:
-			try:
-				self.sendMessage( chat_identity, message, parse_mode='HTML')
-			except telepot.exception.TooManyRequestsError as TooE:
-				self.sendMessage(chat_identity, u"You can only make 20 requests per minutes. Please try later!")
-				raise
-			except:
-				self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-				self.save_unknown_error_log(chat_identity, 'arxiv_bot.check_size_and_split_message')
-				raise
-			message = ''
-		message += new_item
-
-		return message
+		for message in messages:
+			self.send_message_safely( chat_identity, message )
 
 	## This method sends the message safely.
 	#
 	#  The method provides the possibility of adding an inline keyboard at the bottom of the message.
+	#  The message is sent by the @ref send_queue, and the errors are handled by @ref handle_send_error.
 	#
 	#  @param self The object pointer
 	#  @param chat_identity The identity number associated to the chat
@@ -670,16 +992,52 @@ class ArxivBot(telepot.Bot):
 	#  @param language The language in which the message is parsed (default is HTML)
 	def send_message_safely(self, chat_identity, message, markup = None, language = 'HTML'):
 
-		try:
-			self.sendMessage(chat_identity, message, parse_mode=language, reply_markup=markup)
-		except telepot.exception.TooManyRequestsError as TooE:
-			self.sendMessage(chat_identity, u"You can only make 20 requests per minutes. Please try later!")
-		except telepot.exception.TelegramError as TeleE:
-			self.sendMessage(chat_identity, u"Telegram is messing around with the results, we'll have a look into this. Sorry!")
-			self.save_known_error_log(chat_identity, TeleE)
-		except:
-			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.send_message_safely')
+		return self.sendMessage(chat_identity, message, parse_mode=language, reply_markup=markup)
+
+	## This method puts a message in the @ref send_queue, and returns the send_queue.PendingMessage.
+	#
+	#  All the messages of the Bot pass through the queue, so that the limits of Telegram are respected
+	#  and the messages of a chat are sent in order. The arguments are the ones of telepot.Bot.sendMessage,
+	#  with the additional priority of the message (the lowest is sent first).
+	#
+	#  @param self The object pointer
+	#  @param chat_id The identity number associated to the chat
+	#  @param text The message to send
+	def sendMessage(self, chat_id, text, **keywords):
+
+		return self.send_queue.submit(chat_id, text, **keywords)
+
+	## This method sends a message to Telegram straight away, and is used by the @ref send_queue.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param message The message to send
+	def send_directly(self, chat_identity, message, **keywords):
+
+		return super(ArxivBot, self).sendMessage(chat_identity, message, **keywords)
+
+	## This method handles the messages which could not be sent by the @ref send_queue.
+	#
+	#  The users who blocked the Bot are unsubscribed from the daily digest. When Telegram refuses a formatted
+	#  message, the user is notified with a plain message.
+	#
+	#  @param self The object pointer
+	#  @param pending_message The send_queue.PendingMessage which failed
+	#  @param error The exception raised by Telegram
+	def handle_send_error(self, pending_message, error):
+
+		chat_identity = pending_message.chat_identity
+
+		if isinstance(error, (telepot.exception.BotWasBlockedError, telepot.exception.BotWasKickedError, telepot.exception.UnauthorizedError)):
+			self.cancel_subscription(chat_identity)
+		elif isinstance(error, telepot.exception.TooManyRequestsError):
+			self.save_known_error_log(chat_identity, error)
+		elif isinstance(error, telepot.exception.TelegramError):
+			self.save_known_error_log(chat_identity, error)
+			if pending_message.keywords.get('parse_mode') != None:
+				self.sendMessage(chat_identity, u"Telegram is messing around with the results, we'll have a look into this. Sorry!")
+		else:
+			self.save_unknown_error_log(chat_identity, 'arxiv_bot.send_directly')
 
 	## This method edits the message safely, with the possibility of adding an inline keyboard.
 	#
@@ -693,7 +1051,9 @@ class ArxivBot(telepot.Bot):
 		try:
 			self.editMessageText(msg_identifier, message, parse_mode='HTML', reply_markup=keyboard)
 		except telepot.exception.TooManyRequestsError as TooE:
-			self.answer_robust_callback_query(query_identity, message=u"You can only make 20 requests per minutes. Please try later!")
+			# The queued messages wait as well, since Telegram limits the whole Bot
+			self.send_queue.pause(sq.retry_after(TooE))
+			self.answer_robust_callback_query(query_identity, message=u"Telegram is asking the bot to slow down. Please try again in a few seconds!")
 			return None
 		except telepot.exception.TelegramError as TeleE:
 			self.answer_robust_callback_query(query_identity, message=u"You are probably clicking the buttons too quickly. Slow down! \U0001F422")
@@ -720,13 +1080,16 @@ class ArxivBot(telepot.Bot):
 
 	## This method prepares a keyboard for getting the previous/next results of a search.
 	#
+	#  The next page starts from the first result which is not shown, and the previous one goes back by
+	#  max_api_result_number results (the pages are shorter only when some results do not fit in a message).
+	#
 	#  @param self The object pointer
 	#  @param start_results_from The number of the first result shown
 	#  @param total_results The number of total results to show
-	#  @param number_results_shown The number of results shown so far
+	#  @param number_results_shown The number of results shown in the current page
 	def search_prev_next_keyboard(self, start_results_from, total_results, number_results_shown):
 
-		new_start_prev = str(start_results_from - number_results_shown)
+		new_start_prev = str(max(start_results_from - self.max_api_result_number, 0))
 		new_start_next = str(start_results_from + number_results_shown)
 
 		close_button = InlineKeyboardButton(text = 'Close', callback_data = 'search close None')
@@ -736,7 +1099,10 @@ class ArxivBot(telepot.Bot):
 		results_to_be_shown = total_results - ( start_results_from + number_results_shown )
 
 		if start_results_from == 0:
-			keyboard = InlineKeyboardMarkup(inline_keyboard = [[close_button, next_button]])
+			if results_to_be_shown > 0:
+				keyboard = InlineKeyboardMarkup(inline_keyboard = [[close_button, next_button]])
+			else:
+				keyboard = InlineKeyboardMarkup(inline_keyboard = [[close_button]])
 		else:
 			if results_to_be_shown > 0:
 				keyboard = InlineKeyboardMarkup(inline_keyboard = [[close_button, prev_button, next_button]])
@@ -745,96 +1111,327 @@ class ArxivBot(telepot.Bot):
 
 		return keyboard
 
-	## This method searches in the preference database for the chat_identity of the user.
+	## This method saves the preferred category of the user in the database, replacing the old one if present.
 	#
-	#  If the chat_identity is found, return True, otherwise return False.
+	#  The preference is written with a single INSERT ... ON CONFLICT command. The method returns
+	#  True if the preference is new, False if an old preference has been replaced, and None if
+	#  the database could not be written (the user is notified).
 	#
 	#  @param self The object pointer
 	#  @param chat_identity The identity number associated to the chat
-	def preference_exists(self, chat_identity):
+	#  @param category A category of the arXiv
+	def save_preference(self, chat_identity, category):
 
 		try:
-			self.open_connection_with_database()
-			sql_command = "SELECT exists (SELECT 1 FROM preferences WHERE user_identity = %s LIMIT 1);"
-			self.cursor_database.execute(sql_command, (chat_identity,))
-			preference_tuple = self.cursor_database.fetchone()
-			self.close_connection_with_database()
+			sql_command = ("INSERT INTO preferences (user_identity, category) VALUES (%s, %s) "
+						   "ON CONFLICT (user_identity) DO UPDATE SET category = EXCLUDED.category "
+						   "RETURNING (xmax = 0);")
+			with self.database_pool.cursor() as cursor:
+				cursor.execute(sql_command, (chat_identity, category))
+				is_new_preference = cursor.fetchone()[0]
+				self.notify_preference_change(cursor, chat_identity, category)
 		except psycopg2.Error as PGE:
 			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
 			self.save_known_error_log(chat_identity, PGE)
+			return None
 		except:
 			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.preference_exists')
+			self.save_unknown_error_log(chat_identity, 'arxiv_bot.save_preference')
+			return None
 
-		preference_bool = preference_tuple[0]
+		self.preference_cache.store(chat_identity, category)
 
-		return preference_bool
+		return is_new_preference
 
-	## This method replaces the old preferred category associated with the chat_identity with the new category provided
+	## This method searches into the preference database for the category associated with the chat_identity provided.
+	#
+	#  The method returns the tuple (is_read, category), where is_read is False if the database
+	#  could not be read (the user is notified), and category is None if the user has no preference.
+	#  The result is stored in the preference cache.
 	#
 	#  @param self The object pointer
 	#  @param chat_identity The identity number associated to the chat
-	#  @param category A category of the arXiv
-	def overwrite_preference(self, chat_identity, category):
+	def search_for_category(self, chat_identity):
+
+		category = None
 
 		try:
-			self.open_connection_with_database()
-			sql_command = "UPDATE preferences SET category = %s WHERE user_identity = %s;"
-			self.cursor_database.execute(sql_command, (category, chat_identity))
-			self.connection_database.commit()
-			self.close_connection_with_database()
+			sql_command = "SELECT category FROM preferences WHERE user_identity = %s;"
+			with self.database_pool.cursor() as cursor:
+				cursor.execute(sql_command, (chat_identity,))
+				category_tuple = cursor.fetchone()
 		except psycopg2.Error as PGE:
 			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
 			self.save_known_error_log(chat_identity, PGE)
+			return False, None
 		except:
 			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.overwrite_preference')
+			self.save_unknown_error_log(chat_identity, 'arxiv_bot.search_for_category')
+			return False, None
+
+		if not category_tuple == None:
+			category = category_tuple[0]
+
+		self.preference_cache.store(chat_identity, category)
+
+		return True, category
+
+	## This method loads all the preferences from the database into the preference cache.
+	#
+	#  After the loading, the `/today` command does not need the database. The rows are read
+	#  with a server-side cursor, so that they are not all kept in memory at once.
+	#
+	#  @param self The object pointer
+	def load_preferences(self):
 
-	## This method adds the preference to the database.
+		sql_command = "SELECT user_identity, category FROM preferences ORDER BY user_identity;"
+		with self.database_pool.cursor(name = 'load_preferences') as cursor:
+			cursor.itersize = 10000
+			cursor.execute(sql_command)
+			self.preference_cache.load(cursor)
+
+	## This method notifies the other processes (on the preference_channel) that the preference of a user has changed.
+	#
+	#  The notification is sent when the transaction of the cursor is committed.
 	#
 	#  @param self The object pointer
+	#  @param cursor The cursor used to change the preference
 	#  @param chat_identity The identity number associated to the chat
 	#  @param category A category of the arXiv
-	def add_preference(self, chat_identity, category):
+	def notify_preference_change(self, cursor, chat_identity, category):
 
-		try:
-			self.open_connection_with_database()
-			sql_command = "INSERT INTO preferences (user_identity, category) VALUES (%s, %s);"
-			self.cursor_database.execute(sql_command, (chat_identity, category))
-			self.connection_database.commit()
-			self.close_connection_with_database()
-		except psycopg2.Error as PGE:
-			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
-			self.save_known_error_log(chat_identity, PGE)
-		except:
-			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.add_preference')
+		if self.preference_channel == None:
+			return None
 
-	## This method searches into the preference database for the category associated with the chat_identity provided.
+		cursor.execute("SELECT pg_notify(%s, %s);", (self.preference_channel, str(chat_identity) + ' ' + category))
+
+	## This method starts listening to the changes of preferences made by the other processes using the same database.
+	#
+	#  Since the notifications sent while the listener is disconnected are lost, the preference
+	#  cache is cleared every time the listener reconnects.
 	#
 	#  @param self The object pointer
-	#  @param chat_identity The identity number associated to the chat
-	def search_for_category(self, chat_identity):
+	#  @param channel The name of the database channel (optional, default is 'preferences')
+	def listen_to_preference_changes(self, channel = 'preferences'):
 
-		category = None
+		self.preference_channel = channel
+		self.preference_listener = dp.NotificationListener(self.database_pool.connection_parameters,
+														   channel,
+														   self.receive_preference_change,
+														   reconnect_function = self.preference_cache.clear)
+		self.preference_listener.start()
+
+	## This method updates the preference cache with a change notified by another process.
+	#
+	#  @param self The object pointer
+	#  @param payload The string 'chat_identity category' sent with the notification
+	def receive_preference_change(self, payload):
+
+		chat_identity, category = payload.split(' ', 1)
+
+		self.preference_cache.store(int(chat_identity), category)
+
+	## This method returns the favourite categories of the users, the most used first.
+	#
+	#  The categories are ordered by the number of users who sent a message in the last usage_days
+	#  days, and then by the total number of users who chose them.
+	#
+	#  @param self The object pointer
+	#  @param usage_days The number of days of chat logs used to order the categories (optional, default is 7, use 0 to ignore the logs)
+	#  @param max_categories The maximum number of categories returned (optional, default is None, all of them)
+	def preferred_categories(self, usage_days = 7, max_categories = None):
+
+		sql_command = ("SELECT preferences.category, count(*) AS users, count(recent_users.user_identity) AS active_users FROM preferences "
+					   "LEFT JOIN (SELECT DISTINCT user_identity FROM chat WHERE message_time >= %s) AS recent_users "
+					   "ON recent_users.user_identity = preferences.user_identity "
+					   "WHERE preferences.category IS NOT NULL GROUP BY preferences.category "
+					   "ORDER BY active_users DESC, users DESC, preferences.category LIMIT %s;")
+
+		if usage_days > 0:
+			usage_start = datetime.datetime.utcnow() - datetime.timedelta(days = usage_days)
+		else:
+			usage_start = datetime.datetime.max
+
+		with self.database_pool.cursor() as cursor:
+			cursor.execute(sql_command, (usage_start, max_categories))
+			return [ category for category, users, active_users in cursor.fetchall() ]
+
+	## This method returns the feed of a category from the feed cache (loading it if needed), without sending any message.
+	#
+	#  The method returns the tuple (search_list, feed_date). The exceptions are passed to the caller.
+	#
+	#  @param self The object pointer
+	#  @param arxiv_category The arXiv category of the feed
+	def load_feed(self, arxiv_category):
+
+		today_search_link = al.search_day_submissions(arxiv_category, self.arxiv_rss_link)
+
+		def load_feed():
+			search_response = al.request_to_arxiv(today_search_link, self.arxiv_session, self.validator_store)
+			search_result = self.validator_store.parsed_response(today_search_link, search_response)
+			if search_result == None:
+				search_dictionary = al.parse_response(search_response)
+				search_list = al.review_response( search_dictionary , self.max_number_authors , 'RSS' )
+				search_result = (search_list, al.find_date_RSS( search_dictionary ))
+				self.validator_store.remember_parsed_response(today_search_link, search_response, search_result)
+			return search_result
+
+		return self.feed_cache.get( arxiv_category, load_feed )
+
+	## This method loads the feed of a category into the feed cache, without sending any message.
+	#
+	#  The papers shown by the `/today` command are formatted as well. The exceptions are passed to the caller.
+	#
+	#  @param self The object pointer
+	#  @param arxiv_category The arXiv category of the feed
+	def warm_feed(self, arxiv_category):
+
+		search_list, feed_date = self.load_feed( arxiv_category )
+
+		for paper in search_list[:self.max_rss_result_number]:
+			paper.as_dict()
+
+	## This method starts loading the feeds of the favourite categories after each announcement of the arXiv.
+	#
+	#  @param self The object pointer
+	#  @param delay The number of seconds to wait after the announcement (optional, default is 300)
+	#  @param usage_days The number of days of chat logs used to order the categories (optional, default is 7)
+	#  @param max_categories The maximum number of categories loaded (optional, default is None, all of them)
+	def start_warming_feeds(self, delay = 300, usage_days = 7, max_categories = None):
+
+		if self.announcement_scheduler != None:
+			self.announcement_scheduler.stop()
+
+		self.announcement_scheduler = asch.AnnouncementScheduler(lambda: self.preferred_categories(usage_days, max_categories),
+																 self.warm_feed,
+																 delay = delay,
+																 report_function = asch.print_warm_up_report)
+		self.announcement_scheduler.start()
+
+	## This method returns the categories with at least one subscriber to the daily digest.
+	#
+	#  @param self The object pointer
+	def subscribed_categories(self):
+
+		sql_command = "SELECT DISTINCT category FROM preferences WHERE subscribed AND category IS NOT NULL ORDER BY category;"
+		with self.database_pool.cursor() as cursor:
+			cursor.execute(sql_command)
+			return [ category for (category,) in cursor.fetchall() ]
+
+	## This method sends the daily digest of a category to all its subscribers, and returns the number of messages sent.
+	#
+	#  The feed is downloaded and formatted once, and the messages are sent to the subscribers in batches
+	#  of digest_batch_size users. The subscribers are read one batch at a time, ordered by identity, and
+	#  the last user of each batch is saved in the 'broadcast_progress' table: if the process stops during
+	#  the broadcast, the next call starts again from the following batch (so only the users of the
+	#  interrupted batch can receive the digest twice). A feed is never broadcast twice.
+	#
+	#  If the feed is older than the last announcement (the arXiv has not published the new one yet), it is
+	#  removed from the feed cache and a StaleFeedError is raised, so that the scheduler tries again later.
+	#
+	#  @param self The object pointer
+	#  @param arxiv_category The arXiv category of the feed
+	def broadcast_digest(self, arxiv_category):
+
+		search_list, feed_date = self.load_feed( arxiv_category )
+
+		if self.feed_cache.is_stale( feed_date ):
+			self.feed_cache.invalidate( arxiv_category )
+			raise StaleFeedError('The feed of ' + arxiv_category + ' has not been updated since ' + feed_date.strftime('%d %b %Y') + '.')
+
+		with self.database_pool.cursor() as cursor:
+			cursor.execute("INSERT INTO broadcast_progress (category, feed_date) VALUES (%s, %s) ON CONFLICT (category, feed_date) DO NOTHING;",
+						   (arxiv_category, feed_date.date()))
+			cursor.execute("SELECT last_user_identity, finished_time FROM broadcast_progress WHERE category = %s AND feed_date = %s;",
+						   (arxiv_category, feed_date.date()))
+			last_user_identity, finished_time = cursor.fetchone()
+
+		if finished_time != None:
+			return 0
+
+		remaining_results = len(search_list) - self.max_rss_result_number
+		messages = self.prepare_messages_rss( search_list[:self.max_rss_result_number], remaining_results, arxiv_category, feed_date )
+		sent_messages = 0
+
+		sql_command = ("SELECT user_identity FROM preferences WHERE subscribed AND category = %s "
+					   "AND (%s IS NULL OR user_identity > %s) ORDER BY user_identity LIMIT %s;")
+
+		# Each batch is read in its own short transaction, so no connection is held while the messages are sent
+		while True:
+			with self.database_pool.cursor() as cursor:
+				cursor.execute(sql_command, (arxiv_category, last_user_identity, last_user_identity, self.digest_batch_size))
+				batch = [ chat_identity for (chat_identity,) in cursor.fetchall() ]
+			if len(batch) == 0:
+				break
+			batch_messages = self.send_digest_batch( batch, messages )
+			sent_messages += batch_messages
+			last_user_identity = batch[-1]
+			with self.database_pool.cursor() as cursor:
+				cursor.execute("UPDATE broadcast_progress SET last_user_identity = %s, sent_messages = sent_messages + %s WHERE category = %s AND feed_date = %s;",
+							   (last_user_identity, batch_messages, arxiv_category, feed_date.date()))
+
+		with self.database_pool.cursor() as cursor:
+			cursor.execute("UPDATE broadcast_progress SET finished_time = %s WHERE category = %s AND feed_date = %s;",
+						   (datetime.datetime.utcnow(), arxiv_category, feed_date.date()))
+
+		return sent_messages
+
+	## This method sends the messages of the digest to a batch of subscribers, and returns the number of messages sent.
+	#
+	#  The messages are put in the @ref send_queue with a lower priority than the answers to the users,
+	#  and the method returns when all of them have been sent (or have failed). The users who blocked the
+	#  Bot are unsubscribed by @ref handle_send_error.
+	#
+	#  @param self The object pointer
+	#  @param chat_identities The list of identity numbers of the chats
+	#  @param messages The list of chunks of the digest (prepared with the @ref prepare_messages_rss method)
+	def send_digest_batch(self, chat_identities, messages):
+
+		pending_messages = [ self.sendMessage(chat_identity, message, parse_mode='HTML', priority=1)
+							 for chat_identity in chat_identities for message in messages ]
+
+		sent_messages = 0
+
+		for pending_message in pending_messages:
+			try:
+				pending_message.wait()
+			except:
+				continue
+			sent_messages += 1
+
+		return sent_messages
+
+	## This method unsubscribes a user from the daily digest, without sending any message.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	def cancel_subscription(self, chat_identity):
 
 		try:
-			self.open_connection_with_database()
-			sql_command = "SELECT category FROM preferences WHERE user_identity = %s;"
-			self.cursor_database.execute(sql_command, (chat_identity,))
-			category_tuple = self.cursor_database.fetchone()
-			self.close_connection_with_database()
+			with self.database_pool.cursor() as cursor:
+				cursor.execute("UPDATE preferences SET subscribed = false WHERE user_identity = %s;", (chat_identity,))
 		except psycopg2.Error as PGE:
-			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
 			self.save_known_error_log(chat_identity, PGE)
-		except:
-			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.search_for_category')
 
-		if not category_tuple == None:
-			category = category_tuple[0]
+	## This method starts sending the daily digest to the subscribers after each announcement of the arXiv.
+	#
+	#  The broadcasts interrupted by a restart of the Bot are completed straight away. The categories whose
+	#  feed fails (or has not been updated yet) are tried again every retry_time seconds.
+	#
+	#  @param self The object pointer
+	#  @param delay The number of seconds to wait after the announcement (optional, default is 900)
+	#  @param retry_time The number of seconds before trying the failed categories again (optional, default is 600)
+	def start_daily_digest(self, delay = 900, retry_time = 600):
+
+		if self.digest_scheduler != None:
+			self.digest_scheduler.stop()
 
-		return category
+		self.digest_scheduler = asch.AnnouncementScheduler(self.subscribed_categories,
+														   self.broadcast_digest,
+														   delay = delay,
+														   report_function = lambda report: asch.print_warm_up_report(report, 'Digest'),
+														   retry_time = retry_time)
+		self.digest_scheduler.start(run_now = True)
 
 	## This method checks if a pattern is present in a string.
 	#
@@ -878,11 +1475,9 @@ class ArxivBot(telepot.Bot):
 		message_time = datetime.datetime.utcnow()
 
 		try:
-			self.open_connection_with_database()
 			sql_command = "INSERT INTO feedbacks (message_time, user_identity, comment) VALUES (%s, %s, %s);"
-			self.cursor_database.execute(sql_command , (message_time, chat_identity, argument))
-			self.connection_database.commit()
-			self.close_connection_with_database()
+			with self.database_pool.cursor() as cursor:
+				cursor.execute(sql_command , (message_time, chat_identity, argument))
 		except psycopg2.Error as PGE:
 			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
 			self.save_known_error_log(chat_identity, PGE)
@@ -895,6 +1490,7 @@ class ArxivBot(telepot.Bot):
 	## This method saves the details of the message (who, what) into the postgreSQL database 'chat' for statistical purposes.
 	#
 	#  **NOTE**: The chat identity is saved, but not other information such as the real name of the user.
+	#  The details are written in the background by the @ref log_writer, so this method does not wait for the database.
 	#
 	#  @param self The object pointer
 	#  @param chat_identity The identity number associated to the chat
@@ -904,20 +1500,7 @@ class ArxivBot(telepot.Bot):
 
 		message_time = datetime.datetime.utcnow()
 
-		try:
-			self.open_connection_with_database()
-			sql_command = "INSERT INTO chat (message_time, user_identity, content_type, content, query_identity) VALUES (%s, %s, %s, %s, %s);"
-			self.cursor_database.execute(sql_command , (message_time, chat_identity, content_type, text_message, query_identity))
-			self.connection_database.commit()
-			self.close_connection_with_database()
-		except psycopg2.Error as PGE:
-			self.sendMessage(chat_identity, u"We are experiencing some issues with our database. Sorry!")
-			self.save_known_error_log(chat_identity, PGE)
-			raise
-		except:
-			self.sendMessage(chat_identity, u'An unknown error occurred. \U0001F631')
-			self.save_unknown_error_log(chat_identity, 'arxiv_bot.save_message_log')
-			raise
+		self.log_writer.write('chat', (message_time, chat_identity, content_type, text_message, query_identity))
 
 	## This method prepares the information about a unknown errors.
 	#
@@ -947,6 +1530,8 @@ class ArxivBot(telepot.Bot):
 
 	## This method saves the errors into the postgreSQL database 'errors' for bug-fixing purposes.
 	#
+	#  The errors are written in the background by the @ref log_writer. If they cannot be saved, they are printed on the stdout.
+	#
 	#  @param self The object pointer
 	#  @param error_time The datetime object with the current date (GMT)
 	#  @param chat_identity The identity number associated to the chat
@@ -954,42 +1539,26 @@ class ArxivBot(telepot.Bot):
 	#  @param error_details A string with information about the error
 	def save_error(self, error_time, chat_identity, error_type, error_details):
 
-		try:
-			self.open_connection_with_database()
-			sql_command = "INSERT INTO errors (error_time, user_identity, error_type, details) VALUES (%s, %s, %s, %s);"
-			self.cursor_database.execute(sql_command , (error_time, chat_identity, error_type, error_details))
-			self.connection_database.commit()
-			self.close_connection_with_database()
-		except:
-			error_time_string = error_time.strftime("%d %b %Y %H:%M:%S")
-			message_on_stdout = 'Error cannot be saved in database.\n' + error_time_string + ' - ' + str(chat_identity) + ' - ' + error_details
-			print message_on_stdout
-
-	## This method opens the connection with the database
-	def open_connection_with_database(self):
-			
-		try:
-			self.connection_database = psycopg2.connect(dbname = self.database_name,
-														user = self.database_user,
-														password = self.database_password)
-			self.cursor_database = self.connection_database.cursor()
-		except:
-			error_time = datetime.datetime.utcnow()
-			error_time_string = error_time.strftime("%d %b %Y %H:%M:%S")
-			exception_type, exception_description, traceback = sys.exc_info()
-			message_on_stdout = 'Error occurred during connection to database.\n' + error_time_string + ' - ' + exception_type.__name__ + ' - ' + str(exception_description)
-			print message_on_stdout
-
-	## This method closes the connection with the database
-	def close_connection_with_database(self):
-
-		connection_is_open = self.connection_database.closed == 0
-		cursor_is_open = self.cursor_database.closed == False
+		self.log_writer.write('errors', (error_time, chat_identity, error_type, error_details))
 
-		if cursor_is_open:
-			self.cursor_database.close()
-		if connection_is_open:
-			self.connection_database.close()
+	## This method writes the remaining logs, and closes the connections with the database and the arXiv.
+	#
+	#  The method is called by the destructor also when the constructor failed partway, so the
+	#  attributes which have not been set yet are skipped.
+	#
+	#  @param self The object pointer
+	def close(self):
+
+		for name in ['announcement_scheduler', 'digest_scheduler', 'preference_listener']:
+			background_task = getattr(self, name, None)
+			if background_task != None:
+				background_task.stop()
+				setattr(self, name, None)
+
+		for name in ['send_queue', 'log_writer', 'database_pool', 'arxiv_session', 'validator_store']:
+			resource = getattr(self, name, None)
+			if resource != None:
+				resource.close()
 
 	# --- TO BE IMPLEMENTED IN THE FUTURE (MAYBE?) ---
 
@@ -0,0 +1,544 @@
+from collections import OrderedDict
+from array import array
+from bisect import bisect_left
+import datetime as dt
+import threading
+import sys
+import arxiv_lib as al
+
+## @package Library.arxiv_cache
+#  Small library for caching the results obtained from the arXiv.
+#
+#  The RSS feeds of the arXiv change only once per announcement, and the same
+#  feed is usually requested by many users. The classes in this library keep
+#  the reviewed results in memory, so that they can be shared among all the
+#  requests received by the Bot. The favourite categories of the users are
+#  cached as well, so that a `/today` command does not need the database.
+
+## This class implements a cache for the daily RSS feeds of the arXiv.
+#
+#  The cache stores, for each category, the reviewed list of submissions and the
+#  date of the feed (as obtained from @ref arxiv_lib.review_response and
+#  @ref arxiv_lib.find_date_RSS). The entries do not have a fixed lifetime, but
+#  expire at the next announcement of the arXiv. If the feed is older than the last
+#  announcement (the arXiv has not updated it yet), the entry is kept only for a
+#  short time, so that the feed is downloaded again soon.
+#
+#  The cache is thread-safe, and only one request per category is sent to the arXiv
+#  when the entry is missing or expired.
+class FeedCache(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param stale_retry_time The number of seconds a feed older than the last announcement is kept
+	#  @param clock A function returning the current UTC time (optional, default is datetime.utcnow)
+	def __init__(self, stale_retry_time = 600, clock = dt.datetime.utcnow):
+
+		## The number of seconds a feed older than the last announcement is kept
+		self.stale_retry_time = stale_retry_time
+
+		## The function returning the current UTC time
+		self.clock = clock
+
+		## The dictionary with the cached entries, in the form {category : (value, expiry_time)}
+		self.entries = {}
+
+		## The number of requests answered from the cache
+		self.hits = 0
+
+		## The number of requests which needed a new download
+		self.misses = 0
+
+		self.entries_lock = threading.Lock()
+		self.loading_locks = {}
+
+	## This method returns the feed of a category, loading it only if it is not in the cache.
+	#
+	#  The loader is a function with no arguments returning the tuple (search_list, feed_date).
+	#  Any exception raised by the loader is passed to the caller, and nothing is cached.
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category of the feed
+	#  @param loader The function used to download and review the feed
+	def get(self, category, loader):
+
+		value = self.lookup(category)
+		if value != None:
+			return value
+
+		with self.loading_lock(category):
+			# Another thread might have loaded the feed in the meantime
+			value = self.lookup(category, count_miss = True)
+			if value != None:
+				return value
+			value = loader()
+			self.store(category, value)
+
+		return value
+
+	## This method returns the cached feed of a category, or None if it is missing or expired.
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category of the feed
+	#  @param count_miss Whether a missing entry should be counted as a miss (optional, default is False)
+	def lookup(self, category, count_miss = False):
+
+		now = self.clock()
+
+		with self.entries_lock:
+			entry = self.entries.get(category)
+			if entry != None and entry[1] > now:
+				self.hits += 1
+				return entry[0]
+			if entry != None:
+				del self.entries[category]
+			if count_miss:
+				self.misses += 1
+
+		return None
+
+	## This method stores the feed of a category in the cache.
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category of the feed
+	#  @param value The tuple (search_list, feed_date)
+	def store(self, category, value):
+
+		expiry_time = self.expiry_time(value[1])
+
+		with self.entries_lock:
+			self.entries[category] = (value, expiry_time)
+
+	## This method removes a category from the cache (or all of them, if no category is given).
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category of the feed (optional, default is None)
+	def invalidate(self, category = None):
+
+		with self.entries_lock:
+			if category == None:
+				self.entries.clear()
+			else:
+				self.entries.pop(category, None)
+
+	## This method computes when a feed with the given date expires.
+	#
+	#  @param self The object pointer
+	#  @param feed_date The date of the feed (the output of @ref arxiv_lib.find_date_RSS)
+	def expiry_time(self, feed_date):
+
+		now = self.clock()
+
+		if self.is_stale(feed_date):
+			return now + dt.timedelta(seconds = self.stale_retry_time)
+
+		return al.next_announcement_time(now)
+
+	## This method checks if a feed is older than the last announcement (the arXiv has not published the new one yet).
+	#
+	#  @param self The object pointer
+	#  @param feed_date The date of the feed (the output of @ref arxiv_lib.find_date_RSS)
+	def is_stale(self, feed_date):
+
+		last_announcement = al.previous_announcement_time(self.clock())
+		last_announcement_day = last_announcement + dt.timedelta(hours = al.new_york_utc_offset(last_announcement))
+
+		return feed_date.date() < last_announcement_day.date()
+
+	## This method returns the lock used while loading the feed of a category.
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category of the feed
+	def loading_lock(self, category):
+
+		with self.entries_lock:
+			return self.loading_locks.setdefault(category, threading.Lock())
+
+## This class implements a bounded LRU cache with expiring entries, used for the results of the API searches.
+#
+#  The entries are identified by the search link (as built by @ref arxiv_lib.simple_search),
+#  and are removed when they are older than time_to_live seconds. When the cache holds more than
+#  max_entries entries, or its estimated size exceeds max_bytes, the least recently used entries
+#  are evicted. The cache counts hits, misses, evictions and expirations.
+class ResultCache(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param max_entries The maximum number of entries in the cache
+	#  @param time_to_live The number of seconds an entry stays in the cache
+	#  @param max_bytes The maximum (estimated) memory used by the cache (optional, default is None, no limit)
+	#  @param clock A function returning the current UTC time (optional, default is datetime.utcnow)
+	def __init__(self, max_entries, time_to_live, max_bytes = None, clock = dt.datetime.utcnow):
+
+		if max_entries < 1:
+			raise ValueError('The cache needs to hold at least one entry.')
+
+		## The maximum number of entries in the cache
+		self.max_entries = max_entries
+
+		## The number of seconds an entry stays in the cache
+		self.time_to_live = dt.timedelta(seconds = time_to_live)
+
+		## The maximum (estimated) memory used by the cache, in bytes
+		self.max_bytes = max_bytes
+
+		## The function returning the current UTC time
+		self.clock = clock
+
+		## The entries of the cache, in the form {key : (value, expiry_time, size)}, from the least to the most recently used
+		self.entries = OrderedDict()
+
+		## The (estimated) memory used by the cache, in bytes
+		self.current_bytes = 0
+
+		## The number of lookups answered from the cache
+		self.hits = 0
+
+		## The number of lookups not found in the cache
+		self.misses = 0
+
+		## The number of entries removed to respect the size limits
+		self.evictions = 0
+
+		## The number of entries removed because too old
+		self.expirations = 0
+
+		self.entries_lock = threading.Lock()
+
+	## This method returns the cached value for the key, or None if it is missing or expired.
+	#
+	#  @param self The object pointer
+	#  @param key The key of the entry (the search link)
+	def lookup(self, key):
+
+		now = self.clock()
+
+		with self.entries_lock:
+			entry = self.entries.pop(key, None)
+			if entry == None:
+				self.misses += 1
+				return None
+			if entry[1] <= now:
+				self.current_bytes -= entry[2]
+				self.expirations += 1
+				self.misses += 1
+				return None
+			# Re-insert the entry as the most recently used
+			self.entries[key] = entry
+			self.hits += 1
+			return entry[0]
+
+	## This method stores a value in the cache, evicting the least recently used entries if needed.
+	#
+	#  A value bigger than the memory limit is not stored.
+	#
+	#  @param self The object pointer
+	#  @param key The key of the entry (the search link)
+	#  @param value The value to store (for example, the output of the search_and_format_API method of the Bot)
+	def store(self, key, value):
+
+		size = estimate_size(value)
+		expiry_time = self.clock() + self.time_to_live
+
+		with self.entries_lock:
+			old_entry = self.entries.pop(key, None)
+			if old_entry != None:
+				self.current_bytes -= old_entry[2]
+			if self.max_bytes != None and size > self.max_bytes:
+				return None
+			self.entries[key] = (value, expiry_time, size)
+			self.current_bytes += size
+			self.evict()
+
+	## This method changes the limits of the cache, and evicts the entries exceeding them.
+	#
+	#  @param self The object pointer
+	#  @param max_entries The maximum number of entries in the cache
+	#  @param max_bytes The maximum (estimated) memory used by the cache (optional, default is None, no limit)
+	def set_limits(self, max_entries, max_bytes = None):
+
+		if max_entries < 1:
+			raise ValueError('The cache needs to hold at least one entry.')
+
+		with self.entries_lock:
+			self.max_entries = max_entries
+			self.max_bytes = max_bytes
+			self.evict()
+
+	## This method removes all the entries of the cache.
+	#
+	#  @param self The object pointer
+	def clear(self):
+
+		with self.entries_lock:
+			self.entries.clear()
+			self.current_bytes = 0
+
+	## This method removes the least recently used entries until the limits are respected.
+	#
+	#  **NOTE**: The method has to be called while holding the entries lock.
+	#
+	#  @param self The object pointer
+	def evict(self):
+
+		while len(self.entries) > self.max_entries or (self.max_bytes != None and self.current_bytes > self.max_bytes):
+			key, entry = self.entries.popitem(last = False)
+			self.current_bytes -= entry[2]
+			self.evictions += 1
+
+	## This method returns the statistics of the cache.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.entries_lock:
+			return {'entries' : len(self.entries),
+					'bytes' : self.current_bytes,
+					'hits' : self.hits,
+					'misses' : self.misses,
+					'evictions' : self.evictions,
+					'expirations' : self.expirations}
+
+## This class implements a cache of the favourite categories of the users (set with the `/set` command).
+#
+#  The preferences are stored in a compact form: a sorted array of chat identities (8 bytes each) and
+#  an array with the index of the corresponding category (2 bytes each), so that millions of users
+#  can be kept in memory. The recent changes are kept in a dictionary, which is merged into the
+#  arrays when it grows larger than merge_threshold entries.
+#
+#  The cache can be complete (all the preferences have been loaded with @ref load), in which case a
+#  user missing from the cache has no preference, or partial, in which case the database has to be
+#  checked and the result stored with @ref store.
+class PreferenceCache(object):
+
+	## The index used for the users who have no favourite category
+	NO_PREFERENCE = 65535
+
+	## The index used for the users whose preference has to be read again from the database
+	UNKNOWN_PREFERENCE = -1
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param merge_threshold The number of recent changes which are merged into the arrays (optional, default is 10000)
+	def __init__(self, merge_threshold = 10000):
+
+		## The number of recent changes which are merged into the arrays
+		self.merge_threshold = merge_threshold
+
+		## Whether all the preferences have been loaded from the database
+		self.is_complete = False
+
+		## The list of categories, whose indices are stored in the cache
+		self.categories = list(al.ALL_CATEGORIES)
+
+		## The sorted array of the chat identities
+		self.chat_identities = array('l')
+
+		## The array of the indices of the categories, in the same order of the chat identities
+		self.category_indices = array('H')
+
+		## The recent changes, in the form {chat_identity : category_index}
+		self.recent_changes = {}
+
+		## The number of lookups answered from the cache
+		self.hits = 0
+
+		## The number of lookups which need the database
+		self.misses = 0
+
+		self.category_positions = dict( (category, index) for index, category in enumerate(self.categories) )
+		self.cache_lock = threading.Lock()
+
+	## This method returns the tuple (is_known, category) for a user.
+	#
+	#  If is_known is False, the preference has to be read from the database. Otherwise, the
+	#  category is the favourite category of the user, or None if the user has no preference.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	def lookup(self, chat_identity):
+
+		with self.cache_lock:
+			index = self.recent_changes.get(chat_identity)
+			if index == None:
+				position = bisect_left(self.chat_identities, chat_identity)
+				if position < len(self.chat_identities) and self.chat_identities[position] == chat_identity:
+					index = self.category_indices[position]
+				elif self.is_complete:
+					index = self.NO_PREFERENCE
+
+			if index == None or index == self.UNKNOWN_PREFERENCE:
+				self.misses += 1
+				return False, None
+
+			self.hits += 1
+			if index == self.NO_PREFERENCE:
+				return True, None
+			return True, self.categories[index]
+
+	## This method stores the preference of a user (None if the user has no preference).
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param category The favourite category of the user
+	def store(self, chat_identity, category):
+
+		with self.cache_lock:
+			self.recent_changes[chat_identity] = self.category_index(category)
+			if len(self.recent_changes) > self.merge_threshold:
+				self.merge_recent_changes()
+
+	## This method forgets the preference of a user, which will be read again from the database.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	def invalidate(self, chat_identity):
+
+		with self.cache_lock:
+			self.recent_changes[chat_identity] = self.UNKNOWN_PREFERENCE
+
+	## This method forgets all the preferences.
+	#
+	#  @param self The object pointer
+	def clear(self):
+
+		with self.cache_lock:
+			self.is_complete = False
+			self.chat_identities = array('l')
+			self.category_indices = array('H')
+			self.recent_changes = {}
+
+	## This method loads all the preferences, replacing the content of the cache.
+	#
+	#  The rows should be sorted by chat identity (they are sorted here otherwise). If a chat
+	#  identity appears more than once, the last row is used.
+	#
+	#  @param self The object pointer
+	#  @param rows An iterable of tuples (chat_identity, category), for example a database cursor
+	def load(self, rows):
+
+		chat_identities = array('l')
+		category_indices = array('H')
+		is_sorted = True
+
+		with self.cache_lock:
+			for chat_identity, category in rows:
+				index = self.category_index(category)
+				if len(chat_identities) > 0 and chat_identities[-1] == chat_identity:
+					category_indices[-1] = index
+					continue
+				if len(chat_identities) > 0 and chat_identities[-1] > chat_identity:
+					is_sorted = False
+				chat_identities.append(chat_identity)
+				category_indices.append(index)
+
+			if not is_sorted:
+				sorted_rows = dict( zip(chat_identities, category_indices) )
+				chat_identities = array('l', sorted(sorted_rows))
+				category_indices = array('H', [ sorted_rows[chat_identity] for chat_identity in chat_identities ])
+
+			self.chat_identities = chat_identities
+			self.category_indices = category_indices
+			self.recent_changes = {}
+			self.is_complete = True
+
+	## This method returns the index associated to a category, adding the category to the list if needed.
+	#
+	#  **NOTE**: The method has to be called while holding the cache lock.
+	#
+	#  @param self The object pointer
+	#  @param category An arXiv category (or None)
+	def category_index(self, category):
+
+		if category == None:
+			return self.NO_PREFERENCE
+
+		index = self.category_positions.get(category)
+		if index == None:
+			index = len(self.categories)
+			self.categories.append(category)
+			self.category_positions[category] = index
+
+		return index
+
+	## This method merges the recent changes into the sorted arrays.
+	#
+	#  The changes which require reading the database again are kept in the dictionary.
+	#
+	#  **NOTE**: The method has to be called while holding the cache lock.
+	#
+	#  @param self The object pointer
+	def merge_recent_changes(self):
+
+		chat_identities = array('l')
+		category_indices = array('H')
+		unknown_changes = {}
+		changes = sorted(self.recent_changes.iteritems())
+		position = 0
+
+		for chat_identity, index in changes:
+			while position < len(self.chat_identities) and self.chat_identities[position] < chat_identity:
+				chat_identities.append(self.chat_identities[position])
+				category_indices.append(self.category_indices[position])
+				position += 1
+			if position < len(self.chat_identities) and self.chat_identities[position] == chat_identity:
+				position += 1
+			if index == self.UNKNOWN_PREFERENCE:
+				unknown_changes[chat_identity] = index
+			else:
+				chat_identities.append(chat_identity)
+				category_indices.append(index)
+
+		chat_identities.extend(self.chat_identities[position:])
+		category_indices.extend(self.category_indices[position:])
+
+		self.chat_identities = chat_identities
+		self.category_indices = category_indices
+		self.recent_changes = unknown_changes
+
+	## This method returns the statistics of the cache.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.cache_lock:
+			return {'users' : len(self.chat_identities),
+					'recent_changes' : len(self.recent_changes),
+					'is_complete' : self.is_complete,
+					'hits' : self.hits,
+					'misses' : self.misses}
+
+## This function estimates the memory (in bytes) used by a value stored in the cache.
+#
+#  The function follows lists, tuples and dictionaries, and sums the size of all their elements.
+#  The papers are measured as they will be once formatted (see arxiv_lib.Paper.estimated_size),
+#  since their fields are formatted only after they are stored.
+#
+#  @param value The value to measure
+def estimate_size(value):
+
+	if isinstance(value, al.Paper):
+		return value.estimated_size()
+
+	size = sys.getsizeof(value)
+
+	if isinstance(value, dict):
+		for key, element in value.iteritems():
+			size += estimate_size(key) + estimate_size(element)
+	elif isinstance(value, (list, tuple)):
+		for element in value:
+			size += estimate_size(element)
+	elif hasattr(value, '__slots__'):
+		for slot in value.__slots__:
+			size += estimate_size(getattr(value, slot, None))
+
+	return size
+
+## The cache of the RSS feeds shared by the whole process.
+FEED_CACHE = FeedCache()
+
+## The cache of the API searches shared by the whole process (1000 searches for 30 minutes, at most 64 MB).
+SEARCH_CACHE = ResultCache(1000, 1800, max_bytes = 64 * 1024 * 1024)
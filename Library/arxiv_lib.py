@@ -1,10 +1,19 @@
 from customised_exceptions import NoArgumentError, GetRequestError, UnknownError, NoCategoryError
+from rate_limiter import RateLimiter
+import arxiv_parser as ap
+import message_packing as mp
 import datetime as dt
+import email.utils
+import urlparse
 import requests
+import requests.adapters
+from requests.packages.urllib3.util.retry import Retry
 import feedparser
 import sys, os
+import time
 import cgi
 import bs4
+import re
 
 ## @package Library.arxiv_lib
 #  Small library for making requests to the arXiv and parsing the results.
@@ -30,6 +39,42 @@ ALL_CATEGORIES = ['stat.AP', 'stat.CO', 'stat.ML', 'stat.ME', 'stat.OT', 'stat.T
 'math.AC', 'math.CV', 'math.DG', 'math.DS', 'math.FA', 'math.GM', 'math.GN', 'math.GT', 'math.GR', 'math.HO', 'math.IT', 'math.KT', 'math.LO',
 'math.MP', 'math.MG', 'math.NT', 'math.NA', 'math.OA', 'math.OC', 'math.PR', 'math.QA', 'math.RT', 'math.RA', 'math.SP', 'math.ST', 'math.SG']
 
+## The rate limiter shared by all the requests to the arXiv (one request every 3 seconds for each host).
+RATE_LIMITER = RateLimiter(3)
+
+## The value of the fields of a @ref Paper which have not been formatted yet
+NOT_FORMATTED = object()
+
+## The fields of the entries kept by a @ref Paper until they are formatted, for each type of feed
+ENTRY_FIELDS = {'API' : ['title', 'authors', 'published'], 'RSS' : ['title', 'author']}
+
+## The regular expression matching the opening and closing tags of the hyper links
+HYPERLINK_TAGS = re.compile(r'<a(?:\s[^<>]*)?>|</a\s*>', re.IGNORECASE)
+
+## The regular expression matching the numeric character references (decimal or hexadecimal)
+CHARACTER_REFERENCE = re.compile(r'&#(?:([0-9]{1,7})|x([0-9a-fA-F]{1,6}));')
+
+## The characters considered as spaces by BeautifulSoup
+ASCII_SPACES = u'\x20\x0a\x09\x0c\x0d'
+
+## The number of seconds to wait for the connection to the arXiv, and for the response
+REQUEST_TIMEOUT = (10, 60)
+
+## The status codes of the responses of the arXiv which are retried (see @ref send_request)
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+
+## The number of times a request is sent again when the arXiv answers with a server error
+SERVER_ERROR_RETRIES = 2
+
+## The number of seconds before the first retry of a request, when the arXiv does not give a Retry-After (then doubled)
+RETRY_BACKOFF = 2
+
+## The maximum number of seconds between the first request and the last retry
+MAX_RETRY_TIME = 30
+
+## Whether the responses of the arXiv are parsed with the streaming parser of @ref arxiv_parser (otherwise FeedParser is used)
+USE_STREAMING_PARSER = True
+
 ## This function returns the number of available arXiv categories.
 def number_categories():
 
@@ -51,17 +96,33 @@ def single_category(category_index):
 ## This function reviews the dictionary obtained from parse_response and returns title, author and link for each entry.
 #
 #  Only title, author and link are passed since they will go to the Telegram Bot.
-#  The output of this function is therefore a list of dictionary with these entries.
-#  Two different behaviours are expected from this function, depending on the
-#  value of feed_type, which can be API or RSS (the first is used for searches,
-#  the second for new submissions)
+#  The output of this function is therefore a list of @ref Paper objects with these entries
+#  (which can be used as dictionaries). Two different behaviours are expected from this
+#  function, depending on the value of feed_type, which can be API or RSS (the first is
+#  used for searches, the second for new submissions)
 #
 #  @param dictionary This is the output of the function @ref parse_response
 #  @param max_number_authors The maximum number of authors to be shown (then they are replaced by 'et al.')
 #  @param feed_type The type of feed to review (can be API or RSS)
 def review_response(dictionary, max_number_authors, feed_type):
 
-	results_list = []
+	results_list = list( iterate_response(dictionary, max_number_authors, feed_type) )
+
+	if len(results_list) == 0:
+		raise NoArgumentError('No entries have been found during the search.')
+	
+	return results_list
+
+## This function returns an iterator over the entries of the dictionary obtained from parse_response, as @ref Paper objects.
+#
+#  The arguments are checked immediately, while the entries are reviewed one at a time. The fields
+#  of each paper are formatted only when they are used, so that the work depends on the number of
+#  papers which are shown, and not on the size of the feed.
+#
+#  @param dictionary This is the output of the function @ref parse_response
+#  @param max_number_authors The maximum number of authors to be shown (then they are replaced by 'et al.')
+#  @param feed_type The type of feed to review (can be API or RSS)
+def iterate_response(dictionary, max_number_authors, feed_type):
 
 	if not isinstance(max_number_authors, int):
 		raise TypeError('The number of authors has to be an integer.')
@@ -78,35 +139,252 @@ def review_response(dictionary, max_number_authors, feed_type):
 	except KeyError:
 		raise NoArgumentError('No entries have been found during the search.')
 
-	for entry in dictionary['entries']:
+	if feed_type not in ['API', 'RSS']:
+		raise ValueError('Wrong feed type. It can only be API or RSS.')
+
+	return generate_papers(dictionary['entries'], max_number_authors, feed_type)
+
+## This generator yields the @ref Paper objects of the entries, and is needed for the @ref iterate_response function.
+#
+#  The updated papers of the RSS feeds and the entries without title, authors and link are skipped.
+#
+#  @param entries The list of entries of the dictionary obtained from parse_response
+#  @param max_number_authors The maximum number of authors to be shown (then they are replaced by 'et al.')
+#  @param feed_type The type of feed to review (can be API or RSS)
+def generate_papers(entries, max_number_authors, feed_type):
+
+	for entry in entries:
 
 		if not isinstance(entry, dict):
 			raise TypeError('One of the entries is corrupted.')
 
-		if feed_type == 'API':
-			element = {'title' : prepare_title_field_API(entry),
-				   	   'authors' : prepare_authors_field_API(entry, max_number_authors),
-				   	   'date' : find_publishing_date(entry)}
-		elif feed_type == 'RSS':
-			if is_update( entry ) == True:
-				continue
-			element = {'title' : prepare_title_field_RSS(entry),
-					   'authors' : prepare_authors_field_RSS(entry, max_number_authors)}
+		if feed_type == 'RSS' and is_update( entry ) == True:
+			continue
+
+		paper = Paper(entry, max_number_authors, feed_type)
+
+		if not paper.is_empty():
+			yield paper
+
+## This class implements a paper found in a feed of the arXiv, whose fields are formatted only when they are used.
+#
+#  The fields can be read as attributes (paper.title) or as in a dictionary (paper['title']), and a
+#  paper is equal to the dictionary with the same fields. The fields are 'title', 'authors', 'link',
+#  and 'date' (only for the API feeds). The paper keeps only the fields of the entry which are needed
+#  (see @ref ENTRY_FIELDS), and releases them once they are all formatted. The HTML fragment shown in
+#  the messages of the Bot is rendered once as well, so that the papers kept in the caches are not
+#  formatted again for each user.
+class Paper(object):
+
+	__slots__ = ('entry', 'max_number_authors', 'feed_type', 'link', 'formatted_title', 'formatted_authors', 'formatted_date',
+				 'rendered_fragment', 'rendered_length')
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param entry The entry of the dictionary obtained from parse_response
+	#  @param max_number_authors The maximum number of authors to be shown (then they are replaced by 'et al.')
+	#  @param feed_type The type of feed (can be API or RSS)
+	def __init__(self, entry, max_number_authors, feed_type):
+
+		self.entry = needed_fields(entry, feed_type)
+		self.max_number_authors = max_number_authors
+		self.feed_type = feed_type
+		self.link = is_field_there(entry, 'link')
+		self.formatted_title = NOT_FORMATTED
+		self.formatted_authors = NOT_FORMATTED
+		self.formatted_date = NOT_FORMATTED if feed_type == 'API' else None
+		self.rendered_fragment = None
+		self.rendered_length = None
+
+	## The formatted title of the paper
+	@property
+	def title(self):
+
+		return self.formatted_field('formatted_title')
+
+	## The formatted authors of the paper
+	@property
+	def authors(self):
+
+		return self.formatted_field('formatted_authors')
+
+	## The publishing date of the paper (only for the API feeds)
+	@property
+	def date(self):
+
+		return self.formatted_field('formatted_date')
+
+	## The HTML fragment of the paper in the messages of the Bot (without the number of the result)
+	@property
+	def fragment(self):
+
+		if self.rendered_fragment == None:
+			fragment = self.render_fragment()
+			self.rendered_length = mp.telegram_length(fragment)
+			self.rendered_fragment = fragment
+
+		return self.rendered_fragment
+
+	## The length of the fragment, as counted by Telegram (see @ref message_packing.telegram_length)
+	@property
+	def fragment_length(self):
+
+		if self.rendered_fragment == None:
+			self.fragment
+
+		return self.rendered_length
+
+	## This method renders the HTML fragment of the paper: the title, the authors, the date (only for the API feeds), and the link.
+	#
+	#  @param self The object pointer
+	def render_fragment(self):
+
+		if self.feed_type == 'API':
+			pieces = ['<em>', self.title, '</em>\n', self.authors, '\n<em>Submitted on ', self.date.strftime('%d %b %Y'), '</em>\n', self.link, '\n\n']
+		else:
+			pieces = ['<em>', self.title, '</em>\n', self.authors, '\n', self.link, '\n\n']
+
+		return ''.join(pieces)
+
+	## This method returns a field of the paper, formatting it if needed.
+	#
+	#  @param self The object pointer
+	#  @param slot The name of the slot of the formatted field
+	def formatted_field(self, slot):
+
+		value = getattr(self, slot)
+
+		if value is NOT_FORMATTED:
+			entry = self.entry
+			# The entry is released only after all the fields have been formatted
+			if entry == None:
+				return getattr(self, slot)
+			value = self.format_field(slot, entry)
+			setattr(self, slot, value)
+			if NOT_FORMATTED not in (self.formatted_title, self.formatted_authors, self.formatted_date):
+				self.entry = None
+
+		return value
+
+	## This method formats a field of the paper from the entry of the feed.
+	#
+	#  @param self The object pointer
+	#  @param slot The name of the slot of the formatted field
+	#  @param entry The entry of the dictionary obtained from parse_response
+	def format_field(self, slot, entry):
+
+		if slot == 'formatted_title':
+			if self.feed_type == 'API':
+				return prepare_title_field_API(entry)
+			return prepare_title_field_RSS(entry)
+		elif slot == 'formatted_authors':
+			if self.feed_type == 'API':
+				return prepare_authors_field_API(entry, self.max_number_authors)
+			return prepare_authors_field_RSS(entry, self.max_number_authors)
 		else:
-			raise ValueError('Wrong feed type. It can only be API or RSS.')
-		
-		element['link'] = is_field_there(entry, 'link')
-		
-		# Check whether all field in the element are None
-		is_empty = element['title'] == None and element['authors'] == None and element['link'] == None
+			return find_publishing_date(entry)
 
-		if not is_empty:
-			results_list.append(element)
+	## This method returns an estimate of the memory (in bytes) used by the paper once it is formatted and rendered.
+	#
+	#  The formatted fields are not longer than the raw ones, and the fragment repeats all of them, so the
+	#  fields still to be formatted are counted twice (and once more if the fragment is not rendered yet).
+	#  The estimate is used by arxiv_cache.estimate_size, since the caches measure the papers when they are stored.
+	#
+	#  @param self The object pointer
+	def estimated_size(self):
 
-	if len(results_list) == 0:
-		raise NoArgumentError('No entries have been found during the search.')
-	
-	return results_list
+		values = [self.link, self.formatted_title, self.formatted_authors, self.formatted_date, self.rendered_fragment]
+		size = sys.getsizeof(self) + sum( sys.getsizeof(value) for value in values if value is not NOT_FORMATTED )
+
+		entry = self.entry
+		entry_size = 0
+		if entry != None:
+			for value in entry.itervalues():
+				entry_size += sys.getsizeof(value)
+				if isinstance(value, list):
+					entry_size += sum( sys.getsizeof(element) + sum( sys.getsizeof(item) for item in element.itervalues() ) for element in value )
+			size += 2 * entry_size
+
+		if self.rendered_fragment == None:
+			formatted_values = [self.link] + [ value for value in values[1:3] if value is not NOT_FORMATTED ]
+			size += entry_size + sum( sys.getsizeof(value) for value in formatted_values )
+
+		return size
+
+	## This method checks whether all the fields of the paper are None (the link is checked first, so that the other fields are not formatted).
+	#
+	#  @param self The object pointer
+	def is_empty(self):
+
+		return self.link == None and self.title == None and self.authors == None
+
+	## This method returns the names of the fields of the paper.
+	#
+	#  @param self The object pointer
+	def keys(self):
+
+		if self.feed_type == 'API':
+			return ['title', 'authors', 'date', 'link']
+		return ['title', 'authors', 'link']
+
+	## This method returns the fields of the paper as a dictionary.
+	#
+	#  @param self The object pointer
+	def as_dict(self):
+
+		return dict( (key, getattr(self, key)) for key in self.keys() )
+
+	def __getitem__(self, key):
+
+		if key not in self.keys():
+			raise KeyError(key)
+
+		return getattr(self, key)
+
+	def __eq__(self, other):
+
+		if isinstance(other, Paper):
+			return self.as_dict() == other.as_dict()
+		if isinstance(other, dict):
+			return self.as_dict() == other
+		return NotImplemented
+
+	def __ne__(self, other):
+
+		is_equal = self.__eq__(other)
+
+		if is_equal is NotImplemented:
+			return is_equal
+
+		return not is_equal
+
+	__hash__ = None
+
+	def __repr__(self):
+
+		return 'Paper(' + repr(self.as_dict()) + ')'
+
+## This function returns the fields of an entry needed to format a @ref Paper (see @ref ENTRY_FIELDS).
+#
+#  The other fields of the entry (for example, the abstract given by FeedParser) are not kept, and
+#  only the names of the authors of the API feeds are kept.
+#
+#  @param entry The entry of the dictionary obtained from parse_response
+#  @param feed_type The type of feed (can be API or RSS)
+def needed_fields(entry, feed_type):
+
+	fields = {}
+
+	for key in ENTRY_FIELDS[feed_type]:
+		value = is_field_there(entry, key)
+		if value != None:
+			fields[key] = value
+
+	if isinstance(fields.get('authors'), list):
+		fields['authors'] = [ {'name' : is_field_there(author, 'name')} for author in fields['authors'] ]
+
+	return fields
 
 ## This function formats the title, and is needed for the review_response.
 #
@@ -136,28 +414,25 @@ def prepare_title_field_API(dictionary):
 def prepare_authors_field_API(dictionary, max_number_authors):
 
 	authors_list = is_field_there(dictionary, 'authors')
-	authors_string = unicode( '' , "utf-8")
-	authors_number = 1
+	authors_names = []
 
 	if isinstance(authors_list, list):
 		for author in authors_list:
 			author_name = is_field_there(author, 'name')
-			if authors_number > max_number_authors:
-				authors_string = authors_string + u'et al.**'
+			if len(authors_names) >= max_number_authors:
+				authors_names.append(u'et al.')
 				break
-			if isinstance(author_name, unicode) and authors_number <= max_number_authors:
-				authors_number +=1
-				authors_string = authors_string + author_name + unicode( ', ' , "utf-8")
+			if isinstance(author_name, unicode):
+				authors_names.append(author_name)
 
 	else:
 		return None
 
 	# Check if we have something in the authors string
-	if len(authors_string) == 0:
+	if len(authors_names) == 0:
 		return None
 	else:
-		authors_string = authors_string[: -2]
-		return authors_string
+		return u', '.join(authors_names)
 
 ## This function prepares the title, and is needed for the review_response.
 #
@@ -189,14 +464,25 @@ def prepare_authors_field_RSS(dictionary, max_number_authors):
 	authors_string = is_field_there(dictionary, 'author')
 
 	if isinstance(authors_string, unicode):
-		end_string = authors_count_same_string(authors_string, max_number_authors)
-		if end_string != -1:
-			authors_string = authors_string[:end_string] + u', et al.'
-		authors_string = remove_hyperlinks(authors_string)
-		return authors_string
+		return normalise_authors_RSS(authors_string, max_number_authors)
 	else:
 		return None
 
+## This function cuts the authors of an RSS entry after max_number_authors, and removes the hyper links.
+#
+#  The string is cut before removing the hyper links, so that only the authors which are shown
+#  are processed (see @ref authors_count_same_string). The output is the same of @ref remove_hyperlinks.
+#
+#  @param authors_string A unicode string with all the authors (and the hyper links)
+#  @param max_number_authors The maximum number of authors to be shown (then they are replaced by 'et al.')
+def normalise_authors_RSS(authors_string, max_number_authors):
+
+	end_string = authors_count_same_string(authors_string, max_number_authors)
+	if end_string != -1:
+		authors_string = authors_string[:end_string] + u', et al.'
+
+	return strip_hyperlinks(authors_string)
+
 ## This function returns the date of the RSS feed (as a datetime object).
 #
 #  This function looks in the dictionary prepared by @ref parse_response, and
@@ -218,6 +504,69 @@ def find_date_RSS(dictionary):
 	else:
 		raise NoArgumentError('The RSS feed does not have the publication date.')
 
+## This function returns the offset (in hours) between the New York time and the UTC time.
+#
+#  The arXiv announces the new submissions following the New York time, which moves
+#  between EST (UTC-5) and EDT (UTC-4). The daylight saving time starts on the second
+#  Sunday of March and ends on the first Sunday of November (at 2am local time).
+#
+#  @param utc_time A datetime object with the UTC time
+def new_york_utc_offset(utc_time):
+
+	march_first = dt.datetime(utc_time.year, 3, 1)
+	days_to_sunday = (6 - march_first.weekday()) % 7
+	dst_start = march_first + dt.timedelta(days = days_to_sunday + 7, hours = 7)
+
+	november_first = dt.datetime(utc_time.year, 11, 1)
+	days_to_sunday = (6 - november_first.weekday()) % 7
+	dst_end = november_first + dt.timedelta(days = days_to_sunday, hours = 6)
+
+	if dst_start <= utc_time < dst_end:
+		return -4
+	else:
+		return -5
+
+## This function returns the UTC time of the arXiv announcement closest to the given time (before or after it).
+#
+#  The new submissions are announced from Sunday to Thursday at 20:00 (New York time).
+#  An announcement happening exactly at the given time is considered a previous one.
+#  This function is needed for @ref next_announcement_time and @ref previous_announcement_time.
+#
+#  @param utc_time A datetime object with the UTC time
+#  @param direction It is +1 to look for the next announcement, and -1 to look for the previous one
+def find_announcement_time(utc_time, direction):
+
+	announcement_weekdays = [6, 0, 1, 2, 3]
+	announcement_hour = 20
+
+	local_time = utc_time + dt.timedelta(hours = new_york_utc_offset(utc_time))
+
+	for days in range(8):
+		local_day = local_time.date() + dt.timedelta(days = direction * days)
+		if local_day.weekday() not in announcement_weekdays:
+			continue
+		local_announcement = dt.datetime.combine(local_day, dt.time(announcement_hour))
+		offset = new_york_utc_offset(local_announcement + dt.timedelta(hours = 5))
+		utc_announcement = local_announcement - dt.timedelta(hours = offset)
+		if direction > 0 and utc_announcement > utc_time:
+			return utc_announcement
+		if direction < 0 and utc_announcement <= utc_time:
+			return utc_announcement
+
+## This function returns the UTC time of the next announcement of new submissions on the arXiv.
+#
+#  @param utc_time A datetime object with the UTC time
+def next_announcement_time(utc_time):
+
+	return find_announcement_time(utc_time, 1)
+
+## This function returns the UTC time of the last announcement of new submissions on the arXiv.
+#
+#  @param utc_time A datetime object with the UTC time
+def previous_announcement_time(utc_time):
+
+	return find_announcement_time(utc_time, -1)
+
 ## This function removes hyper links, and is needed for the prepare_authors_field_RSS.
 #
 #  This function removes the hyper links (<a href = ***> ... </a>) from a string,
@@ -233,6 +582,56 @@ def remove_hyperlinks(string):
 
 	return unicode( str( bs_string ) , "utf-8")
 
+## This function removes the hyper links from a string, giving the same output of @ref remove_hyperlinks.
+#
+#  The string is split at the tags of the hyper links with a precompiled regular expression. As done by
+#  BeautifulSoup, the pieces made only of spaces are replaced by a single space (or newline), and the
+#  numeric character references (such as &#xed;) are replaced by the characters. If some other markup or
+#  entities are left in the string, @ref remove_hyperlinks is used.
+#
+#  @param string A unicode string with hyper links inside
+def strip_hyperlinks(string):
+
+	pieces = []
+
+	for piece in HYPERLINK_TAGS.split(string):
+		if len(piece) == 0:
+			continue
+		if u'&' in piece:
+			piece = CHARACTER_REFERENCE.sub(replace_character_reference, piece)
+		if len(piece.strip(ASCII_SPACES)) == 0:
+			piece = u'\n' if u'\n' in piece else u' '
+		pieces.append(piece)
+
+	stripped_string = u''.join(pieces)
+	markup_left = stripped_string.replace(u'&amp;', u'').replace(u'&lt;', u'').replace(u'&gt;', u'')
+
+	if u'<' in markup_left or u'>' in markup_left or u'&' in markup_left:
+		return remove_hyperlinks(string)
+
+	return stripped_string
+
+## This function returns the character of a numeric character reference, and is needed for the @ref strip_hyperlinks function.
+#
+#  Only the characters which BeautifulSoup writes back as they are (from U+00A0) are replaced, the
+#  other references are left in the string.
+#
+#  @param match The match of @ref CHARACTER_REFERENCE
+def replace_character_reference(match):
+
+	if match.group(1) != None:
+		codepoint = int(match.group(1))
+	else:
+		codepoint = int(match.group(2), 16)
+
+	if codepoint < 0xA0 or 0xD800 <= codepoint < 0xE000 or codepoint > 0x10FFFF:
+		return match.group(0)
+
+	try:
+		return unichr(codepoint)
+	except ValueError:
+		return match.group(0)
+
 ## This function finds where to put 'et al.' in the author string, and is needed for the prepare_authors_field_RSS.
 #
 #  This function finds the position of the "max_number_authors"-th comma in the string,
@@ -322,38 +721,102 @@ def find_publishing_date(dictionary):
 
 ## This function parses the output of the @ref request_to_arxiv function.
 #
-#  This function modifies the response obtained by the request library, making it a raw data (string).
-#  Then, it parses the raw data using FeedParser, and returns a dictionary.
+#  This function parses the response obtained by the request library, and returns a dictionary.
+#  With the streaming parser (see @ref arxiv_parser.parse_feed), the bytes of the response are
+#  read incrementally, and only the fields used by @ref review_response are kept. Otherwise, or
+#  if the response is not well-formed XML, the raw data (string) is parsed using FeedParser.
+#
+#  **NOTE**: The dictionary of the streaming parser only has the fields 'updated' and 'opensearch_totalresults'
+#  in the feed, and 'title', 'link', 'author', 'authors' and 'published' in the entries (see @ref arxiv_parser).
+#  The other fields of FeedParser (for example, 'summary_detail') are only given with streaming = False.
 #
 #  @param response This is the output of the function @ref request_to_arxiv
-def parse_response(response):
+#  @param streaming Whether to use the streaming parser (optional, default is None, the value of @ref USE_STREAMING_PARSER)
+def parse_response(response, streaming = None):
 	
 	if not isinstance(response, requests.models.Response):
 		raise TypeError('The argument passed is not a Response object.')
 
+	if streaming == None:
+		streaming = USE_STREAMING_PARSER
+
+	if streaming:
+		try:
+			return ap.parse_feed(response.content)
+		except ap.ET.ParseError:
+			pass
+
 	rawdata = response.text
 
 	parsed_response = feedparser.parse(rawdata)
 
 	return parsed_response
 
+## This function creates a session for the requests to the arXiv.
+#
+#  The session keeps the connections open between requests (a pool for each host, such as
+#  export.arxiv.org and arxiv.org), asks for compressed responses, and retries the requests
+#  (with an exponential backoff) when the connection to the arXiv cannot be opened.
+#  The session should be closed when it is not needed any more.
+#
+#  **NOTE**: Only the connections are retried by the session, since the request has not reached the
+#  arXiv yet. The requests answered with a server error are retried by @ref send_request, which
+#  goes through the @ref RATE_LIMITER every time.
+#
+#  @param pool_connections The number of hosts whose connections are kept (optional, default is 4)
+#  @param pool_maxsize The maximum number of connections kept for each host (optional, default is 10)
+#  @param max_retries The number of times a connection is retried (optional, default is 3)
+#  @param backoff_factor The number of seconds before the first retry, then doubled (optional, default is 1)
+def create_session(pool_connections = 4, pool_maxsize = 10, max_retries = 3, backoff_factor = 1):
+
+	retries = Retry(total = max_retries,
+					connect = max_retries,
+					read = 0,
+					backoff_factor = backoff_factor,
+					raise_on_status = False)
+
+	adapter = requests.adapters.HTTPAdapter(pool_connections = pool_connections, pool_maxsize = pool_maxsize, max_retries = retries)
+
+	session = requests.Session()
+	session.mount('http://', adapter)
+	session.mount('https://', adapter)
+	session.headers['Accept-Encoding'] = 'gzip, deflate'
+
+	return session
+
 ## This function communicates with the arXiv and download the information.
 #
+#  The requests to the same host are spaced according to the @ref RATE_LIMITER,
+#  so that the fair-use policy of the arXiv is respected by the whole process
+#  (the retries as well, see @ref send_request).
+#
+#  If a validator store is given (see @ref validator_store.ValidatorStore), the request is conditional,
+#  and the stored response is returned when the arXiv answers that it has not been modified. If no
+#  body is stored for the link, the request is sent again without the validators.
+#
 #  @param arxiv_search_link The link to the arXiv website
-def request_to_arxiv(arxiv_search_link):
+#  @param session The requests.Session used for the request, see @ref create_session (optional, default is None, a new connection is used)
+#  @param validator_store The store of the validators of the previous responses (optional, default is None, the request is not conditional)
+def request_to_arxiv(arxiv_search_link, session = None, validator_store = None):
 
 	if not ( isinstance(arxiv_search_link, unicode) or isinstance(arxiv_search_link, str) ):
 		raise TypeError('The argument passed is not a string.')
 
-	# Making a query to the arXiv
-	try:
-		response = requests.get( arxiv_search_link ) 
-	except requests.exceptions.InvalidSchema as invalid_schema:
-		raise invalid_schema
-	except requests.exceptions.MissingSchema as missing_schema:
-		raise missing_schema
-	except:
-		raise GetRequestError('Get from arXiv failed. Might be connection problem')
+	if session == None:
+		session = requests
+
+	headers = {}
+	if validator_store != None:
+		headers = validator_store.conditional_headers(arxiv_search_link)
+
+	response = send_request(arxiv_search_link, session, headers)
+
+	if validator_store != None:
+		response = validator_store.update(arxiv_search_link, response)
+		# The body of the link is not stored, so the request is sent again without the validators
+		if response.status_code == requests.codes.not_modified:
+			response = send_request(arxiv_search_link, session, {})
+			response = validator_store.update(arxiv_search_link, response)
 
 	# Check the status of the response
 	try:
@@ -363,6 +826,68 @@ def request_to_arxiv(arxiv_search_link):
 	else:
 		return response
 
+## This function sends a request to the arXiv, and is needed for the @ref request_to_arxiv function.
+#
+#  Each request goes through the @ref RATE_LIMITER. When the arXiv answers with a server error (see
+#  @ref RETRY_STATUS_CODES), the request is sent again, at most @ref SERVER_ERROR_RETRIES times, after
+#  the number of seconds given by @ref retry_waiting_time. The retries which would be sent more than
+#  @ref MAX_RETRY_TIME seconds after the first request are not made, and the last response is returned.
+#
+#  @param arxiv_search_link The link to the arXiv website
+#  @param session The requests.Session used for the request (or the requests module)
+#  @param headers The dictionary with the headers of the request
+def send_request(arxiv_search_link, session, headers):
+
+	arxiv_host = urlparse.urlparse(arxiv_search_link).netloc
+	start_time = time.time()
+	attempt = 0
+
+	while True:
+		if len(arxiv_host) != 0:
+			RATE_LIMITER.acquire(arxiv_host)
+
+		# Making a query to the arXiv
+		try:
+			response = session.get( arxiv_search_link, headers = headers, timeout = REQUEST_TIMEOUT )
+		except requests.exceptions.InvalidSchema as invalid_schema:
+			raise invalid_schema
+		except requests.exceptions.MissingSchema as missing_schema:
+			raise missing_schema
+		except:
+			raise GetRequestError('Get from arXiv failed. Might be connection problem')
+
+		if response.status_code not in RETRY_STATUS_CODES or attempt >= SERVER_ERROR_RETRIES:
+			return response
+
+		waiting_time = retry_waiting_time(response, attempt)
+
+		if time.time() + waiting_time - start_time > MAX_RETRY_TIME:
+			return response
+
+		attempt += 1
+		time.sleep(waiting_time)
+
+## This function returns the number of seconds to wait before sending again a request which failed with a server error.
+#
+#  The Retry-After header of the response is used if present (as a number of seconds, or as a date).
+#  Otherwise, the waiting time starts from @ref RETRY_BACKOFF seconds and is doubled at each attempt.
+#
+#  @param response The response with the server error
+#  @param attempt The number of retries already made
+def retry_waiting_time(response, attempt):
+
+	retry_after = response.headers.get('Retry-After')
+
+	if retry_after != None:
+		try:
+			return max(float(retry_after), 0.)
+		except ValueError:
+			retry_date = email.utils.parsedate_tz(retry_after)
+			if retry_date != None:
+				return max(email.utils.mktime_tz(retry_date) - time.time(), 0.)
+
+	return RETRY_BACKOFF * 2 ** attempt
+
 ## This function adds to the arXiv link an extra field, which specifies the number of results we want to obtain.
 #
 #  **NOTE**: This function is not used any more, since @ref simple_search now takes care of this.
@@ -0,0 +1,112 @@
+from io import BytesIO
+import xml.etree.cElementTree as ET
+
+## @package Library.arxiv_parser
+#  Micro-library implementing a streaming parser for the feeds of the arXiv.
+#
+#  The generic parser of FeedParser builds the full tree of every entry, while the Bot
+#  only uses a few fields. The parser defined here reads the feed incrementally (with
+#  iterparse), keeps only the fields used by @ref arxiv_lib.review_response, and frees
+#  each entry as soon as it has been read. It understands the Atom feeds of the arXiv API
+#  and the RSS feeds (both RSS 1.0 and RSS 2.0), and returns a dictionary shaped as the
+#  one of FeedParser:
+#
+#      {'feed' : {'updated' : ..., 'opensearch_totalresults' : ...},
+#       'entries' : [{'title' : ..., 'link' : ..., 'author' : ..., 'authors' : [{'name' : ...}], 'published' : ...}]}
+
+ATOM_NAMESPACE = '{http://www.w3.org/2005/Atom}'
+OPENSEARCH_NAMESPACE = '{http://a9.com/-/spec/opensearch/1.1/}'
+RSS_NAMESPACE = '{http://purl.org/rss/1.0/}'
+DUBLIN_CORE_NAMESPACE = '{http://purl.org/dc/elements/1.1/}'
+
+## The tags of the entries, for Atom, RSS 1.0 and RSS 2.0
+ENTRY_TAGS = set([ATOM_NAMESPACE + 'entry', RSS_NAMESPACE + 'item', 'item'])
+
+## The tags giving the date of the feed, in the form {tag : priority} (the lowest priority wins)
+FEED_DATE_TAGS = {ATOM_NAMESPACE + 'updated' : 0,
+				  DUBLIN_CORE_NAMESPACE + 'date' : 0,
+				  'lastBuildDate' : 1,
+				  'pubDate' : 2}
+
+## This function parses a feed of the arXiv (the bytes of the response), and returns a dictionary shaped as the one of FeedParser.
+#
+#  A xml.etree.ElementTree.ParseError is raised if the feed is not well-formed XML.
+#
+#  @param raw_feed The content of the response (a byte string)
+def parse_feed(raw_feed):
+
+	feed = {}
+	entries = []
+	feed_date_priority = None
+	entry_depth = 0
+
+	for event, element in ET.iterparse(BytesIO(raw_feed), events = ('start', 'end')):
+
+		if event == 'start':
+			if element.tag in ENTRY_TAGS:
+				entry_depth += 1
+			continue
+
+		if element.tag in ENTRY_TAGS:
+			entry_depth -= 1
+			entries.append(read_entry(element))
+			element.clear()
+		elif entry_depth > 0:
+			continue
+		elif element.tag == OPENSEARCH_NAMESPACE + 'totalResults':
+			feed['opensearch_totalresults'] = element_text(element)
+		elif element.tag in FEED_DATE_TAGS:
+			priority = FEED_DATE_TAGS[element.tag]
+			if feed_date_priority == None or priority < feed_date_priority:
+				feed['updated'] = element_text(element)
+				feed_date_priority = priority
+
+	return {'feed' : feed, 'entries' : entries}
+
+## This function reads the fields of an entry (Atom) or item (RSS).
+#
+#  @param element The element of the entry
+def read_entry(element):
+
+	entry = {}
+	authors = []
+	links = []
+
+	for child in element:
+		tag = child.tag
+		if tag in [ATOM_NAMESPACE + 'title', RSS_NAMESPACE + 'title', 'title']:
+			entry['title'] = element_text(child)
+		elif tag in [ATOM_NAMESPACE + 'published', 'pubDate']:
+			entry['published'] = element_text(child)
+		elif tag == ATOM_NAMESPACE + 'author':
+			name = element_text(child.find(ATOM_NAMESPACE + 'name'))
+			if name != None:
+				authors.append({'name' : name})
+		elif tag == DUBLIN_CORE_NAMESPACE + 'creator':
+			name = element_text(child)
+			if name != None:
+				authors.append({'name' : name})
+		elif tag == ATOM_NAMESPACE + 'link':
+			links.append(child.attrib)
+		elif tag in [RSS_NAMESPACE + 'link', 'link']:
+			entry['link'] = element_text(child)
+
+	if len(authors) > 0:
+		entry['authors'] = authors
+		entry['author'] = authors[-1]['name']
+
+	if 'link' not in entry and len(links) > 0:
+		alternate_links = [ link for link in links if link.get('rel', 'alternate') == 'alternate' ]
+		entry['link'] = unicode( (alternate_links + links)[0].get('href') )
+
+	return entry
+
+## This function returns the text of an element as a unicode string without the surrounding spaces (None if there is no element).
+#
+#  @param element An element of the feed (or None)
+def element_text(element):
+
+	if element == None:
+		return None
+
+	return unicode(element.text or '').strip()
@@ -16,3 +16,7 @@ class UnknownError(Exception):
 ## Exception raised when a category does not belong to the arXiv
 class NoCategoryError(Exception):
 	pass
+
+## Exception raised when the feed of a category is older than the last announcement of the arXiv
+class StaleFeedError(Exception):
+	pass
@@ -0,0 +1,361 @@
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import threading
+import select
+import re
+import time
+
+## @package Library.database_pool
+#  Micro-library implementing a pool of connections to the PostgreSQL database.
+#
+#  Opening a new connection for every statement costs a full TCP and authentication
+#  handshake. The pool defined here keeps the connections open, checks that they are
+#  still alive before using them, and reconnects (with an exponential backoff) when
+#  the database is not reachable.
+
+## This class counts the connections opened by the psycopg2 pool.
+class CountingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+
+	## Class constructor
+	def __init__(self, minconn, maxconn, *args, **kwargs):
+
+		## The number of connections opened so far
+		self.opened_connections = 0
+
+		super(CountingConnectionPool, self).__init__(minconn, maxconn, *args, **kwargs)
+
+	## This method opens a new connection, and counts it.
+	def _connect(self, key = None):
+
+		connection = super(CountingConnectionPool, self)._connect(key)
+		self.opened_connections += 1
+
+		return connection
+
+## This class implements a thread-safe pool of connections to the database.
+#
+#  The connections are taken from the pool with the @ref cursor method, which is a context manager:
+#
+#      with pool.cursor() as cursor:
+#          cursor.execute(sql_command, parameters)
+#
+#  The transaction is committed when the block ends without errors, and rolled back otherwise.
+#  At most max_connections connections are used at the same time, and the callers wait when
+#  all of them are busy. The pool is created when it is used for the first time.
+class DatabasePool(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param connection_parameters The dictionary with the parameters for psycopg2.connect (dbname, user, password, ...)
+	#  @param min_connections The number of connections kept open (optional, default is 1)
+	#  @param max_connections The maximum number of connections open at the same time (optional, default is 10)
+	#  @param health_check_interval The number of seconds after which an idle connection is checked before use (optional, default is 60)
+	#  @param max_retries The number of attempts to reach the database before giving up (optional, default is 5)
+	#  @param initial_backoff The number of seconds to wait after the first failed attempt, then doubled (optional, default is 0.5)
+	#  @param max_backoff The maximum number of seconds to wait between two attempts (optional, default is 30)
+	#  @param pool_class The class of the underlying pool (optional, default is @ref CountingConnectionPool)
+	#  @param sleep A function waiting for a given number of seconds (optional, default is time.sleep)
+	def __init__(self, connection_parameters, min_connections = 1, max_connections = 10, health_check_interval = 60,
+				 max_retries = 5, initial_backoff = 0.5, max_backoff = 30, pool_class = CountingConnectionPool, sleep = time.sleep):
+
+		if max_connections < 1 or min_connections > max_connections:
+			raise ValueError('The pool needs between min_connections and max_connections (at least one) connections.')
+
+		## The dictionary with the parameters for psycopg2.connect
+		self.connection_parameters = connection_parameters
+
+		## The number of connections kept open
+		self.min_connections = min_connections
+
+		## The maximum number of connections open at the same time
+		self.max_connections = max_connections
+
+		## The number of seconds after which an idle connection is checked before use
+		self.health_check_interval = health_check_interval
+
+		## The number of attempts to reach the database before giving up
+		self.max_retries = max_retries
+
+		## The number of seconds to wait after the first failed attempt
+		self.initial_backoff = initial_backoff
+
+		## The maximum number of seconds to wait between two attempts
+		self.max_backoff = max_backoff
+
+		## The class of the underlying pool
+		self.pool_class = pool_class
+
+		## The function waiting for a given number of seconds
+		self.sleep = sleep
+
+		## The number of connections taken from the pool
+		self.checkouts = 0
+
+		## The number of broken connections which have been replaced
+		self.reconnections = 0
+
+		self.pool = None
+		self.last_used = {}
+		self.pool_lock = threading.Lock()
+		self.available_connections = threading.BoundedSemaphore(max_connections)
+
+	## This method returns a cursor of a connection taken from the pool (it is a context manager).
+	#
+	#  A named cursor is a server-side cursor, which fetches the rows in chunks while they are read.
+	#
+	#  @param self The object pointer
+	#  @param name The name of the cursor (optional, default is None, a client-side cursor)
+	@contextmanager
+	def cursor(self, name = None):
+
+		self.available_connections.acquire()
+
+		try:
+			connection = self.get_connection()
+			is_broken = False
+			try:
+				cursor = connection.cursor(name) if name != None else connection.cursor()
+				try:
+					yield cursor
+					connection.commit()
+				finally:
+					cursor.close()
+			except (psycopg2.OperationalError, psycopg2.InterfaceError):
+				is_broken = True
+				raise
+			except:
+				connection.rollback()
+				raise
+			finally:
+				self.put_connection(connection, is_broken or connection.closed != 0)
+		finally:
+			self.available_connections.release()
+
+	## This method takes a healthy connection from the pool, retrying with an exponential backoff if the database is not reachable.
+	#
+	#  @param self The object pointer
+	def get_connection(self):
+
+		backoff = self.initial_backoff
+
+		for attempt in range(self.max_retries):
+			try:
+				connection = self.get_pool().getconn()
+			except psycopg2.pool.PoolError:
+				raise
+			except psycopg2.OperationalError:
+				if attempt == self.max_retries - 1:
+					raise
+				self.sleep(backoff)
+				backoff = min(2 * backoff, self.max_backoff)
+				continue
+
+			if self.is_healthy(connection):
+				with self.pool_lock:
+					self.checkouts += 1
+				return connection
+
+			self.put_connection(connection, True)
+			with self.pool_lock:
+				self.reconnections += 1
+
+		raise psycopg2.OperationalError('The database cannot be reached.')
+
+	## This method gives a connection back to the pool, closing it if it is broken.
+	#
+	#  @param self The object pointer
+	#  @param connection The connection taken with @ref get_connection
+	#  @param close Whether the connection has to be closed (optional, default is False)
+	def put_connection(self, connection, close = False):
+
+		with self.pool_lock:
+			if close:
+				self.last_used.pop(id(connection), None)
+			else:
+				self.last_used[id(connection)] = time.time()
+
+		self.get_pool().putconn(connection, close = close)
+
+	## This method checks whether a connection is still alive.
+	#
+	#  A connection which has been used recently is assumed to be healthy. Otherwise, a
+	#  trivial query is sent to the database.
+	#
+	#  @param self The object pointer
+	#  @param connection A connection to the database
+	def is_healthy(self, connection):
+
+		if connection.closed != 0:
+			return False
+
+		with self.pool_lock:
+			last_used = self.last_used.get(id(connection))
+
+		if last_used != None and time.time() - last_used < self.health_check_interval:
+			return True
+
+		try:
+			cursor = connection.cursor()
+			cursor.execute('SELECT 1;')
+			cursor.close()
+			connection.rollback()
+		except psycopg2.Error:
+			return False
+
+		return True
+
+	## This method returns the underlying pool, creating it if needed.
+	#
+	#  @param self The object pointer
+	def get_pool(self):
+
+		with self.pool_lock:
+			if self.pool == None:
+				self.pool = self.pool_class(self.min_connections, self.max_connections, **self.connection_parameters)
+			return self.pool
+
+	## This method closes all the connections of the pool.
+	#
+	#  @param self The object pointer
+	def close(self):
+
+		with self.pool_lock:
+			if self.pool != None and not self.pool.closed:
+				self.pool.closeall()
+			self.pool = None
+			self.last_used.clear()
+
+	## This method returns the statistics of the pool.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.pool_lock:
+			opened_connections = getattr(self.pool, 'opened_connections', 0)
+			return {'opened_connections' : opened_connections,
+					'checkouts' : self.checkouts,
+					'reconnections' : self.reconnections}
+
+## This class listens to the notifications sent on a channel of the database (with NOTIFY or pg_notify).
+#
+#  A background thread keeps a dedicated connection open, and calls the notification_function with
+#  the payload of each notification. Since the notifications sent while the connection is down are
+#  lost, the reconnect_function is called every time the connection is opened again.
+class NotificationListener(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param connection_parameters The dictionary with the parameters for psycopg2.connect (dbname, user, password, ...)
+	#  @param channel The name of the channel
+	#  @param notification_function The function called with the payload of each notification
+	#  @param reconnect_function The function called when the connection is opened again (optional, default is None)
+	#  @param poll_interval The number of seconds between two checks of the running flag (optional, default is 5)
+	#  @param reconnect_interval The number of seconds to wait before reconnecting (optional, default is 10)
+	#  @param connect_function The function opening a connection (optional, default is psycopg2.connect)
+	def __init__(self, connection_parameters, channel, notification_function, reconnect_function = None,
+				 poll_interval = 5., reconnect_interval = 10., connect_function = psycopg2.connect):
+
+		if re.match(r'^[a-z_][a-z0-9_]*$', channel) == None:
+			raise ValueError('The channel ' + channel + ' is not a valid identifier.')
+
+		## The dictionary with the parameters for psycopg2.connect
+		self.connection_parameters = connection_parameters
+
+		## The name of the channel
+		self.channel = channel
+
+		## The function called with the payload of each notification
+		self.notification_function = notification_function
+
+		## The function called when the connection is opened again
+		self.reconnect_function = reconnect_function
+
+		## The number of seconds between two checks of the running flag
+		self.poll_interval = poll_interval
+
+		## The number of seconds to wait before reconnecting
+		self.reconnect_interval = reconnect_interval
+
+		## The function opening a connection
+		self.connect_function = connect_function
+
+		## The number of notifications received
+		self.notifications = 0
+
+		## The number of times the connection has been opened
+		self.connections = 0
+
+		self.running = threading.Event()
+		self.listener_thread = None
+
+	## This method starts the background thread.
+	#
+	#  @param self The object pointer
+	def start(self):
+
+		if self.running.is_set():
+			return None
+
+		self.running.set()
+		self.listener_thread = threading.Thread(target = self.work, name = 'NotificationListener-' + self.channel)
+		self.listener_thread.daemon = True
+		self.listener_thread.start()
+
+	## This method stops the background thread.
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait for the background thread (optional, default is None, no limit)
+	def stop(self, timeout = None):
+
+		self.running.clear()
+
+		if self.listener_thread != None:
+			self.listener_thread.join(timeout)
+
+	## This method is run by the background thread, and listens to the channel until the listener is stopped.
+	#
+	#  @param self The object pointer
+	def work(self):
+
+		while self.running.is_set():
+			connection = None
+			try:
+				connection = self.connect_function(**self.connection_parameters)
+				connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+				cursor = connection.cursor()
+				cursor.execute('LISTEN ' + self.channel + ';')
+				cursor.close()
+
+				self.connections += 1
+				if self.connections > 1 and self.reconnect_function != None:
+					self.reconnect_function()
+
+				while self.running.is_set():
+					self.receive_notifications(connection)
+			except (psycopg2.Error, select.error):
+				time.sleep(self.reconnect_interval)
+			finally:
+				if connection != None and connection.closed == 0:
+					connection.close()
+
+	## This method waits for the notifications on a connection, and passes them to the notification_function.
+	#
+	#  @param self The object pointer
+	#  @param connection The connection listening to the channel
+	def receive_notifications(self, connection):
+
+		if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+			return None
+
+		connection.poll()
+		while connection.notifies:
+			notification = connection.notifies.pop(0)
+			self.notifications += 1
+			try:
+				self.notification_function(notification.payload)
+			except:
+				pass
@@ -1,15 +1,81 @@
 from emoji import UNICODE_EMOJI
+import re
 
 ## @package Library.emoji_detect
 #  Micro-library containing functions to filter emoji 
+#
+#  The matcher of the emoji is prepared when the library is imported: the emoji
+#  made of a single character are kept in a set, and the longer sequences are
+#  compiled in a regular expression shaped as a prefix tree (only the sequences
+#  which do not contain a single-character emoji are needed). A message is then
+#  checked in a single scan for each of the two.
+
+## This function returns the regular expression matching any of the given sequences, built as a prefix tree.
+#
+#  The expression matches as soon as the shortest sequence is found, which is enough to detect it.
+#
+#  @param sequences A list of strings
+def sequence_pattern(sequences):
+
+	prefix_tree = {}
+	for sequence in sequences:
+		node = prefix_tree
+		for character in sequence:
+			node = node.setdefault(character, {})
+		node[u''] = {}
+
+	return tree_pattern(prefix_tree)
+
+## This function returns the regular expression of a node of the prefix tree.
+#
+#  @param node The dictionary {character : child node}, where the key '' marks the end of a sequence
+def tree_pattern(node):
+
+	if u'' in node:
+		return u''
+
+	branches = [ re.escape(character) + tree_pattern(child) for character, child in sorted(node.iteritems()) ]
+
+	if len(branches) == 1:
+		return branches[0]
+
+	return u'(?:' + u'|'.join(branches) + u')'
+
+## This function prepares the matcher of the given emoji, and returns the tuple (single_characters, sequence_pattern).
+#
+#  The single_characters is the set of the emoji made of one character, and the sequence_pattern is the
+#  compiled regular expression matching the longer emoji (or None if they are all made of single characters).
+#
+#  @param emoji_list An iterable with the emoji (strings of one or more characters)
+def compile_emoji_matcher(emoji_list):
+
+	single_characters = frozenset( emoji for emoji in emoji_list if len(emoji) == 1 )
+	sequences = [ emoji for emoji in emoji_list if len(emoji) > 1 and not any( character in single_characters for character in emoji ) ]
+
+	if len(sequences) == 0:
+		return single_characters, None
+
+	return single_characters, re.compile(sequence_pattern(sequences), re.UNICODE)
+
+## This function searches a string for the emoji of a matcher.
+#
+#  @param text_msg String with some text
+#  @param emoji_matcher The tuple returned by @ref compile_emoji_matcher
+def contains_emoji(text_msg, emoji_matcher):
+
+	single_characters, sequence_pattern = emoji_matcher
+
+	if not single_characters.isdisjoint(text_msg):
+		return True
+
+	return sequence_pattern != None and sequence_pattern.search(text_msg) != None
+
+## The matcher of the emoji in emoji.UNICODE_EMOJI
+EMOJI_MATCHER = compile_emoji_matcher(UNICODE_EMOJI)
 
 ## This function searches a string searching for emoji
 #
 #  @param text_msg String with some text
 def detect_emoji(text_msg):
 
-    for emoji in UNICODE_EMOJI:
-        if text_msg.find(emoji) != -1:
-        	return True
-
-    return False
+	return contains_emoji(text_msg, EMOJI_MATCHER)
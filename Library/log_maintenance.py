@@ -0,0 +1,170 @@
+import datetime
+import re
+
+## @package Library.log_maintenance
+#  Micro-library implementing the maintenance of the chat and error logs.
+#
+#  The 'chat' and 'errors' tables are partitioned by month (see the migrations in
+#  @ref schema_migrations). The functions defined here create the partitions of the
+#  next months, aggregate the old chat rows into the 'daily_usage' table, and drop
+#  the partitions which are older than the retention period.
+
+## The partitioned tables, in the form {table : time column}.
+PARTITIONED_TABLES = {'chat' : 'message_time', 'errors' : 'error_time'}
+
+## The command aggregating the chat rows of a range of days into the daily_usage table.
+#
+#  The command is the first word of the text messages (without the name of the Bot) and the
+#  first two words of the callbacks. The category is the argument of the `/today` and `/set`
+#  commands. The days already aggregated are computed again, so the command can be repeated.
+ROLLUP_COMMAND = """INSERT INTO daily_usage (usage_date, content_type, command, category, messages, users)
+	SELECT message_time::date,
+		   coalesce(content_type, ''),
+		   CASE WHEN content_type = 'callback' THEN split_part(content, ' ', 1) || ' ' || split_part(content, ' ', 2)
+				WHEN content LIKE '/%%' THEN lower(split_part(split_part(content, ' ', 1), '@', 1))
+				ELSE '' END AS usage_command,
+		   CASE WHEN content ~ '^/(today|set)(@\\S+)?\\s' THEN split_part(regexp_replace(content, '\\s+', ' ', 'g'), ' ', 2)
+				ELSE '' END AS usage_category,
+		   count(*),
+		   count(DISTINCT user_identity)
+	FROM chat
+	WHERE message_time >= %s AND message_time < %s
+	GROUP BY 1, 2, 3, 4
+	ON CONFLICT (usage_date, content_type, command, category) DO UPDATE SET messages = EXCLUDED.messages, users = EXCLUDED.users;"""
+
+## This function returns the first day of the month of a date, moved by a number of months.
+#
+#  @param date A datetime.date
+#  @param months The number of months to add, can be negative (optional, default is 0)
+def month_start(date, months = 0):
+
+	month_index = date.year * 12 + date.month - 1 + months
+
+	return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+## This function returns the first day of the month of a partition from its name, or None if the table is not a monthly partition.
+#
+#  @param table The name of the partitioned table
+#  @param partition The name of the partition (for example, 'chat_2018_01')
+def partition_month(table, partition):
+
+	match = re.match('^' + table + r'_(\d{4})_(\d{2})$', partition)
+
+	if match == None:
+		return None
+
+	return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+## This function creates the partitions of the current month and of the following ones, and returns the number of new partitions.
+#
+#  @param cursor A cursor of the database
+#  @param today The current date
+#  @param months_ahead The number of months after the current one to prepare (optional, default is 2)
+def create_partitions(cursor, today, months_ahead = 2):
+
+	created_partitions = 0
+
+	for table, time_column in sorted(PARTITIONED_TABLES.iteritems()):
+		for months in range(months_ahead + 1):
+			cursor.execute("SELECT create_monthly_partition(%s, %s, %s);", (table, time_column, month_start(today, months)))
+			if cursor.fetchone()[0]:
+				created_partitions += 1
+
+	return created_partitions
+
+## This function returns the names of the monthly partitions of a table.
+#
+#  @param cursor A cursor of the database
+#  @param table The name of the partitioned table
+def list_partitions(cursor, table):
+
+	cursor.execute("SELECT child.relname FROM pg_inherits JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+				   "JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent WHERE parent.relname = %s;", (table,))
+
+	return [ partition for (partition,) in cursor.fetchall() if partition_month(table, partition) != None ]
+
+## This function returns the first day which has not been aggregated in the daily_usage table yet (None if there are no chat rows).
+#
+#  @param cursor A cursor of the database
+def first_day_to_rollup(cursor):
+
+	cursor.execute("SELECT max(usage_date) FROM daily_usage;")
+	last_day = cursor.fetchone()[0]
+
+	if last_day != None:
+		return last_day + datetime.timedelta(days = 1)
+
+	cursor.execute("SELECT min(message_time) FROM chat;")
+	first_message_time = cursor.fetchone()[0]
+
+	if first_message_time == None:
+		return None
+
+	return first_message_time.date()
+
+## This function aggregates the chat rows of the complete days (before today) into the daily_usage table, and returns the number of days aggregated.
+#
+#  @param cursor A cursor of the database
+#  @param today The current date
+#  @param first_day The first day to aggregate (optional, default is None, the day after the last aggregated one)
+def rollup_daily_usage(cursor, today, first_day = None):
+
+	if first_day == None:
+		first_day = first_day_to_rollup(cursor)
+
+	if first_day == None or first_day >= today:
+		return 0
+
+	cursor.execute(ROLLUP_COMMAND, (first_day, today))
+
+	return (today - first_day).days
+
+## This function drops the partitions older than the retention period, and returns the list of dropped partitions.
+#
+#  The chat partitions are dropped only if all their days have been aggregated in the daily_usage table.
+#
+#  @param cursor A cursor of the database
+#  @param today The current date
+#  @param retention_months The number of complete months kept before the current one
+def drop_expired_partitions(cursor, today, retention_months):
+
+	oldest_month = month_start(today, -retention_months)
+	next_day_to_rollup = first_day_to_rollup(cursor)
+
+	dropped_partitions = []
+
+	for table in sorted(PARTITIONED_TABLES):
+		for partition in sorted(list_partitions(cursor, table)):
+			partition_start = partition_month(table, partition)
+			if partition_start >= oldest_month:
+				continue
+			if table == 'chat' and next_day_to_rollup != None and month_start(partition_start, 1) > next_day_to_rollup:
+				continue
+			cursor.execute('DROP TABLE "' + partition + '";')
+			dropped_partitions.append(partition)
+
+	return dropped_partitions
+
+## This function runs all the maintenance jobs, and returns a dictionary with what has been done.
+#
+#  @param database_pool The database_pool.DatabasePool used to reach the database
+#  @param today The current date (optional, default is None, today in UTC)
+#  @param retention_months The number of complete months of logs kept before the current one (optional, default is 12)
+#  @param months_ahead The number of months after the current one to prepare (optional, default is 2)
+def run_maintenance(database_pool, today = None, retention_months = 12, months_ahead = 2):
+
+	if today == None:
+		today = datetime.datetime.utcnow().date()
+
+	with database_pool.cursor() as cursor:
+		created_partitions = create_partitions(cursor, today, months_ahead)
+
+	with database_pool.cursor() as cursor:
+		aggregated_days = rollup_daily_usage(cursor, today)
+
+	with database_pool.cursor() as cursor:
+		dropped_partitions = drop_expired_partitions(cursor, today, retention_months)
+
+	return {'created_partitions' : created_partitions,
+			'aggregated_days' : aggregated_days,
+			'dropped_partitions' : dropped_partitions}
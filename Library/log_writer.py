@@ -0,0 +1,229 @@
+from collections import deque
+import datetime
+import threading
+
+## @package Library.log_writer
+#  Micro-library implementing a write-behind logger for the PostgreSQL database.
+#
+#  The rows of the 'chat' and 'errors' tables are not written while the message is
+#  handled. They are put in a queue in memory, and a background thread writes them
+#  in batches (with a single multi-row INSERT for each table).
+
+## The INSERT commands and the row templates of the tables which can be written by the @ref BatchLogWriter.
+LOG_TABLES = {'chat' : ("INSERT INTO chat (message_time, user_identity, content_type, content, query_identity) VALUES ", "(%s, %s, %s, %s, %s)"),
+			  'errors' : ("INSERT INTO errors (error_time, user_identity, error_type, details) VALUES ", "(%s, %s, %s, %s)")}
+
+## This class writes the log rows into the database in batches, using a background thread.
+#
+#  The rows are written when batch_size rows are waiting, or flush_interval seconds after the
+#  previous write, whichever comes first. The queue holds at most max_queued_rows rows: when it
+#  is full, the new rows are dropped (overflow_policy 'drop') or the caller waits (overflow_policy
+#  'block'). The rows which are dropped or cannot be written are passed to the fallback_function.
+class BatchLogWriter(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param database_pool The database_pool.DatabasePool used to write the rows
+	#  @param batch_size The number of rows which triggers a write (optional, default is 100)
+	#  @param flush_interval The maximum number of seconds a row waits in the queue (optional, default is 2)
+	#  @param max_queued_rows The maximum number of rows in the queue (optional, default is 10000)
+	#  @param overflow_policy What to do when the queue is full, can be 'drop' or 'block' (optional, default is 'drop')
+	#  @param fallback_function The function called with (table, row) for the rows which are not written (optional, default prints them)
+	def __init__(self, database_pool, batch_size = 100, flush_interval = 2., max_queued_rows = 10000, overflow_policy = 'drop', fallback_function = None):
+
+		if overflow_policy not in ['drop', 'block']:
+			raise ValueError('Wrong overflow policy. It can only be drop or block.')
+
+		if batch_size < 1 or max_queued_rows < batch_size:
+			raise ValueError('The queue needs to hold at least one batch of rows.')
+
+		## The database_pool.DatabasePool used to write the rows
+		self.database_pool = database_pool
+
+		## The number of rows which triggers a write
+		self.batch_size = batch_size
+
+		## The maximum number of seconds a row waits in the queue
+		self.flush_interval = flush_interval
+
+		## The maximum number of rows in the queue
+		self.max_queued_rows = max_queued_rows
+
+		## What to do when the queue is full ('drop' or 'block')
+		self.overflow_policy = overflow_policy
+
+		## The function called with (table, row) for the rows which are not written
+		self.fallback_function = fallback_function if fallback_function != None else print_log_row
+
+		## The number of rows written into the database
+		self.written_rows = 0
+
+		## The number of rows dropped because the queue was full
+		self.dropped_rows = 0
+
+		## The number of batches which could not be written
+		self.failed_batches = 0
+
+		self.queued_rows = deque()
+		self.writing_batches = 0
+		self.running = False
+		self.writer_thread = None
+		self.condition = threading.Condition()
+
+	## This method adds a row to the queue, and returns False if the row has been dropped.
+	#
+	#  The background thread is started the first time a row is added.
+	#
+	#  @param self The object pointer
+	#  @param table The name of the table (see @ref LOG_TABLES)
+	#  @param row The tuple with the values of the row
+	def write(self, table, row):
+
+		if table not in LOG_TABLES:
+			raise ValueError('The table ' + table + ' cannot be written by the log writer.')
+
+		self.start()
+
+		with self.condition:
+			while len(self.queued_rows) >= self.max_queued_rows and self.overflow_policy == 'block' and self.running:
+				self.condition.wait()
+			if len(self.queued_rows) >= self.max_queued_rows or not self.running:
+				self.dropped_rows += 1
+				is_dropped = True
+			else:
+				self.queued_rows.append((table, row))
+				is_dropped = False
+				if len(self.queued_rows) >= self.batch_size:
+					self.condition.notify_all()
+
+		if is_dropped:
+			self.fallback_function(table, row)
+
+		return not is_dropped
+
+	## This method starts the background thread, if it is not running.
+	#
+	#  @param self The object pointer
+	def start(self):
+
+		with self.condition:
+			if self.running or self.writer_thread != None:
+				return None
+			self.running = True
+			self.writer_thread = threading.Thread(target = self.work, name = 'BatchLogWriter')
+			self.writer_thread.daemon = True
+			self.writer_thread.start()
+
+	## This method writes all the queued rows, and returns when they have been written.
+	#
+	#  @param self The object pointer
+	def flush(self):
+
+		while True:
+			with self.condition:
+				if len(self.queued_rows) == 0:
+					# Wait for the batches which are being written by other threads
+					while self.writing_batches > 0:
+						self.condition.wait()
+					return None
+			self.write_batch()
+
+	## This method stops the background thread, after writing all the queued rows.
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait for the background thread (optional, default is None, no limit)
+	def close(self, timeout = None):
+
+		with self.condition:
+			self.running = False
+			self.condition.notify_all()
+			writer_thread = self.writer_thread
+
+		if writer_thread != None:
+			writer_thread.join(timeout)
+
+		self.flush()
+
+	## This method is run by the background thread, and writes the rows until the writer is closed.
+	#
+	#  @param self The object pointer
+	def work(self):
+
+		while True:
+			with self.condition:
+				if self.running and len(self.queued_rows) < self.batch_size:
+					self.condition.wait(self.flush_interval)
+				if not self.running and len(self.queued_rows) == 0:
+					return None
+			self.write_batch()
+
+	## This method takes a batch of rows from the queue, and writes it into the database.
+	#
+	#  @param self The object pointer
+	def write_batch(self):
+
+		with self.condition:
+			batch = []
+			while len(self.queued_rows) > 0 and len(batch) < self.batch_size:
+				batch.append(self.queued_rows.popleft())
+			if len(batch) == 0:
+				return None
+			self.writing_batches += 1
+			self.condition.notify_all()
+
+		rows_by_table = {}
+		for table, row in batch:
+			rows_by_table.setdefault(table, []).append(row)
+
+		try:
+			for table, rows in rows_by_table.iteritems():
+				try:
+					self.insert_rows(table, rows)
+				except:
+					with self.condition:
+						self.failed_batches += 1
+					for row in rows:
+						self.fallback_function(table, row)
+		finally:
+			with self.condition:
+				self.writing_batches -= 1
+				self.condition.notify_all()
+
+	## This method writes the rows of a table with a single INSERT command.
+	#
+	#  @param self The object pointer
+	#  @param table The name of the table (see @ref LOG_TABLES)
+	#  @param rows The list of tuples with the values of the rows
+	def insert_rows(self, table, rows):
+
+		sql_command, row_template = LOG_TABLES[table]
+
+		with self.database_pool.cursor() as cursor:
+			values = ','.join( cursor.mogrify(row_template, row) for row in rows )
+			cursor.execute(sql_command + values + ';')
+
+		with self.condition:
+			self.written_rows += len(rows)
+
+	## This method returns the statistics of the writer.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.condition:
+			return {'queued_rows' : len(self.queued_rows),
+					'written_rows' : self.written_rows,
+					'dropped_rows' : self.dropped_rows,
+					'failed_batches' : self.failed_batches}
+
+## This function prints on the stdout a row which could not be written into the database.
+#
+#  @param table The name of the table
+#  @param row The tuple with the values of the row
+def print_log_row(table, row):
+
+	error_time_string = datetime.datetime.utcnow().strftime("%d %b %Y %H:%M:%S")
+	row_string = ' - '.join( unicode(value) for value in row )
+	message_on_stdout = 'Row cannot be saved in table ' + table + '.\n' + error_time_string + ' - ' + row_string
+	print message_on_stdout.encode('utf-8')
@@ -0,0 +1,159 @@
+import re
+
+## @package Library.message_packing
+#  Micro-library implementing the packing of the results into Telegram messages.
+#
+#  Telegram refuses the messages longer than 4096 characters. The limit is applied to the
+#  text shown to the user, after the HTML tags have been removed and the entities decoded,
+#  and the characters are counted in UTF-16 code units (so an emoji outside of the Basic
+#  Multilingual Plane counts twice). The functions defined here measure the items of a reply
+#  in the same way, and pack them into the smallest number of messages, without breaking
+#  any item.
+
+## The maximum length of a Telegram message, in UTF-16 code units of the parsed text.
+TELEGRAM_MAX_LENGTH = 4096
+
+## The regular expression matching the HTML tags.
+HTML_TAG = re.compile(r'<[^>]*>')
+
+## The regular expression matching the HTML entities supported by Telegram (the numeric ones, and four named ones).
+HTML_ENTITY = re.compile(r'&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|(lt|gt|amp|quot));')
+
+## The regular expression matching the pieces of a text which cannot be cut: an entity, a surrogate pair, or a single character.
+TEXT_PIECE = re.compile(u'&(?:#[0-9]+|#[xX][0-9a-fA-F]+|lt|gt|amp|quot);|[\ud800-\udbff][\udc00-\udfff]|.', re.DOTALL)
+
+## The characters of the named entities supported by Telegram.
+NAMED_ENTITIES = {'lt' : u'<', 'gt' : u'>', 'amp' : u'&', 'quot' : u'"'}
+
+## This function returns the length of an HTML message as counted by Telegram.
+#
+#  The HTML tags are removed, the entities are decoded, and the length is given in UTF-16 code units.
+#
+#  @param html_text The message (a unicode string, or a UTF-8 encoded string)
+def telegram_length(html_text):
+
+	if not isinstance(html_text, unicode):
+		html_text = html_text.decode('utf-8')
+
+	parsed_text = HTML_ENTITY.sub(decode_entity, HTML_TAG.sub(u'', html_text))
+
+	return len(parsed_text.encode('utf-16-le')) // 2
+
+## This function returns the character of an HTML entity, and is used by @ref telegram_length.
+#
+#  @param match The match of @ref HTML_ENTITY
+def decode_entity(match):
+
+	decimal_code, hexadecimal_code, name = match.groups()
+
+	if name != None:
+		return NAMED_ENTITIES[name]
+
+	code_point = int(decimal_code) if decimal_code != None else int(hexadecimal_code, 16)
+
+	if code_point > 0x10FFFF:
+		return match.group(0)
+
+	return ('\\U%08x' % code_point).decode('unicode-escape')
+
+## This function groups the items into the smallest number of messages, and returns the list of groups.
+#
+#  The items are kept in order, and each group is as long as possible (which gives the smallest
+#  number of groups). An item longer than max_length is put alone in a group.
+#
+#  @param items The list of rendered items (HTML strings, each one with balanced tags)
+#  @param max_length The maximum length of a message, see @ref telegram_length (optional, default is @ref TELEGRAM_MAX_LENGTH)
+#  @param lengths The list of the lengths of the items, if already known (optional, default is None, they are measured)
+def group_items(items, max_length = TELEGRAM_MAX_LENGTH, lengths = None):
+
+	if lengths == None:
+		lengths = [ telegram_length(item) for item in items ]
+
+	groups = []
+	group = []
+	group_length = 0
+
+	for item, item_length in zip(items, lengths):
+		if len(group) > 0 and group_length + item_length > max_length:
+			groups.append(group)
+			group = []
+			group_length = 0
+		group.append(item)
+		group_length += item_length
+
+	if len(group) > 0:
+		groups.append(group)
+
+	return groups
+
+## This function packs the items into the smallest number of messages, and returns the list of messages.
+#
+#  @param items The list of rendered items (HTML strings, each one with balanced tags)
+#  @param max_length The maximum length of a message, see @ref telegram_length (optional, default is @ref TELEGRAM_MAX_LENGTH)
+#  @param lengths The list of the lengths of the items, if already known (optional, default is None, they are measured)
+def pack_items(items, max_length = TELEGRAM_MAX_LENGTH, lengths = None):
+
+	return [ u''.join(group) for group in group_items(items, max_length, lengths) ]
+
+## This function returns a single message with the first items which fit in it, followed by the last item.
+#
+#  The function is used when the reply has to be a single message (for example, when it is edited).
+#
+#  @param items The list of rendered items (HTML strings, each one with balanced tags)
+#  @param last_item The item closing the message, which is always included (optional, default is an empty string)
+#  @param max_length The maximum length of a message, see @ref telegram_length (optional, default is @ref TELEGRAM_MAX_LENGTH)
+#  @param lengths The list of the lengths of the items, if already known (optional, default is None, they are measured)
+def fit_items(items, last_item = u'', max_length = TELEGRAM_MAX_LENGTH, lengths = None):
+
+	number_items = count_fitting_items(items, last_item, max_length, lengths)
+
+	return u''.join(items[:number_items]) + last_item
+
+## This function returns the number of the first items which fit in a single message with the last item (see @ref fit_items).
+#
+#  @param items The list of rendered items (HTML strings, each one with balanced tags)
+#  @param last_item The item closing the message, which is always included (optional, default is an empty string)
+#  @param max_length The maximum length of a message, see @ref telegram_length (optional, default is @ref TELEGRAM_MAX_LENGTH)
+#  @param lengths The list of the lengths of the items, if already known (optional, default is None, they are measured)
+def count_fitting_items(items, last_item = u'', max_length = TELEGRAM_MAX_LENGTH, lengths = None):
+
+	if lengths == None:
+		lengths = [ telegram_length(item) for item in items ]
+
+	message_length = telegram_length(last_item)
+	number_items = 0
+
+	for item_length in lengths:
+		message_length += item_length
+		if message_length > max_length:
+			break
+		number_items += 1
+
+	return number_items
+
+## This function cuts an item longer than max_length, and returns it as plain text ending with an ellipsis.
+#
+#  The HTML tags are removed, so that none of them is left open, and the entities are never cut.
+#  The items which fit are returned unchanged.
+#
+#  @param html_text The rendered item (a unicode string, or a UTF-8 encoded string)
+#  @param max_length The maximum length of the item, see @ref telegram_length (optional, default is @ref TELEGRAM_MAX_LENGTH)
+def truncate_item(html_text, max_length = TELEGRAM_MAX_LENGTH):
+
+	if telegram_length(html_text) <= max_length:
+		return html_text
+
+	if not isinstance(html_text, unicode):
+		html_text = html_text.decode('utf-8')
+
+	ellipsis = u'\u2026'
+	text_length = telegram_length(ellipsis)
+	pieces = []
+
+	for piece in TEXT_PIECE.findall(HTML_TAG.sub(u'', html_text)):
+		text_length += telegram_length(piece)
+		if text_length > max_length:
+			break
+		pieces.append(piece)
+
+	return u''.join(pieces) + ellipsis
@@ -0,0 +1,129 @@
+import threading
+import time
+
+## @package Library.rate_limiter
+#  Micro-library implementing a thread-safe rate limiter.
+#
+#  The arXiv asks to wait a few seconds between consecutive requests. The limiter
+#  defined here is shared by all the threads of the process, and makes a caller wait
+#  only when its request would come too early after the previous ones.
+
+## This class implements a token-bucket rate limiter, with a separate bucket for each key (for example, each host).
+#
+#  Each bucket is refilled with one token every interval seconds, and holds at most
+#  burst tokens. A caller asking for a token when the bucket is empty is delayed until
+#  the next token is available. The slots are reserved while holding the lock, and the
+#  waiting happens outside of it, so that concurrent callers are served in order.
+class RateLimiter(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param interval The number of seconds needed to refill one token
+	#  @param burst The maximum number of tokens in a bucket (optional, default is 1)
+	#  @param clock A function returning the current time in seconds (optional, default is time.time)
+	#  @param sleep A function waiting for a given number of seconds (optional, default is time.sleep)
+	def __init__(self, interval, burst = 1, clock = time.time, sleep = time.sleep):
+
+		if interval < 0:
+			raise ValueError('The interval between requests cannot be negative.')
+
+		if burst < 1:
+			raise ValueError('The bucket needs to hold at least one token.')
+
+		## The default number of seconds needed to refill one token
+		self.interval = interval
+
+		## The maximum number of tokens in a bucket
+		self.burst = burst
+
+		## The function returning the current time in seconds
+		self.clock = clock
+
+		## The function waiting for a given number of seconds
+		self.sleep = sleep
+
+		## The intervals which differ from the default one, in the form {key : interval}
+		self.key_intervals = {}
+
+		## The time at which each bucket will be full again, in the form {key : time}
+		self.buckets = {}
+
+		## The number of tokens given
+		self.requests = 0
+
+		## The number of tokens for which the caller had to wait
+		self.waits = 0
+
+		## The total number of seconds the callers waited
+		self.total_wait = 0.
+
+		## The longest wait of a caller, in seconds
+		self.max_wait = 0.
+
+		self.lock = threading.Lock()
+
+	## This method sets the interval between requests, either for a specific key or for all of them.
+	#
+	#  @param self The object pointer
+	#  @param interval The number of seconds needed to refill one token
+	#  @param key The key of the bucket (optional, default is None, the default interval is changed)
+	def set_interval(self, interval, key = None):
+
+		if interval < 0:
+			raise ValueError('The interval between requests cannot be negative.')
+
+		with self.lock:
+			if key == None:
+				self.interval = interval
+			else:
+				self.key_intervals[key] = interval
+
+	## This method reserves a token of the bucket, and returns the number of seconds to wait before using it.
+	#
+	#  @param self The object pointer
+	#  @param key The key of the bucket
+	def reserve(self, key):
+
+		with self.lock:
+			now = self.clock()
+			interval = self.key_intervals.get(key, self.interval)
+			bucket_full_time = max(self.buckets.get(key, now), now)
+			wait_time = max(bucket_full_time - now - (self.burst - 1) * interval, 0.)
+			self.buckets[key] = bucket_full_time + interval
+
+			self.requests += 1
+			if wait_time > 0:
+				self.waits += 1
+				self.total_wait += wait_time
+				self.max_wait = max(self.max_wait, wait_time)
+
+		return wait_time
+
+	## This method takes a token from the bucket, waiting if the bucket is empty.
+	#
+	#  The method returns the number of seconds the caller waited.
+	#
+	#  @param self The object pointer
+	#  @param key The key of the bucket
+	def acquire(self, key):
+
+		wait_time = self.reserve(key)
+
+		if wait_time > 0:
+			self.sleep(wait_time)
+
+		return wait_time
+
+	## This method returns the statistics about the waits of the callers.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.lock:
+			average_wait = self.total_wait / self.requests if self.requests > 0 else 0.
+			return {'requests' : self.requests,
+					'waits' : self.waits,
+					'total_wait' : self.total_wait,
+					'average_wait' : average_wait,
+					'max_wait' : self.max_wait}
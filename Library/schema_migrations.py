@@ -0,0 +1,137 @@
+import datetime
+
+## @package Library.schema_migrations
+#  Micro-library implementing the versioned migrations of the PostgreSQL database.
+#
+#  Each migration is a list of SQL commands, applied in a single transaction
+#  together with a new row of the 'schema_version' table. The migrations which
+#  are already recorded in the table are skipped, so that the same runner can
+#  create a new database or upgrade an existing one in place.
+
+## The list of migrations, in the form (version, description, list of SQL commands).
+#
+#  The first migration creates the tables as done by the original postgres_script.py,
+#  and does nothing on a database created with that script.
+MIGRATIONS = [
+	(1, 'Create the tables of the Bot',
+		["CREATE TABLE IF NOT EXISTS preferences ( user_identity integer , category text);",
+		 "CREATE TABLE IF NOT EXISTS feedbacks ( message_time timestamp , user_identity integer , comment text );",
+		 "CREATE TABLE IF NOT EXISTS errors (error_time timestamp, user_identity bigint, error_type text, details text);",
+		 "CREATE TABLE IF NOT EXISTS chat (message_time timestamp , user_identity integer, content_type text, content text, query_identity bigint);"]),
+	(2, 'Use bigint identities, add a unique key on the preferences and time indexes on the logs',
+		["ALTER TABLE preferences ALTER COLUMN user_identity TYPE bigint;",
+		 "ALTER TABLE feedbacks ALTER COLUMN user_identity TYPE bigint;",
+		 "ALTER TABLE chat ALTER COLUMN user_identity TYPE bigint;",
+		 # Keep a single preference for each user before adding the key
+		 "DELETE FROM preferences WHERE user_identity IS NULL;",
+		 "DELETE FROM preferences AS old USING preferences AS new WHERE old.user_identity = new.user_identity AND old.ctid < new.ctid;",
+		 "ALTER TABLE preferences ADD CONSTRAINT preferences_pkey PRIMARY KEY (user_identity);",
+		 "CREATE INDEX IF NOT EXISTS chat_message_time_index ON chat (message_time);",
+		 "CREATE INDEX IF NOT EXISTS errors_error_time_index ON errors (error_time);"]),
+	(3, 'Partition the chat and errors tables by month, and add the daily_usage table (needs PostgreSQL 11)',
+		# The function creates the partition of a month, moving the rows already saved in the default partition
+		["""CREATE OR REPLACE FUNCTION create_monthly_partition(parent_table text, time_column text, month_start date) RETURNS boolean AS $$
+			DECLARE
+				partition_table text := parent_table || '_' || to_char(month_start, 'YYYY_MM');
+				month_end date := (month_start + interval '1 month')::date;
+			BEGIN
+				IF to_regclass(partition_table) IS NOT NULL THEN
+					RETURN false;
+				END IF;
+				EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition_table, parent_table);
+				EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+							   parent_table || '_default', time_column, month_start, time_column, month_end, partition_table);
+				EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent_table, partition_table, month_start, month_end);
+				RETURN true;
+			END;
+		$$ LANGUAGE plpgsql;""",
+		 "ALTER TABLE chat RENAME TO chat_unpartitioned;",
+		 "DROP INDEX IF EXISTS chat_message_time_index;",
+		 "CREATE TABLE chat (message_time timestamp, user_identity bigint, content_type text, content text, query_identity bigint) PARTITION BY RANGE (message_time);",
+		 "CREATE TABLE chat_default PARTITION OF chat DEFAULT;",
+		 "CREATE INDEX chat_message_time_index ON chat (message_time);",
+		 "ALTER TABLE errors RENAME TO errors_unpartitioned;",
+		 "DROP INDEX IF EXISTS errors_error_time_index;",
+		 "CREATE TABLE errors (error_time timestamp, user_identity bigint, error_type text, details text) PARTITION BY RANGE (error_time);",
+		 "CREATE TABLE errors_default PARTITION OF errors DEFAULT;",
+		 "CREATE INDEX errors_error_time_index ON errors (error_time);",
+		 # Create the partitions for the months already in the logs (and the next ones), then copy the rows
+		 """SELECT create_monthly_partition('chat', 'message_time', month_start::date)
+			FROM generate_series(date_trunc('month', coalesce((SELECT min(message_time) FROM chat_unpartitioned), now())),
+								 date_trunc('month', now()) + interval '2 month', interval '1 month') AS month_start;""",
+		 """SELECT create_monthly_partition('errors', 'error_time', month_start::date)
+			FROM generate_series(date_trunc('month', coalesce((SELECT min(error_time) FROM errors_unpartitioned), now())),
+								 date_trunc('month', now()) + interval '2 month', interval '1 month') AS month_start;""",
+		 "INSERT INTO chat (message_time, user_identity, content_type, content, query_identity) SELECT message_time, user_identity, content_type, content, query_identity FROM chat_unpartitioned;",
+		 "INSERT INTO errors (error_time, user_identity, error_type, details) SELECT error_time, user_identity, error_type, details FROM errors_unpartitioned;",
+		 "DROP TABLE chat_unpartitioned;",
+		 "DROP TABLE errors_unpartitioned;",
+		 "CREATE TABLE IF NOT EXISTS daily_usage (usage_date date, content_type text, command text, category text, messages bigint, users bigint, PRIMARY KEY (usage_date, content_type, command, category));"]),
+	(4, 'Add the subscriptions to the daily digest, and the progress of its broadcasts',
+		["ALTER TABLE preferences ADD COLUMN IF NOT EXISTS subscribed boolean NOT NULL DEFAULT false;",
+		 "CREATE INDEX IF NOT EXISTS preferences_subscribed_index ON preferences (category, user_identity) WHERE subscribed;",
+		 "CREATE TABLE IF NOT EXISTS broadcast_progress (category text, feed_date date, last_user_identity bigint, sent_messages bigint NOT NULL DEFAULT 0, finished_time timestamp, PRIMARY KEY (category, feed_date));"]),
+]
+
+## The number used for the advisory lock, which prevents two runners from migrating the database at the same time.
+MIGRATION_LOCK = 20171116
+
+## This function returns the version of the database schema (0 if no migration has been applied).
+#
+#  @param cursor A cursor of the database
+def current_version(cursor):
+
+	cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version integer PRIMARY KEY, description text, applied_time timestamp);")
+	cursor.execute("SELECT max(version) FROM schema_version;")
+	version_tuple = cursor.fetchone()
+
+	if version_tuple == None or version_tuple[0] == None:
+		return 0
+
+	return version_tuple[0]
+
+## This function applies the migrations which are missing from the database, and returns the list of the applied versions.
+#
+#  Each migration is committed separately. If a migration fails, its transaction is rolled back
+#  and the exception is raised, so that the database is left at the previous version.
+#
+#  @param connection A connection to the database
+#  @param target_version The version to be reached (optional, default is None, the last version)
+#  @param migrations The list of migrations (optional, default is @ref MIGRATIONS)
+#  @param report_function The function called with (version, description) before each migration (optional, default is None)
+def migrate(connection, target_version = None, migrations = MIGRATIONS, report_function = None):
+
+	if target_version == None:
+		target_version = max( version for version, description, sql_commands in migrations )
+
+	applied_versions = []
+
+	for version, description, sql_commands in sorted(migrations):
+		if version > target_version:
+			break
+
+		cursor = connection.cursor()
+		try:
+			cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK,))
+			if current_version(cursor) >= version:
+				connection.rollback()
+				continue
+
+			if report_function != None:
+				report_function(version, description)
+
+			for sql_command in sql_commands:
+				cursor.execute(sql_command)
+
+			cursor.execute("INSERT INTO schema_version (version, description, applied_time) VALUES (%s, %s, %s);",
+						   (version, description, datetime.datetime.utcnow()))
+			connection.commit()
+		except:
+			connection.rollback()
+			raise
+		finally:
+			cursor.close()
+
+		applied_versions.append(version)
+
+	return applied_versions
@@ -0,0 +1,410 @@
+from collections import deque
+import itertools
+import threading
+import heapq
+import time
+import telepot
+
+## @package Library.send_queue
+#  Micro-library implementing the queue of the messages sent by the Bot to Telegram.
+#
+#  Telegram limits the messages of a bot to about 30 per second overall, and to about one
+#  per second in the same chat. The queue defined here holds the messages of each chat in
+#  order, and a few background threads send them as fast as these limits allow. When
+#  Telegram asks to slow down (TooManyRequestsError), the message is sent again after the
+#  time given in retry_after, and no other message is sent before that time.
+
+## This class represents a message in the @ref SendQueue, and gives the result of the sending when it is done.
+class PendingMessage(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param arguments The tuple of positional arguments of the send_function
+	#  @param keywords The dictionary of keyword arguments of the send_function
+	#  @param priority The priority of the message, the lowest is sent first
+	def __init__(self, chat_identity, arguments, keywords, priority):
+
+		## The identity number associated to the chat
+		self.chat_identity = chat_identity
+
+		## The tuple of positional arguments of the send_function
+		self.arguments = arguments
+
+		## The dictionary of keyword arguments of the send_function
+		self.keywords = keywords
+
+		## The priority of the message, the lowest is sent first
+		self.priority = priority
+
+		## The number of times the message has been sent
+		self.attempts = 0
+
+		## The value returned by the send_function (None until the message is sent)
+		self.result = None
+
+		## The exception raised by the last attempt (None if the message has been sent)
+		self.exception = None
+
+		self.done_event = threading.Event()
+		self.done_callbacks = []
+		self.callbacks_lock = threading.Lock()
+
+	## This method returns whether the message has been sent, or has failed.
+	#
+	#  @param self The object pointer
+	def done(self):
+
+		return self.done_event.is_set()
+
+	## This method waits for the message, and returns the value of the send_function (or raises its exception).
+	#
+	#  A RuntimeError is raised if the message is not done within the timeout.
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait (optional, default is None, no limit)
+	def wait(self, timeout = None):
+
+		if not self.done_event.wait(timeout):
+			raise RuntimeError('The message has not been sent yet.')
+
+		if self.exception != None:
+			raise self.exception
+
+		return self.result
+
+	## This method calls a function with the message when it is done (straight away, if it is already done).
+	#
+	#  The function is called by the thread which sends the message, so it should return quickly.
+	#
+	#  @param self The object pointer
+	#  @param function The function called with the @ref PendingMessage
+	def add_done_callback(self, function):
+
+		with self.callbacks_lock:
+			if not self.done_event.is_set():
+				self.done_callbacks.append(function)
+				return None
+
+		function(self)
+
+	## This method marks the message as done, and calls the functions given to @ref add_done_callback.
+	#
+	#  The errors of the functions are ignored, so that they cannot stop the thread sending the messages.
+	#
+	#  @param self The object pointer
+	#  @param result The value returned by the send_function
+	#  @param exception The exception raised by the send_function (optional, default is None)
+	def finish(self, result, exception = None):
+
+		self.result = result
+		self.exception = exception
+
+		with self.callbacks_lock:
+			self.done_event.set()
+			done_callbacks = self.done_callbacks
+			self.done_callbacks = []
+
+		for function in done_callbacks:
+			try:
+				function(self)
+			except Exception:
+				pass
+
+## This class sends the messages with a few background threads, respecting the global and per-chat limits of Telegram.
+#
+#  The messages of the same chat are sent one at a time and in order, spaced by chat_interval seconds,
+#  while all the messages are spaced by global_interval seconds. Among the chats which can receive a
+#  message, the one whose next message has the lowest priority number (and then the oldest one) is
+#  served first. The messages which fail are passed to the error_function, called with the
+#  @ref PendingMessage and the exception.
+class SendQueue(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param send_function The function sending a message, called with (chat_identity, *arguments, **keywords)
+	#  @param global_interval The minimum number of seconds between two messages (optional, default is 1/30)
+	#  @param chat_interval The minimum number of seconds between two messages to the same chat (optional, default is 1)
+	#  @param number_workers The number of threads sending the messages (optional, default is 4)
+	#  @param max_attempts The number of times a message is sent when Telegram asks to slow down (optional, default is 5)
+	#  @param error_function The function called with (pending_message, exception) for the failed messages (optional, default is None)
+	#  @param clock A function returning the current time in seconds (optional, default is time.time)
+	def __init__(self, send_function, global_interval = 1. / 30, chat_interval = 1., number_workers = 4, max_attempts = 5,
+				 error_function = None, clock = time.time):
+
+		if global_interval < 0 or chat_interval < 0:
+			raise ValueError('The interval between messages cannot be negative.')
+
+		if number_workers < 1 or max_attempts < 1:
+			raise ValueError('The queue needs at least one worker and one attempt.')
+
+		## The function sending a message
+		self.send_function = send_function
+
+		## The minimum number of seconds between two messages
+		self.global_interval = global_interval
+
+		## The minimum number of seconds between two messages to the same chat
+		self.chat_interval = chat_interval
+
+		## The number of threads sending the messages
+		self.number_workers = number_workers
+
+		## The number of times a message is sent when Telegram asks to slow down
+		self.max_attempts = max_attempts
+
+		## The function called with (pending_message, exception) for the failed messages
+		self.error_function = error_function
+
+		## The function returning the current time in seconds
+		self.clock = clock
+
+		## The number of messages sent
+		self.sent_messages = 0
+
+		## The number of messages which failed
+		self.failed_messages = 0
+
+		## The number of times Telegram asked to slow down
+		self.retried_messages = 0
+
+		self.chat_messages = {}
+		self.chat_ready_times = {}
+		self.waiting_chats = []
+		self.ready_chats = []
+		self.next_send_time = 0.
+		self.sequence = itertools.count()
+		self.running = False
+		self.closed = False
+		self.worker_threads = []
+		self.condition = threading.Condition()
+
+	## This method adds a message to the queue, and returns the @ref PendingMessage.
+	#
+	#  The background threads are started the first time a message is added. A RuntimeError is raised
+	#  if the queue has been closed.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param arguments The positional arguments of the send_function (after the chat identity)
+	#  @param priority The priority of the message, the lowest is sent first (optional, default is 0)
+	#  @param keywords The keyword arguments of the send_function
+	def submit(self, chat_identity, *arguments, **keywords):
+
+		priority = keywords.pop('priority', 0)
+		pending_message = PendingMessage(chat_identity, arguments, keywords, priority)
+
+		with self.condition:
+			self.start()
+			if chat_identity in self.chat_messages:
+				self.chat_messages[chat_identity].append(pending_message)
+			else:
+				self.chat_messages[chat_identity] = deque([pending_message])
+				self.schedule_chat(chat_identity, self.chat_ready_times.pop(chat_identity, 0.))
+			self.condition.notify()
+
+		return pending_message
+
+	## This method starts the background threads, if they are not running.
+	#
+	#  A RuntimeError is raised if the queue has been closed.
+	#
+	#  @param self The object pointer
+	def start(self):
+
+		with self.condition:
+			if self.closed:
+				raise RuntimeError('The queue has been closed.')
+			if self.running or len(self.worker_threads) > 0:
+				return None
+			self.running = True
+			for worker_number in range(self.number_workers):
+				worker_thread = threading.Thread(target = self.work, name = 'SendQueue-' + str(worker_number))
+				worker_thread.daemon = True
+				worker_thread.start()
+				self.worker_threads.append(worker_thread)
+
+	## This method stops the background threads, after sending all the queued messages.
+	#
+	#  No message can be added after the queue is closed.
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait for each background thread (optional, default is None, no limit)
+	def close(self, timeout = None):
+
+		with self.condition:
+			self.closed = True
+			self.running = False
+			self.condition.notify_all()
+			worker_threads = self.worker_threads
+			self.worker_threads = []
+
+		for worker_thread in worker_threads:
+			worker_thread.join(timeout)
+
+	## This method is run by the background threads, and sends the messages until the queue is closed and empty.
+	#
+	#  @param self The object pointer
+	def work(self):
+
+		while True:
+			with self.condition:
+				chat_identity = self.next_chat()
+				if chat_identity == None:
+					return None
+				pending_message = self.chat_messages[chat_identity][0]
+
+			try:
+				result = self.send_function(chat_identity, *pending_message.arguments, **pending_message.keywords)
+			except Exception as exception:
+				self.complete(chat_identity, pending_message, None, exception)
+			else:
+				self.complete(chat_identity, pending_message, result, None)
+
+	## This method waits for a chat which can receive a message, and reserves it (None if the queue is closed and empty).
+	#
+	#  The method is called while holding the lock.
+	#
+	#  @param self The object pointer
+	def next_chat(self):
+
+		while True:
+			now = self.clock()
+
+			while len(self.waiting_chats) > 0 and self.waiting_chats[0][0] <= now:
+				ready_time, sequence, chat_identity = heapq.heappop(self.waiting_chats)
+				priority = self.chat_messages[chat_identity][0].priority
+				heapq.heappush(self.ready_chats, (priority, sequence, chat_identity))
+
+			if len(self.ready_chats) > 0 and self.next_send_time <= now:
+				priority, sequence, chat_identity = heapq.heappop(self.ready_chats)
+				self.next_send_time = max(self.next_send_time, now) + self.global_interval
+				return chat_identity
+
+			if not self.running and len(self.chat_messages) == 0:
+				return None
+
+			wake_times = []
+			if len(self.ready_chats) > 0:
+				wake_times.append(self.next_send_time)
+			if len(self.waiting_chats) > 0:
+				wake_times.append(self.waiting_chats[0][0])
+
+			if len(wake_times) > 0:
+				self.condition.wait(max(min(wake_times) - now, 0.001))
+			else:
+				self.condition.wait()
+
+	## This method records the outcome of a message, and schedules the next message of the chat.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param pending_message The @ref PendingMessage which has been sent
+	#  @param result The value returned by the send_function
+	#  @param exception The exception raised by the send_function (None if the message has been sent)
+	def complete(self, chat_identity, pending_message, result, exception):
+
+		with self.condition:
+			now = self.clock()
+			next_time = now + self.chat_interval
+			pending_message.attempts += 1
+
+			waiting_time = retry_after(exception)
+			is_retried = waiting_time != None and pending_message.attempts < self.max_attempts
+
+			if waiting_time != None:
+				# Telegram asks the whole Bot to slow down, so no message is sent before the given time
+				self.next_send_time = max(self.next_send_time, now + waiting_time)
+
+			if is_retried:
+				# The message stays at the head of the chat, and is sent again later
+				self.retried_messages += 1
+				next_time = max(next_time, now + waiting_time)
+			else:
+				self.chat_messages[chat_identity].popleft()
+				if exception == None:
+					self.sent_messages += 1
+				else:
+					self.failed_messages += 1
+
+			if len(self.chat_messages[chat_identity]) > 0:
+				self.schedule_chat(chat_identity, next_time)
+			else:
+				del self.chat_messages[chat_identity]
+				self.remember_ready_time(chat_identity, next_time, now)
+
+			self.condition.notify_all()
+
+		if is_retried:
+			return None
+
+		pending_message.finish(result, exception)
+
+		if exception != None and self.error_function != None:
+			self.error_function(pending_message, exception)
+
+	## This method stops sending the messages for the given number of seconds (when Telegram asks to slow down outside the queue).
+	#
+	#  @param self The object pointer
+	#  @param seconds The number of seconds to wait before sending the next message
+	def pause(self, seconds):
+
+		with self.condition:
+			self.next_send_time = max(self.next_send_time, self.clock() + seconds)
+			self.condition.notify_all()
+
+	## This method puts a chat in the list of the chats waiting to receive a message.
+	#
+	#  The method is called while holding the lock.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param ready_time The time at which the chat can receive the next message
+	def schedule_chat(self, chat_identity, ready_time):
+
+		heapq.heappush(self.waiting_chats, (ready_time, next(self.sequence), chat_identity))
+
+	## This method remembers when a chat without queued messages can receive the next one.
+	#
+	#  The times which have already passed are forgotten, so that only the recent chats are kept.
+	#  The method is called while holding the lock.
+	#
+	#  @param self The object pointer
+	#  @param chat_identity The identity number associated to the chat
+	#  @param ready_time The time at which the chat can receive the next message
+	#  @param now The current time
+	def remember_ready_time(self, chat_identity, ready_time, now):
+
+		self.chat_ready_times[chat_identity] = ready_time
+
+		if len(self.chat_ready_times) > 1000:
+			for old_chat_identity, old_ready_time in self.chat_ready_times.items():
+				if old_ready_time <= now:
+					del self.chat_ready_times[old_chat_identity]
+
+	## This method returns the statistics of the queue.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.condition:
+			return {'queued_messages' : sum( len(messages) for messages in self.chat_messages.itervalues() ),
+					'queued_chats' : len(self.chat_messages),
+					'sent_messages' : self.sent_messages,
+					'failed_messages' : self.failed_messages,
+					'retried_messages' : self.retried_messages}
+
+## This function returns the number of seconds Telegram asks to wait before sending again (None if the exception is not a TooManyRequestsError).
+#
+#  @param exception The exception raised while sending a message
+def retry_after(exception):
+
+	if not isinstance(exception, telepot.exception.TooManyRequestsError):
+		return None
+
+	try:
+		return float(exception.json['parameters']['retry_after'])
+	except (TypeError, KeyError, ValueError):
+		return 1.
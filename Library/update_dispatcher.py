@@ -0,0 +1,215 @@
+from collections import deque
+import threading
+import time
+
+## @package Library.update_dispatcher
+#  Micro-library implementing a pool of threads for handling the messages received by the Bot.
+#
+#  The messages of different chats are handled at the same time by a bounded number of workers,
+#  while the messages of the same chat are handled one after the other, in the order in which
+#  they have been received (for example, a `/set` followed by a `/today`).
+
+## This class dispatches the updates received from Telegram to a pool of worker threads.
+#
+#  Each update is associated to a key (usually the chat identity) by the key_function. The updates
+#  with the same key are queued, and a key is given to at most one worker at a time. When the total
+#  number of queued updates reaches max_queued_updates, the @ref submit method waits until a worker
+#  takes an update from the queue.
+class UpdateDispatcher(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param handle_function The function handling a single update
+	#  @param key_function The function returning the key (chat identity) of an update
+	#  @param number_workers The number of worker threads (optional, default is 8)
+	#  @param max_queued_updates The maximum number of updates waiting in the queue (optional, default is 1000)
+	#  @param serialize_per_chat Whether the updates with the same key are handled in order (optional, default is True)
+	#  @param clock A function returning the current time in seconds (optional, default is time.time)
+	def __init__(self, handle_function, key_function, number_workers = 8, max_queued_updates = 1000, serialize_per_chat = True, clock = time.time):
+
+		if number_workers < 1:
+			raise ValueError('The dispatcher needs at least one worker.')
+
+		if max_queued_updates < 1:
+			raise ValueError('The queue needs to hold at least one update.')
+
+		## The function handling a single update
+		self.handle_function = handle_function
+
+		## The function returning the key (chat identity) of an update
+		self.key_function = key_function
+
+		## The number of worker threads
+		self.number_workers = number_workers
+
+		## The maximum number of updates waiting in the queue
+		self.max_queued_updates = max_queued_updates
+
+		## Whether the updates with the same key are handled in order
+		self.serialize_per_chat = serialize_per_chat
+
+		## The function returning the current time in seconds
+		self.clock = clock
+
+		## The number of updates handled so far
+		self.processed = 0
+
+		## The number of updates whose handling raised an exception
+		self.failures = 0
+
+		## The total number of seconds the updates waited in the queue
+		self.total_wait = 0.
+
+		## The longest time an update waited in the queue, in seconds
+		self.max_wait = 0.
+
+		## The waiting times of the last 1000 updates, used for the percentiles
+		self.recent_waits = deque(maxlen = 1000)
+
+		self.pending_updates = {}
+		self.ready_keys = deque()
+		self.active_keys = set()
+		self.queued_updates = 0
+		self.update_counter = 0
+		self.running = False
+		self.workers = []
+		self.condition = threading.Condition()
+
+	## This method starts the worker threads.
+	#
+	#  @param self The object pointer
+	def start(self):
+
+		with self.condition:
+			if self.running:
+				return None
+			self.running = True
+
+		self.workers = []
+		for worker_number in range(self.number_workers):
+			worker = threading.Thread(target = self.work, name = 'UpdateWorker-' + str(worker_number))
+			worker.daemon = True
+			worker.start()
+			self.workers.append(worker)
+
+	## This method stops the worker threads, after the queued updates have been handled.
+	#
+	#  @param self The object pointer
+	#  @param timeout The maximum number of seconds to wait for each worker (optional, default is None, no limit)
+	def stop(self, timeout = None):
+
+		with self.condition:
+			self.running = False
+			self.condition.notify_all()
+
+		for worker in self.workers:
+			worker.join(timeout)
+
+	## This method adds an update to the queue.
+	#
+	#  The method can be passed to the telepot.loop.MessageLoop as the function handling the updates.
+	#
+	#  @param self The object pointer
+	#  @param update The update received from Telegram
+	def submit(self, update):
+
+		if self.serialize_per_chat:
+			key = self.key_function(update)
+		else:
+			key = None
+
+		with self.condition:
+			while self.queued_updates >= self.max_queued_updates:
+				self.condition.wait()
+
+			# Without serialization, each update has its own key
+			if key == None:
+				self.update_counter += 1
+				key = ('update', self.update_counter)
+
+			is_waiting = key in self.pending_updates or key in self.active_keys
+			self.pending_updates.setdefault(key, deque()).append((update, self.clock()))
+			self.queued_updates += 1
+
+			if not is_waiting:
+				self.ready_keys.append(key)
+				self.condition.notify_all()
+
+	## This method is run by each worker thread, and handles the updates until the dispatcher is stopped.
+	#
+	#  @param self The object pointer
+	def work(self):
+
+		while True:
+			with self.condition:
+				while self.running and len(self.ready_keys) == 0:
+					self.condition.wait()
+				if len(self.ready_keys) == 0:
+					return None
+				key = self.ready_keys.popleft()
+				update, submission_time = self.pending_updates[key].popleft()
+				if len(self.pending_updates[key]) == 0:
+					del self.pending_updates[key]
+				self.active_keys.add(key)
+				self.queued_updates -= 1
+				self.record_wait(self.clock() - submission_time)
+				self.condition.notify_all()
+
+			try:
+				self.handle_function(update)
+			except:
+				with self.condition:
+					self.failures += 1
+
+			with self.condition:
+				self.processed += 1
+				self.active_keys.discard(key)
+				if key in self.pending_updates:
+					self.ready_keys.append(key)
+					self.condition.notify_all()
+
+	## This method records the time an update waited in the queue.
+	#
+	#  **NOTE**: The method has to be called while holding the lock of the condition.
+	#
+	#  @param self The object pointer
+	#  @param wait_time The number of seconds the update waited
+	def record_wait(self, wait_time):
+
+		self.total_wait += wait_time
+		self.max_wait = max(self.max_wait, wait_time)
+		self.recent_waits.append(wait_time)
+
+	## This method returns the statistics of the dispatcher, including the time the updates waited in the queue.
+	#
+	#  The percentiles are computed on the last 1000 updates.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.condition:
+			started = self.processed + len(self.active_keys)
+			average_wait = self.total_wait / started if started > 0 else 0.
+			sorted_waits = sorted(self.recent_waits)
+			return {'queued' : self.queued_updates,
+					'active' : len(self.active_keys),
+					'processed' : self.processed,
+					'failures' : self.failures,
+					'average_wait' : average_wait,
+					'max_wait' : self.max_wait,
+					'median_wait' : percentile(sorted_waits, 50),
+					'p95_wait' : percentile(sorted_waits, 95)}
+
+## This function returns the given percentile of a sorted list of numbers (or 0 if the list is empty).
+#
+#  @param sorted_values A sorted list of numbers
+#  @param percent The percentile, between 0 and 100
+def percentile(sorted_values, percent):
+
+	if len(sorted_values) == 0:
+		return 0.
+
+	index = int(round( (len(sorted_values) - 1) * percent / 100. ))
+
+	return sorted_values[index]
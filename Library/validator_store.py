@@ -0,0 +1,193 @@
+import threading
+import shelve
+import requests
+
+## @package Library.validator_store
+#  Micro-library implementing the conditional requests to the arXiv.
+#
+#  The RSS feeds of the arXiv change once per announcement, but the Bot asks for them
+#  much more often (for example, while the arXiv has not updated the feed yet). The store
+#  defined here remembers the validators (ETag and Last-Modified) and the body of the last
+#  response for each link, so that the next request can be conditional. When the arXiv
+#  answers that the feed has not been modified (status 304), the stored body is used,
+#  together with the papers already reviewed from it (if they are still in memory), so
+#  that the feed is not parsed again.
+
+## The headers of the response which are stored together with its body.
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+## This class stores the validators and the bodies of the responses, in a shelve file which survives the restarts.
+#
+#  The papers already reviewed are kept only in memory (they are the same objects kept in
+#  the feed cache, so no copy is made). The store is thread-safe.
+class ValidatorStore(object):
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param file_name The name of the shelve file (optional, default is None, the store is kept in memory)
+	def __init__(self, file_name = None):
+
+		## The name of the shelve file (None if the store is kept in memory)
+		self.file_name = file_name
+
+		## The stored responses, in the form {link : {'headers' : ..., 'content' : ...}}
+		self.entries = shelve.open(file_name) if file_name != None else {}
+
+		## The feeds already parsed and reviewed, in the form {link : (validators, (search_list, feed_date))}
+		self.parsed_responses = {}
+
+		## The number of responses which have not been modified since the previous request
+		self.not_modified_responses = 0
+
+		self.lock = threading.Lock()
+
+	## This method returns the headers making the request to a link conditional (an empty dictionary if nothing is stored).
+	#
+	#  @param self The object pointer
+	#  @param link The link of the request
+	def conditional_headers(self, link):
+
+		entry = self.lookup(link)
+
+		if entry == None:
+			return {}
+
+		headers = {}
+
+		if 'ETag' in entry['headers']:
+			headers['If-None-Match'] = entry['headers']['ETag']
+
+		if 'Last-Modified' in entry['headers']:
+			headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+		return headers
+
+	## This method updates the store with the response to a conditional request, and returns the response to be used.
+	#
+	#  If the response has not been modified (status 304), a response with the stored body is returned
+	#  (or the response itself, if no body is stored for the link). If the response has a validator,
+	#  its body is stored for the next request.
+	#
+	#  @param self The object pointer
+	#  @param link The link of the request
+	#  @param response The requests.Response received from the arXiv
+	def update(self, link, response):
+
+		if response.status_code == requests.codes.not_modified:
+			entry = self.lookup(link)
+			if entry == None or len(entry.get('content') or '') == 0:
+				return response
+			with self.lock:
+				self.not_modified_responses += 1
+			return stored_response(link, entry, response)
+
+		if response.status_code != requests.codes.ok or len(validators(response)) == 0:
+			return response
+
+		headers = dict( (name, response.headers[name]) for name in STORED_HEADERS if name in response.headers )
+
+		with self.lock:
+			self.entries[store_key(link)] = {'headers' : headers, 'content' : response.content}
+			if self.file_name != None:
+				self.entries.sync()
+
+		return response
+
+	## This method returns the stored response of a link (None if it is not stored).
+	#
+	#  @param self The object pointer
+	#  @param link The link of the request
+	def lookup(self, link):
+
+		with self.lock:
+			return self.entries.get(store_key(link))
+
+	## This method returns the feed already parsed for a response, or None if the response has been modified since.
+	#
+	#  @param self The object pointer
+	#  @param link The link of the request
+	#  @param response The response returned by @ref update
+	def parsed_response(self, link, response):
+
+		response_validators = validators(response)
+
+		with self.lock:
+			parsed_validators, parsed_feed = self.parsed_responses.get(link, (None, None))
+
+		if len(response_validators) == 0 or parsed_validators != response_validators:
+			return None
+
+		return parsed_feed
+
+	## This method remembers the feed parsed from a response, if the response has a validator.
+	#
+	#  @param self The object pointer
+	#  @param link The link of the request
+	#  @param response The response returned by @ref update
+	#  @param parsed_feed The feed parsed from the response, as the tuple (search_list, feed_date) of the reviewed papers
+	def remember_parsed_response(self, link, response, parsed_feed):
+
+		response_validators = validators(response)
+
+		if len(response_validators) == 0:
+			return None
+
+		with self.lock:
+			self.parsed_responses[link] = (response_validators, parsed_feed)
+
+	## This method closes the shelve file.
+	#
+	#  @param self The object pointer
+	def close(self):
+
+		with self.lock:
+			if self.file_name != None:
+				self.entries.close()
+				self.file_name = None
+				self.entries = {}
+
+	## This method returns the statistics of the store.
+	#
+	#  @param self The object pointer
+	def statistics(self):
+
+		with self.lock:
+			return {'stored_responses' : len(self.entries),
+					'parsed_responses' : len(self.parsed_responses),
+					'not_modified_responses' : self.not_modified_responses}
+
+## This function returns the validators of a response, as a tuple of (header, value) pairs.
+#
+#  @param response A requests.Response
+def validators(response):
+
+	return tuple( (name, response.headers[name]) for name in ['ETag', 'Last-Modified'] if name in response.headers )
+
+## This function returns the key of a link in the shelve file (a byte string).
+#
+#  @param link The link of the request
+def store_key(link):
+
+	if isinstance(link, unicode):
+		return link.encode('utf-8')
+
+	return link
+
+## This function builds the response used in place of a response which has not been modified.
+#
+#  @param link The link of the request
+#  @param entry The stored response, in the form {'headers' : ..., 'content' : ...}
+#  @param not_modified_response The requests.Response with status 304
+def stored_response(link, entry, not_modified_response):
+
+	response = requests.models.Response()
+	response.status_code = requests.codes.ok
+	response.reason = 'OK'
+	response.url = link
+	response.headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+	response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+	response.request = not_modified_response.request
+	response._content = entry['content']
+
+	return response
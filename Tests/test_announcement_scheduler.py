@@ -0,0 +1,134 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import announcement_scheduler as asch
+import datetime as dt
+import threading
+
+# ---------------------------------- ANNOUNCEMENT SCHEDULER TESTS ----------------------------------
+
+# test that a negative delay raises an error
+def test_scheduler_wrong_delay():
+
+	with assert_raises(ValueError):
+		asch.AnnouncementScheduler(lambda: [], lambda category: None, delay = -1)
+
+# test that the warm-up happens a few minutes after the announcement (Thursday 20:00 in New York, Friday 01:00 UTC)
+def test_next_warm_up_time():
+
+	scheduler = asch.AnnouncementScheduler(lambda: [], lambda category: None, delay = 300)
+
+	before_announcement = dt.datetime(2017, 11, 16, 23, 0)
+	during_delay = dt.datetime(2017, 11, 17, 1, 2)
+	after_warm_up = dt.datetime(2017, 11, 17, 1, 5)
+
+	assert_equal( scheduler.next_warm_up_time(before_announcement), dt.datetime(2017, 11, 17, 1, 5), "The warm-up is not after the announcement")
+	assert_equal( scheduler.next_warm_up_time(during_delay), dt.datetime(2017, 11, 17, 1, 5), "The warm-up is skipped during the delay")
+	assert_equal( scheduler.next_warm_up_time(after_warm_up), dt.datetime(2017, 11, 20, 1, 5), "The warm-up is not moved to the next announcement")
+
+# test that a non-positive retry time raises an error
+def test_scheduler_wrong_retry_time():
+
+	with assert_raises(ValueError):
+		asch.AnnouncementScheduler(lambda: [], lambda category: None, retry_time = 0)
+
+# test that the failed categories are tried again, until they are loaded
+def test_warm_up_with_retries():
+
+	attempts = []
+
+	def warm_function(category):
+		attempts.append(category)
+		if category == 'hep-th' and attempts.count('hep-th') < 3:
+			raise ValueError('Stale feed')
+
+	# The clock is always just after the warm-up time, so the next one is days away
+	clock = lambda: dt.datetime(2017, 11, 17, 1, 6)
+
+	scheduler = asch.AnnouncementScheduler(lambda: ['quant-ph', 'hep-th'], warm_function, delay = 300, clock = clock, retry_time = 0.01)
+	report = scheduler.warm_up_with_retries()
+
+	assert_equal( attempts, ['quant-ph', 'hep-th', 'hep-th', 'hep-th'], "Only the failed categories have to be tried again")
+	assert_equal( report['loaded_categories'], ['hep-th'], "The report of the last attempt is wrong")
+	assert_equal( report['failed_categories'], {}, "The category is still failed")
+	assert_equal( scheduler.warm_ups, 3, "The number of warm-ups is wrong")
+
+# test that the failed categories are not tried again after the next warm-up time
+def test_warm_up_retries_stop_at_next_warm_up():
+
+	attempts = []
+
+	def warm_function(category):
+		attempts.append(category)
+		raise ValueError('Stale feed')
+
+	# The clock is always just before the warm-up time
+	clock = lambda: dt.datetime(2017, 11, 17, 1, 4, 59)
+
+	scheduler = asch.AnnouncementScheduler(lambda: ['quant-ph'], warm_function, delay = 300, clock = clock, retry_time = 600)
+	report = scheduler.warm_up_with_retries()
+
+	assert_equal( attempts, ['quant-ph'], "The category is tried again after the next warm-up time")
+	assert_equal( report['failed_categories'], {'quant-ph' : 'ValueError - Stale feed'}, "The failed categories are wrong")
+
+# test that the report records the loaded and failed categories, and the duration of the warm-up
+def test_warm_up_report():
+
+	times = [dt.datetime(2017, 11, 17, 1, 5), dt.datetime(2017, 11, 17, 1, 6)]
+	loaded = []
+	reports = []
+
+	def warm_function(category):
+		if category == 'hep-th':
+			raise ValueError('No feed')
+		loaded.append(category)
+
+	scheduler = asch.AnnouncementScheduler(lambda: ['quant-ph', 'hep-th', 'math.DS'], warm_function,
+										   report_function = reports.append, clock = lambda: times.pop(0))
+	report = scheduler.warm_up()
+
+	assert_equal( loaded, ['quant-ph', 'math.DS'], "The categories are not loaded in order")
+	assert_equal( report['loaded_categories'], ['quant-ph', 'math.DS'], "The loaded categories are wrong")
+	assert_equal( report['failed_categories'], {'hep-th' : 'ValueError - No feed'}, "The failed categories are wrong")
+	assert_equal( report['duration'], 60., "The duration of the warm-up is wrong")
+	assert_equal( reports, [report], "The report is not passed to the report_function")
+	assert_equal( scheduler.last_report, report, "The last report is not kept")
+
+# test that the background thread runs the warm-up when the time comes, and stops
+def test_scheduler_thread():
+
+	warm_up_done = threading.Event()
+
+	def warm_function(category):
+		warm_up_done.set()
+
+	# The clock is always just before the warm-up time
+	clock = lambda: dt.datetime(2017, 11, 17, 1, 4, 59, 950000)
+
+	scheduler = asch.AnnouncementScheduler(lambda: ['quant-ph'], warm_function, delay = 300, clock = clock)
+	scheduler.start()
+	warm_up_done.wait(5)
+	scheduler.stop(5)
+
+	assert_equal( warm_up_done.is_set(), True, "The warm-up has not been done")
+	assert_equal( scheduler.scheduler_thread, None, "The background thread has not stopped")
+
+# test that the warm-up is run straight away when asked, without waiting for the next announcement
+def test_scheduler_run_now():
+
+	warm_up_done = threading.Event()
+
+	def warm_function(category):
+		warm_up_done.set()
+
+	# The clock is always just after the warm-up time, so the next one is days away
+	clock = lambda: dt.datetime(2017, 11, 17, 1, 6)
+
+	scheduler = asch.AnnouncementScheduler(lambda: ['quant-ph'], warm_function, delay = 300, clock = clock)
+	scheduler.start(run_now = True)
+	warm_up_done.wait(5)
+	scheduler.stop(5)
+
+	assert_equal( warm_up_done.is_set(), True, "The warm-up has not been run straight away")
+	assert_equal( scheduler.warm_ups, 1, "The number of warm-ups is wrong")
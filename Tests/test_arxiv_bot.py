@@ -0,0 +1,121 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import arxiv_bot as ab
+import arxiv_lib as al
+import message_packing as mp
+import update_dispatcher as ud
+
+# This function returns a page of results of the API, whose authors have very long names
+def long_author_results(number_results, name_length):
+
+	entries = [ {'title' : u'A paper on quantum channels number ' + unicode(index),
+				 'authors' : [ {'name' : u'Author' + unicode(index) + u' ' + u'x' * name_length} for author in range(5) ],
+				 'published' : u'2017-11-16T15:44:29Z',
+				 'link' : u'http://arxiv.org/abs/1711.0000' + unicode(index)} for index in range(number_results) ]
+
+	return al.review_response({'entries' : entries}, 5, 'API')
+
+# ---------------------------------- SEARCH PAGES TESTS ----------------------------------
+
+# test that the results left out of a page with long author lists are shown in the next page
+def test_prepare_message_api_long_authors():
+
+	bot = ab.ArxivBot('123:offline', 'test', 'test', 'test')
+	search_list = long_author_results(bot.max_api_result_number, 200)
+
+	message, number_results_shown = bot.prepare_message_api(['quantum'], 20, search_list, 500)
+	keyboard = bot.search_prev_next_keyboard(20, 500, number_results_shown)
+	bot.close()
+
+	callback_data = [ button.callback_data for button in keyboard.inline_keyboard[0] ]
+
+	assert_equal( 0 < number_results_shown < bot.max_api_result_number, True, "The page is not cut by the size limit")
+	assert_equal( mp.telegram_length(message) <= bot.max_characters_chat, True, "The message is too long for Telegram")
+	assert_equal( u'<b>' + unicode(20 + number_results_shown) + u'</b>.' in message, True, "The last result shown is not numbered correctly")
+	assert_equal( u'<b>' + unicode(21 + number_results_shown) + u'</b>.' in message, False, "A result left out is in the message")
+	assert_equal( callback_data, ['search close None', 'search previous 10', 'search next ' + str(20 + number_results_shown)], "The next page does not start from the first result left out")
+
+# test that a first result longer than a message is cut, so that the next page moves forward
+def test_prepare_message_api_oversized_result():
+
+	bot = ab.ArxivBot('123:offline', 'test', 'test', 'test')
+	search_list = long_author_results(3, 2000)
+
+	message, number_results_shown = bot.prepare_message_api(['quantum'], 0, search_list, 500)
+	bot.close()
+
+	assert_equal( number_results_shown, 1, "The oversized result is not shown")
+	assert_equal( mp.telegram_length(message) <= bot.max_characters_chat, True, "The message is too long for Telegram")
+	assert_equal( message.endswith(u'There are 500 results associated with this search.'), True, "The total number of results is missing")
+
+# test that all the results of a page are shown when they fit, and the last page has no next button
+def test_prepare_message_api_short_authors():
+
+	bot = ab.ArxivBot('123:offline', 'test', 'test', 'test')
+	search_list = long_author_results(3, 5)
+
+	message, number_results_shown = bot.prepare_message_api(['quantum'], 0, search_list, 3)
+	keyboard = bot.search_prev_next_keyboard(0, 3, number_results_shown)
+	bot.close()
+
+	assert_equal( number_results_shown, 3, "Some results are left out")
+	assert_equal( [ button.callback_data for button in keyboard.inline_keyboard[0] ], ['search close None'], "The next button is shown after the last result")
+
+# test that a page crossing the end of a block of downloaded results is completed with the next block
+def test_complete_page_of_results():
+
+	bot = ab.ArxivBot('123:offline', 'test', 'test', 'test')
+	bot.close()
+
+	blocks = {}
+	for block_start in [0, 50, 100]:
+		search_link = al.simple_search(['quantum'], bot.arxiv_search_link, block_start, bot.api_prefetch_window)
+		blocks[search_link] = (range(block_start, min(block_start + bot.api_prefetch_window, 120)), 120)
+	bot.cached_search_and_format_API = lambda search_link, chat_identity: blocks[search_link]
+
+	for start_number, expected_list in [(48, range(48, 58)), (45, range(45, 55)), (115, range(115, 120))]:
+		block_start = bot.prefetch_block_start(start_number)
+		search_link = al.simple_search(['quantum'], bot.arxiv_search_link, block_start, bot.api_prefetch_window)
+		search_list, total_results = bot.select_page_of_results(blocks[search_link], start_number, block_start)
+		search_list = bot.complete_page_of_results(['quantum'], search_list, start_number, total_results, 1)
+
+		assert_equal( search_list, expected_list, "The page starting from " + str(start_number) + " is not complete")
+
+# ---------------------------------- CLOSE TESTS ----------------------------------
+
+# test that a bot whose constructor failed partway can be closed
+def test_close_partially_built_bot():
+
+	bot = ab.ArxivBot.__new__(ab.ArxivBot)
+	bot.announcement_scheduler = None
+	bot.arxiv_session = al.create_session()
+
+	bot.close()
+
+	assert_equal(bot.announcement_scheduler, None, "The attributes are changed by close")
+
+# ---------------------------------- UPDATE DISPATCHER TESTS ----------------------------------
+
+# test that the errors of the handled messages are counted by the dispatcher
+def test_handle_and_report_failures():
+
+	bot = ab.ArxivBot('123:offline', 'test', 'test', 'test')
+	bot.close()
+
+	def handle(msg):
+		if msg['text'] == 'fail':
+			raise ValueError('The message cannot be handled.')
+	bot.handle = handle
+
+	dispatcher = ud.UpdateDispatcher(bot.handle_and_report, lambda msg: msg['chat'], number_workers = 2)
+	dispatcher.start()
+	for text in ['fail', 'ok', 'fail']:
+		dispatcher.submit({'chat' : 1, 'text' : text})
+	dispatcher.stop()
+
+	statistics = dispatcher.statistics()
+
+	assert_equal(statistics['processed'], 3, "Some messages have not been handled")
+	assert_equal(statistics['failures'], 2, "The errors of the messages are not counted")
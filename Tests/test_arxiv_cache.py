@@ -0,0 +1,218 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import arxiv_cache as ac
+import datetime
+
+# A clock which can be moved forward by the tests
+class FakeClock(object):
+
+	def __init__(self, now):
+		self.now = now
+
+	def __call__(self):
+		return self.now
+
+# ---------------------------------- FEED CACHE TESTS ----------------------------------
+
+# test that the feed is loaded only once, until the next announcement
+def test_feed_cache_single_load():
+
+	clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0))
+	cache = ac.FeedCache(clock = clock)
+	calls = []
+
+	def loader():
+		calls.append(1)
+		return ['paper'], datetime.datetime(2018, 1, 4)
+
+	for i in range(5):
+		obtained_value = cache.get('quant-ph', loader)
+
+	assert_equal(obtained_value, (['paper'], datetime.datetime(2018, 1, 4)), "The obtained feed is different from the expected one")
+	assert_equal(len(calls), 1, "The feed has been loaded more than once")
+	assert_equal(cache.hits, 4, "The number of hits is different from the expected one")
+	assert_equal(cache.misses, 1, "The number of misses is different from the expected one")
+
+	# After the announcement of Sunday night, the feed is loaded again
+	clock.now = datetime.datetime(2018, 1, 8, 1, 0)
+	cache.get('quant-ph', loader)
+
+	assert_equal(len(calls), 2, "The feed has not been loaded after the announcement")
+
+# test that different categories are stored separately
+def test_feed_cache_categories():
+
+	clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0))
+	cache = ac.FeedCache(clock = clock)
+
+	cache.get('quant-ph', lambda: (['quantum'], datetime.datetime(2018, 1, 4)))
+	obtained_value = cache.get('hep-th', lambda: (['high energy'], datetime.datetime(2018, 1, 4)))
+
+	assert_equal(obtained_value[0], ['high energy'], "The obtained feed is different from the expected one")
+
+# test that a feed older than the last announcement expires soon
+def test_feed_cache_stale_feed():
+
+	clock = FakeClock(datetime.datetime(2018, 1, 5, 1, 5))
+	cache = ac.FeedCache(stale_retry_time = 600, clock = clock)
+
+	expected_time = datetime.datetime(2018, 1, 5, 1, 15)
+	obtained_time = cache.expiry_time(datetime.datetime(2018, 1, 3))
+	assert_equal(obtained_time, expected_time, "The obtained expiry time is different from the expected one")
+
+	expected_time = datetime.datetime(2018, 1, 8, 1, 0)
+	obtained_time = cache.expiry_time(datetime.datetime(2018, 1, 4))
+	assert_equal(obtained_time, expected_time, "The obtained expiry time is different from the expected one")
+
+# test that a feed is stale only if it is older than the day of the last announcement
+def test_feed_cache_is_stale():
+
+	cache = ac.FeedCache(clock = FakeClock(datetime.datetime(2018, 1, 5, 1, 5)))
+
+	assert_equal(cache.is_stale(datetime.datetime(2018, 1, 3)), True, "The feed of the previous announcement is not stale")
+	assert_equal(cache.is_stale(datetime.datetime(2018, 1, 4)), False, "The feed of the last announcement is stale")
+
+# test that nothing is cached when the loader fails
+def test_feed_cache_loader_error():
+
+	cache = ac.FeedCache(clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0)))
+
+	def loader():
+		raise ValueError('The feed cannot be downloaded.')
+
+	with assert_raises(ValueError):
+		cache.get('quant-ph', loader)
+
+	assert_equal(cache.lookup('quant-ph'), None, "The failed feed has been cached")
+
+# test that the cache can be invalidated
+def test_feed_cache_invalidate():
+
+	cache = ac.FeedCache(clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0)))
+
+	cache.get('quant-ph', lambda: (['quantum'], datetime.datetime(2018, 1, 4)))
+	cache.invalidate('quant-ph')
+
+	assert_equal(cache.lookup('quant-ph'), None, "The feed has not been removed from the cache")
+
+# ---------------------------------- RESULT CACHE TESTS ----------------------------------
+
+# test that the cache needs to hold at least one entry
+def test_result_cache_wrong_size():
+
+	with assert_raises(ValueError):
+		ac.ResultCache(0, 60)
+
+# test that the stored values are returned, and that hits and misses are counted
+def test_result_cache_hit_miss():
+
+	cache = ac.ResultCache(10, 60, clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0)))
+
+	assert_equal(cache.lookup('link'), None, "The obtained value is different from the expected one")
+
+	cache.store('link', ([{'title' : u'Title'}], 13))
+
+	assert_equal(cache.lookup('link'), ([{'title' : u'Title'}], 13), "The obtained value is different from the expected one")
+	assert_equal(cache.hits, 1, "The number of hits is different from the expected one")
+	assert_equal(cache.misses, 1, "The number of misses is different from the expected one")
+
+# test that the entries expire after their time to live
+def test_result_cache_expiration():
+
+	clock = FakeClock(datetime.datetime(2018, 1, 5, 12, 0))
+	cache = ac.ResultCache(10, 60, clock = clock)
+
+	cache.store('link', ([], 0))
+	clock.now = datetime.datetime(2018, 1, 5, 12, 1)
+
+	assert_equal(cache.lookup('link'), None, "The expired value has been returned")
+	assert_equal(cache.expirations, 1, "The number of expirations is different from the expected one")
+	assert_equal(cache.current_bytes, 0, "The size of the cache is different from the expected one")
+
+# test that the least recently used entry is evicted
+def test_result_cache_lru_eviction():
+
+	cache = ac.ResultCache(2, 60)
+
+	cache.store('first', ([], 1))
+	cache.store('second', ([], 2))
+	cache.lookup('first')
+	cache.store('third', ([], 3))
+
+	assert_equal(cache.lookup('second'), None, "The least recently used entry has not been evicted")
+	assert_equal(cache.lookup('first'), ([], 1), "The obtained value is different from the expected one")
+	assert_equal(cache.lookup('third'), ([], 3), "The obtained value is different from the expected one")
+	assert_equal(cache.evictions, 1, "The number of evictions is different from the expected one")
+
+# test that the memory limit is respected
+def test_result_cache_memory_limit():
+
+	value = ([{'title' : u'A title which takes some memory'}], 1)
+	value_size = ac.estimate_size(value)
+	cache = ac.ResultCache(100, 60, max_bytes = 2 * value_size)
+
+	for key in ['first', 'second', 'third']:
+		cache.store(key, value)
+
+	assert_equal(len(cache.entries), 2, "The number of entries is different from the expected one")
+	assert_equal(cache.current_bytes, 2 * value_size, "The size of the cache is different from the expected one")
+
+	cache.set_limits(100, max_bytes = value_size - 1)
+
+	assert_equal(len(cache.entries), 0, "The entries exceeding the new limit have not been evicted")
+	assert_equal(cache.evictions, 3, "The number of evictions is different from the expected one")
+
+# ---------------------------------- PREFERENCE CACHE TESTS ----------------------------------
+
+# test that a partial cache needs the database for the unknown users
+def test_preference_cache_partial():
+
+	cache = ac.PreferenceCache()
+
+	assert_equal(cache.lookup(123), (False, None), "The unknown user is not in the partial cache.")
+
+	cache.store(123, 'quant-ph')
+	cache.store(456, None)
+
+	assert_equal(cache.lookup(123), (True, 'quant-ph'), "The stored preference is not found.")
+	assert_equal(cache.lookup(456), (True, None), "The missing preference is not cached.")
+	assert_equal((cache.hits, cache.misses), (2, 1), "The hits and misses are not counted correctly.")
+
+# test that a complete cache knows that the missing users have no preference
+def test_preference_cache_load():
+
+	cache = ac.PreferenceCache()
+	cache.load([(30, 'hep-th'), (10, 'quant-ph'), (20, 'gr-qc'), (10, 'math-ph')])
+
+	assert_equal(cache.lookup(10), (True, 'math-ph'), "The last row of a user is not used.")
+	assert_equal(cache.lookup(20), (True, 'gr-qc'), "The unsorted rows are not loaded correctly.")
+	assert_equal(cache.lookup(15), (True, None), "The missing user should have no preference.")
+	assert_equal(len(cache.chat_identities), 3, "The users are not stored in the arrays.")
+
+# test that the recent changes are merged into the arrays without losing preferences
+def test_preference_cache_merge():
+
+	cache = ac.PreferenceCache(merge_threshold = 2)
+	cache.load([(10, 'quant-ph'), (20, 'gr-qc'), (30, 'hep-th')])
+
+	cache.store(20, 'cond-mat')
+	cache.invalidate(30)
+	cache.store(5, 'unknown-category')
+
+	assert_equal(list(cache.chat_identities), [5, 10, 20], "The changes are not merged into the arrays.")
+	assert_equal(cache.recent_changes, {30 : ac.PreferenceCache.UNKNOWN_PREFERENCE}, "The invalidated user is not kept apart.")
+	assert_equal(cache.lookup(5), (True, 'unknown-category'), "The new category is not stored.")
+	assert_equal(cache.lookup(20), (True, 'cond-mat'), "The preference is not overwritten.")
+	assert_equal(cache.lookup(30), (False, None), "The invalidated user should be read from the database.")
+
+# test that clearing the cache makes it partial again
+def test_preference_cache_clear():
+
+	cache = ac.PreferenceCache()
+	cache.load([(10, 'quant-ph')])
+	cache.clear()
+
+	assert_equal(cache.lookup(10), (False, None), "The cache is not cleared.")
+	assert_equal(cache.lookup(20), (False, None), "The cleared cache should be partial.")
@@ -293,6 +293,91 @@ def test_request_to_arxiv_wrong_link_format():
 	with assert_raises(requests.exceptions.MissingSchema):
 		al.request_to_arxiv(link)
 
+# test that the session passed to al.request_to_arxiv is the one making the request
+def test_request_to_arxiv_with_session():
+
+	class FakeResponse(object):
+		status_code = 200
+		def raise_for_status(self):
+			pass
+
+	class FakeSession(object):
+		def __init__(self):
+			self.requested_links = []
+		def get(self, link, headers = None, timeout = None):
+			self.requested_links.append(link)
+			return FakeResponse()
+
+	link = 'http://export.arxiv.org/api/query?search_query=au:sparaciari_c'
+	session = FakeSession()
+
+	al.request_to_arxiv(link, session)
+
+	assert_equal( session.requested_links, [link], "The request has not been made with the session")
+
+# A fake session, which answers with the given status codes and Retry-After headers
+class RetrySession(object):
+
+	def __init__(self, answers):
+		self.answers = list(answers)
+		self.requests = 0
+
+	def get(self, link, headers = None, timeout = None):
+		status_code, retry_after = self.answers.pop(0)
+		self.requests += 1
+		response = requests.models.Response()
+		response.status_code = status_code
+		if retry_after != None:
+			response.headers['Retry-After'] = retry_after
+		return response
+
+# test that the server errors are retried through the rate limiter, after the time given by Retry-After
+def test_request_to_arxiv_server_error_retried():
+
+	link = 'http://retry.arxiv.test/rss/quant-ph'
+	al.RATE_LIMITER.set_interval(0, 'retry.arxiv.test')
+	session = RetrySession([(503, '0'), (502, None), (200, None)])
+	backoff = al.RETRY_BACKOFF
+	rate_limited_requests = al.RATE_LIMITER.statistics()['requests']
+
+	try:
+		al.RETRY_BACKOFF = 0
+		response = al.request_to_arxiv(link, session)
+	finally:
+		al.RETRY_BACKOFF = backoff
+
+	assert_equal( response.status_code, 200, "The server error has not been retried")
+	assert_equal( session.requests, 3, "The number of requests is wrong")
+	assert_equal( al.RATE_LIMITER.statistics()['requests'] - rate_limited_requests, 3, "The retries skip the rate limiter")
+
+# test that the retries are given up when the arXiv asks to wait too long
+def test_request_to_arxiv_server_error_long_wait():
+
+	link = 'http://retry.arxiv.test/rss/quant-ph'
+	al.RATE_LIMITER.set_interval(0, 'retry.arxiv.test')
+	session = RetrySession([(503, str(al.MAX_RETRY_TIME + 1)), (200, None)])
+
+	with assert_raises(requests.exceptions.HTTPError):
+		al.request_to_arxiv(link, session)
+
+	assert_equal( session.requests, 1, "The request has been retried after too long")
+
+# test that the session keeps a pool of connections, asks for compressed responses, and retries only the connections
+def test_create_session():
+
+	session = al.create_session(pool_maxsize = 5, max_retries = 2)
+
+	for prefix in ['http://', 'https://']:
+		adapter = session.get_adapter(prefix + 'export.arxiv.org')
+		assert_equal( adapter._pool_maxsize, 5, "The connection pool has the wrong size")
+		assert_equal( adapter.max_retries.connect, 2, "The number of retries is wrong")
+		assert_equal( adapter.max_retries.read, 0, "The requests which reached the arXiv are retried by the session")
+		assert_equal( len(adapter.max_retries.status_forcelist or []), 0, "The server errors are retried by the session")
+
+	assert_equal( 'gzip' in session.headers['Accept-Encoding'], True, "The session does not ask for compressed responses")
+
+	session.close()
+
 # when there is not Internet Connection (GetRequestError) - Need administrator privileges to work:
 # def test_request_to_arxiv_no_connection():
 	
@@ -329,7 +414,7 @@ def test_parse_response_correct():
 
 	response = al.request_to_arxiv(link)
 	time.sleep(3)
-	parsed_response = al.parse_response(response)
+	parsed_response = al.parse_response(response, streaming = False)
 
 	# We select the abstract of the first paper downloaded
 	abstract_obtained = parsed_response['entries'][0]['summary_detail']['value']
@@ -518,6 +603,101 @@ def test_review_response_correct_from_link():
 
 	assert_equal(result_list[0], expected_list, "The obtained response is different from the expected one")
 
+# test that the fields of the papers are formatted only when they are used
+def test_review_response_lazy_fields():
+
+	dictionary = {'entries' : [{'title' : u'Paper number ' + str(number) + '. (arXiv:0000.00000v1 [cat])',
+								'author' : u'<a href="http://webpage.com/Mario">Mario Rossi</a>',
+								'link' : u'www.hi.com/' + str(number)} for number in range(100)]}
+
+	result_list = al.review_response(dictionary, 2, 'RSS')
+	shown_list = result_list[:3]
+
+	assert_equal(len(result_list), 100, "The total number of papers is not exact.")
+	assert_equal(shown_list[1]['title'], u'Paper number 1', "The title is not formatted correctly.")
+	assert_equal(result_list[50].formatted_title is al.NOT_FORMATTED, True, "The title of a paper not shown has been formatted.")
+	assert_equal(shown_list[1].entry, {'title' : u'Paper number 1. (arXiv:0000.00000v1 [cat])', 'author' : u'<a href="http://webpage.com/Mario">Mario Rossi</a>'}, "The entry is released before all fields are formatted.")
+
+	shown_list[1]['authors']
+
+	assert_equal(shown_list[1].entry, None, "The entry is not released after all fields are formatted.")
+	assert_equal(shown_list[1], {'title' : u'Paper number 1', 'authors' : u'Mario Rossi', 'link' : u'www.hi.com/1'}, "The paper is different from the expected dictionary.")
+
+# test that the papers keep only the fields of the entries which are needed to format them
+def test_review_response_needed_fields():
+
+	dictionary = {'entries' : [{'title' : u'A paper', 'summary' : u'A long abstract. ' * 100, 'link' : u'www.hi.com',
+								'authors' : [{'name' : u'Mario Rossi', 'href' : u'www.mario.com'}], 'published' : u'2013-11-23T12:00:00Z'}]}
+
+	paper = al.review_response(dictionary, 2, 'API')[0]
+
+	assert_equal(paper.entry, {'title' : u'A paper', 'authors' : [{'name' : u'Mario Rossi'}], 'published' : u'2013-11-23T12:00:00Z'}, "The paper keeps fields which are not needed.")
+
+# test that the estimated size of a paper does not grow when it is formatted and rendered
+def test_paper_estimated_size():
+
+	dictionary = {'entries' : [{'title' : u'A paper on quantum channels. (arXiv:0000.00000v1 [cat])',
+								'author' : u', '.join( u'<a href="http://webpage.com/' + unicode(n) + u'">Author ' + unicode(n) + u'</a>' for n in range(3) ),
+								'link' : u'www.hi.com'}]}
+
+	paper = al.review_response(dictionary, 5, 'RSS')[0]
+	size_before = paper.estimated_size()
+	paper.fragment
+	size_after = paper.estimated_size()
+
+	assert_equal(paper.entry, None, "The entry is not released after the fragment is rendered.")
+	assert_equal(size_before >= size_after, True, "The size of the paper is underestimated before it is formatted.")
+
+# test that the fragment of a paper is rendered once, and its length is the one counted by Telegram
+def test_paper_fragment():
+
+	dictionary = {'entries' : [{'title' : u'Caf\xe9 & bar. (arXiv:0000.00000v1 [cat])',
+								'author' : u'<a href="http://webpage.com/Mario">Mario Rossi</a>',
+								'link' : u'www.hi.com'}]}
+
+	paper = al.review_response(dictionary, 2, 'RSS')[0]
+	fragment = paper.fragment
+
+	assert_equal(fragment, u'<em>Caf\xe9 &amp; bar</em>\nMario Rossi\nwww.hi.com\n\n', "The fragment of the paper is not correct.")
+	assert_equal(paper.fragment_length, len(u'Caf\xe9 & bar\nMario Rossi\nwww.hi.com\n\n'), "The length of the fragment is not correct.")
+	assert_equal(paper.fragment is fragment, True, "The fragment is rendered again.")
+
+# test that the fragment of the API papers contains the submission date
+def test_paper_fragment_api():
+
+	dictionary = {'entries' : [{'title' : u'A paper', 'authors' : [{'name' : u'Mario Rossi'}], 'link' : u'www.hi.com',
+								'published' : u'2013-11-23T12:00:00Z'}]}
+
+	paper = al.review_response(dictionary, 2, 'API')[0]
+
+	assert_equal(paper.fragment, u'<em>A paper</em>\nMario Rossi\n<em>Submitted on 23 Nov 2013</em>\nwww.hi.com\n\n', "The fragment of the paper is not correct.")
+
+# test that the papers of the RSS feeds have no date
+def test_review_response_rss_no_date():
+
+	dictionary = {'entries' : [{'title' : u'A paper. (arXiv:0000.00000v1 [cat])', 'link' : u'www.hi.com'}]}
+
+	paper = al.review_response(dictionary, 2, 'RSS')[0]
+
+	with assert_raises(KeyError):
+		paper['date']
+
+	assert_equal(sorted(paper.keys()), ['authors', 'link', 'title'], "The fields of the paper are not correct.")
+
+# test that the iterator form checks the arguments immediately, and reviews the entries one at a time
+def test_iterate_response():
+
+	with assert_raises(ValueError):
+		al.iterate_response({'entries' : []}, 2, 'WRONG')
+
+	dictionary = {'entries' : [{'title' : u'Nice Title', 'link' : u'www.hi.com'}, 'corrupted entry']}
+	papers = al.iterate_response(dictionary, 2, 'API')
+
+	assert_equal(next(papers)['title'], u'Nice Title', "The first paper is not correct.")
+
+	with assert_raises(TypeError):
+		next(papers)
+
 # ---------------------------------- IS FIELD THERE TESTS ----------------------------------
 
 # when the filed is not there, al.is_field_there should give None
@@ -628,6 +808,33 @@ def test_remove_hyperlinks_with_href():
 
 	assert_equal(output_string, expected_string, "The obtained response is different from the expected one")
 
+# test that the fast removal of hyper links gives the same output of BeautifulSoup on the RSS feed
+def test_strip_hyperlinks_same_as_remove_hyperlinks():
+
+	test_file = os.path.join('Data', 'text_response_test_rss.txt')
+	response = requests.models.Response()
+	with open(test_file, 'rb') as f:
+		response._content = f.read()
+
+	entries = al.parse_response(response, streaming = True)['entries']
+
+	for entry in entries:
+		for max_number in range(1, 8):
+			cut_index = al.authors_count_same_string(entry['author'], max_number)
+			cut_string = entry['author'] if cut_index == -1 else entry['author'][:cut_index] + u', et al.'
+			assert_equal(al.normalise_authors_RSS(entry['author'], max_number), al.remove_hyperlinks(cut_string), "The normalised authors differ from the expected ones.")
+
+# test that the spaces, markup and entities left outside the hyper links are treated as done by BeautifulSoup
+def test_strip_hyperlinks_special_cases():
+
+	input_strings = [u' <a href="a">Carlo</a>, \n<a href="b">Nelly</a> \t',
+					 u'<a href="a">L&#xed;dia</a> &amp; <i>Carlo</i>',
+					 u'<A HREF="a">Carlo</A >, <a href="b>c">Nelly</a>',
+					 u'\t']
+
+	for input_string in input_strings:
+		assert_equal(al.strip_hyperlinks(input_string), al.remove_hyperlinks(input_string), "The output differs from the one of BeautifulSoup.")
+
 # ------------------------------- FIND UPDATED ELEMENTS TESTS -------------------------------
 
 # test that function returns False if paper has not UPDATED in title
@@ -895,4 +1102,52 @@ def test_find_publishing_date_correct():
 	obtained_date = al.find_publishing_date(dictionary)
 	expected_date = datetime.datetime.strptime('2014 07 02', '%Y %m %d')
 
-	assert_equal(obtained_date, expected_date, "The obtained response is different from the expected one")
\ No newline at end of file
+	assert_equal(obtained_date, expected_date, "The obtained response is different from the expected one")
+# ------------------------------- ANNOUNCEMENT TIME TESTS -------------------------------
+
+# test that the offset of the New York time follows the daylight saving time
+def test_new_york_utc_offset():
+
+	winter_time = datetime.datetime(2018, 1, 4, 12, 0)
+	summer_time = datetime.datetime(2018, 7, 4, 12, 0)
+	before_dst_start = datetime.datetime(2018, 3, 11, 6, 59)
+	after_dst_start = datetime.datetime(2018, 3, 11, 7, 0)
+
+	assert_equal(al.new_york_utc_offset(winter_time), -5, "The obtained offset is different from the expected one")
+	assert_equal(al.new_york_utc_offset(summer_time), -4, "The obtained offset is different from the expected one")
+	assert_equal(al.new_york_utc_offset(before_dst_start), -5, "The obtained offset is different from the expected one")
+	assert_equal(al.new_york_utc_offset(after_dst_start), -4, "The obtained offset is different from the expected one")
+
+# test that there are no announcements on Friday and Saturday
+def test_next_announcement_time_weekend():
+
+	friday = datetime.datetime(2018, 1, 5, 12, 0)
+
+	expected_time = datetime.datetime(2018, 1, 8, 1, 0)
+	obtained_time = al.next_announcement_time(friday)
+
+	assert_equal(obtained_time, expected_time, "The obtained time is different from the expected one")
+
+# test that the announcement is at 8pm in New York, also with the daylight saving time
+def test_next_announcement_time_summer():
+
+	monday = datetime.datetime(2018, 7, 2, 23, 59)
+
+	expected_time = datetime.datetime(2018, 7, 3, 0, 0)
+	obtained_time = al.next_announcement_time(monday)
+
+	assert_equal(obtained_time, expected_time, "The obtained time is different from the expected one")
+
+# test that the previous announcement is found correctly
+def test_previous_announcement_time_correct():
+
+	sunday_night = datetime.datetime(2018, 1, 8, 0, 59)
+	monday_night = datetime.datetime(2018, 1, 8, 1, 0)
+
+	expected_time = datetime.datetime(2018, 1, 5, 1, 0)
+	obtained_time = al.previous_announcement_time(sunday_night)
+	assert_equal(obtained_time, expected_time, "The obtained time is different from the expected one")
+
+	expected_time = datetime.datetime(2018, 1, 8, 1, 0)
+	obtained_time = al.previous_announcement_time(monday_night)
+	assert_equal(obtained_time, expected_time, "The obtained time is different from the expected one")
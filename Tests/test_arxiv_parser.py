@@ -0,0 +1,93 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import arxiv_parser as ap
+import arxiv_lib as al
+import requests
+
+# Prepare a Response object with the content of a file
+def response_from_file(file_name):
+
+	response = requests.models.Response()
+	with open(os.path.join('Data', file_name), 'rb') as f:
+		response._content = f.read()
+	response.encoding = 'utf-8'
+
+	return response
+
+# ---------------------------------- STREAMING PARSER TESTS ----------------------------------
+
+# test that the Atom feed of the API is parsed correctly
+def test_parse_feed_api():
+
+	response = response_from_file('text_response_test_advanced_search.txt')
+	parsed_feed = ap.parse_feed(response.content)
+	entry = parsed_feed['entries'][0]
+
+	expected_authors = [{'name' : u'Carlo Sparaciari'}, {'name' : u'Stefano Olivares'}, {'name' : u'Francesco Ticozzi'}, {'name' : u'Matteo G. A. Paris'}]
+
+	assert_equal(parsed_feed['feed'], {'updated' : u'2016-04-15T00:00:00-04:00', 'opensearch_totalresults' : u'1'}, "The details of the feed are not correct.")
+	assert_equal(len(parsed_feed['entries']), 1, "The number of entries is not correct.")
+	assert_equal(entry['title'], u'Exact and approximate solutions for the quantum minimum-Kullback-entropy\n  estimation problem', "The title is not correct.")
+	assert_equal(entry['authors'], expected_authors, "The authors are not correct.")
+	assert_equal(entry['link'], u'http://arxiv.org/abs/1311.6008v2', "The alternate link is not chosen.")
+	assert_equal(entry['published'], u'2013-11-23T15:44:29Z', "The publishing date is not correct.")
+
+# test that the RSS 2.0 feeds are parsed as well
+def test_parse_feed_rss2():
+
+	raw_feed = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+				'<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel><title>quant-ph updates</title>'
+				'<lastBuildDate>Fri, 05 Jan 2018 00:30:00 -0500</lastBuildDate>'
+				'<item><title>A title</title><link>https://arxiv.org/abs/1801.01508</link>'
+				'<dc:creator>Carlo Sparaciari, Nelly Ng</dc:creator><pubDate>Fri, 05 Jan 2018 00:00:00 -0500</pubDate></item>'
+				'</channel></rss>')
+
+	parsed_feed = ap.parse_feed(raw_feed)
+	expected_entry = {'title' : u'A title',
+					  'link' : u'https://arxiv.org/abs/1801.01508',
+					  'author' : u'Carlo Sparaciari, Nelly Ng',
+					  'authors' : [{'name' : u'Carlo Sparaciari, Nelly Ng'}],
+					  'published' : u'Fri, 05 Jan 2018 00:00:00 -0500'}
+
+	assert_equal(parsed_feed['feed'], {'updated' : u'Fri, 05 Jan 2018 00:30:00 -0500'}, "The date of the feed is not correct.")
+	assert_equal(parsed_feed['entries'], [expected_entry], "The item is not parsed correctly.")
+
+# test that a malformed feed raises a ParseError
+def test_parse_feed_malformed():
+
+	assert_raises(ap.ET.ParseError, ap.parse_feed, '<feed><entry></feed>')
+
+# ---------------------------------- COMPARISON WITH FEEDPARSER ----------------------------------
+
+# test that the two parsers give the same results for the API searches
+def test_parsers_agree_api():
+
+	response = response_from_file('text_response_test_advanced_search.txt')
+	streaming_dictionary = al.parse_response(response, streaming = True)
+	feedparser_dictionary = al.parse_response(response, streaming = False)
+
+	assert_equal(al.review_response(streaming_dictionary, 3, 'API'), al.review_response(feedparser_dictionary, 3, 'API'), "The reviewed results differ.")
+	assert_equal(al.total_number_results(streaming_dictionary), al.total_number_results(feedparser_dictionary), "The total results differ.")
+
+# test that the two parsers give the same results for the RSS feeds
+def test_parsers_agree_rss():
+
+	response = response_from_file('text_response_test_rss.txt')
+	streaming_dictionary = al.parse_response(response, streaming = True)
+	feedparser_dictionary = al.parse_response(response, streaming = False)
+
+	assert_equal(al.review_response(streaming_dictionary, 3, 'RSS'), al.review_response(feedparser_dictionary, 3, 'RSS'), "The reviewed results differ.")
+	assert_equal(al.find_date_RSS(streaming_dictionary), al.find_date_RSS(feedparser_dictionary), "The dates of the feed differ.")
+
+# test that FeedParser is used when the response is not well-formed XML
+def test_parse_response_fallback():
+
+	response = requests.models.Response()
+	response._content = '<feed><entry><title>A title</entry></feed>'
+	response.encoding = 'utf-8'
+
+	parsed_response = al.parse_response(response, streaming = True)
+
+	assert_equal('bozo' in parsed_response, True, "FeedParser is not used as fallback.")
@@ -0,0 +1,164 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import database_pool as dp
+import psycopg2
+
+# A fake cursor, which records the executed commands
+class FakeCursor(object):
+
+	def __init__(self, connection):
+		self.connection = connection
+
+	def execute(self, sql_command, parameters = None):
+		if self.connection.closed != 0:
+			raise psycopg2.OperationalError('The connection is closed.')
+		self.connection.executed.append(sql_command)
+
+	def close(self):
+		pass
+
+# A fake connection to the database
+class FakeConnection(object):
+
+	def __init__(self):
+		self.closed = 0
+		self.executed = []
+		self.commits = 0
+		self.rollbacks = 0
+
+	def cursor(self):
+		return FakeCursor(self)
+
+	def commit(self):
+		self.commits += 1
+
+	def rollback(self):
+		self.rollbacks += 1
+
+# A fake pool, which fails a given number of times before connecting
+class FakePool(object):
+
+	failures = 0
+
+	def __init__(self, minconn, maxconn, **kwargs):
+		self.closed = False
+		self.opened_connections = 0
+		self.idle = []
+
+	def getconn(self):
+		if FakePool.failures > 0:
+			FakePool.failures -= 1
+			raise psycopg2.OperationalError('The database is not reachable.')
+		if len(self.idle) > 0:
+			return self.idle.pop()
+		self.opened_connections += 1
+		return FakeConnection()
+
+	def putconn(self, connection, close = False):
+		if not close:
+			self.idle.append(connection)
+
+	def closeall(self):
+		self.closed = True
+
+# ---------------------------------- DATABASE POOL TESTS ----------------------------------
+
+# test that wrong parameters raise an error
+def test_database_pool_wrong_parameters():
+
+	with assert_raises(ValueError):
+		dp.DatabasePool({}, max_connections = 0)
+
+	with assert_raises(ValueError):
+		dp.DatabasePool({}, min_connections = 3, max_connections = 2)
+
+# test that the connection is reused and the transaction committed
+def test_database_pool_reuse_connection():
+
+	FakePool.failures = 0
+	pool = dp.DatabasePool({}, pool_class = FakePool)
+
+	for i in range(3):
+		with pool.cursor() as cursor:
+			cursor.execute('SELECT 1;')
+
+	connection = pool.get_pool().idle[0]
+
+	assert_equal(pool.statistics()['opened_connections'], 1, "More than one connection has been opened")
+	assert_equal(pool.statistics()['checkouts'], 3, "The number of checkouts is different from the expected one")
+	assert_equal(connection.commits, 3, "The transactions have not been committed")
+
+# test that the transaction is rolled back when an error occurs
+def test_database_pool_rollback():
+
+	FakePool.failures = 0
+	pool = dp.DatabasePool({}, pool_class = FakePool)
+
+	with pool.cursor() as cursor:
+		cursor.execute('SELECT 1;')
+
+	connection = pool.get_pool().idle[0]
+	rollbacks_before_error = connection.rollbacks
+
+	with assert_raises(ValueError):
+		with pool.cursor() as cursor:
+			raise ValueError('Something went wrong.')
+
+	assert_equal(connection.rollbacks, rollbacks_before_error + 1, "The transaction has not been rolled back")
+	assert_equal(connection.commits, 1, "The transaction has been committed")
+
+# test that the pool retries with an exponential backoff when the database is not reachable
+def test_database_pool_backoff():
+
+	FakePool.failures = 3
+	waits = []
+	pool = dp.DatabasePool({}, initial_backoff = 1, max_backoff = 3, pool_class = FakePool, sleep = waits.append)
+
+	with pool.cursor() as cursor:
+		cursor.execute('SELECT 1;')
+
+	assert_equal(waits, [1, 2, 3], "The obtained waits are different from the expected ones")
+
+# test that the pool gives up after the maximum number of attempts
+def test_database_pool_give_up():
+
+	FakePool.failures = 10
+	pool = dp.DatabasePool({}, max_retries = 3, pool_class = FakePool, sleep = lambda seconds: None)
+
+	with assert_raises(psycopg2.OperationalError):
+		with pool.cursor() as cursor:
+			cursor.execute('SELECT 1;')
+
+	FakePool.failures = 0
+
+# test that a closed connection is replaced
+def test_database_pool_broken_connection():
+
+	FakePool.failures = 0
+	pool = dp.DatabasePool({}, pool_class = FakePool)
+
+	with pool.cursor() as cursor:
+		cursor.execute('SELECT 1;')
+
+	pool.get_pool().idle[0].closed = 1
+
+	with pool.cursor() as cursor:
+		cursor.execute('SELECT 1;')
+
+	assert_equal(pool.statistics()['opened_connections'], 2, "The broken connection has not been replaced")
+	assert_equal(pool.statistics()['reconnections'], 1, "The number of reconnections is different from the expected one")
+
+# test that an idle connection is checked before being used
+def test_database_pool_health_check():
+
+	FakePool.failures = 0
+	pool = dp.DatabasePool({}, health_check_interval = 0, pool_class = FakePool)
+
+	with pool.cursor() as cursor:
+		cursor.execute('SELECT category FROM preferences;')
+
+	connection = pool.get_pool().idle[0]
+
+	assert_equal(connection.executed, ['SELECT 1;', 'SELECT category FROM preferences;'], "The connection has not been checked")
@@ -14,4 +14,22 @@ def test_emoji_detect_failure():
 def test_emoji_detect_succedes():
 
 	message = u'I am sad! \U0001f61e'
-	assert_equal(emjd.detect_emoji(message), True, "The function does not detect emoji.")
\ No newline at end of file
+	assert_equal(emjd.detect_emoji(message), True, "The function does not detect emoji.")
+
+
+# an emoji made of several characters (a keycap) is detected, but its characters alone are not
+def test_emoji_detect_sequence():
+
+	assert_equal(emjd.detect_emoji(u'Call me at 1 \u20e3'), False, "The function detects a broken sequence.")
+	assert_equal(emjd.detect_emoji(u'Press 1\u20e3 to continue'), True, "The function does not detect a sequence.")
+
+# the matcher compiled from a custom list detects single characters and sequences
+def test_compile_emoji_matcher():
+
+	matcher = emjd.compile_emoji_matcher([u'a', u'b', u'c', u'xy', u'xz', u'xaw'])
+
+	assert_equal(matcher[1].pattern, u'x(?:y|z)', "The sequences containing single characters are not removed.")
+	assert_equal(emjd.contains_emoji(u'xw', matcher), False, "The matcher detects a missing sequence.")
+	assert_equal(emjd.contains_emoji(u'wxz', matcher), True, "The matcher does not detect a sequence.")
+	assert_equal(emjd.contains_emoji(u'wwb', matcher), True, "The matcher does not detect a single character.")
+	assert_equal(emjd.contains_emoji(u'abc', emjd.compile_emoji_matcher([])), False, "The empty matcher detects something.")
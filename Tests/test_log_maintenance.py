@@ -0,0 +1,89 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import log_maintenance as lm
+import datetime
+
+# A fake cursor, which records the executed commands and answers with the given results
+class FakeCursor(object):
+
+	def __init__(self, results):
+		self.results = results
+		self.executed = []
+		self.last_command = None
+
+	def execute(self, sql_command, parameters = None):
+		self.executed.append((sql_command, parameters))
+		self.last_command = sql_command
+
+	def fetchone(self):
+		for pattern, result in self.results:
+			if pattern in self.last_command:
+				return result
+		return (None,)
+
+	def fetchall(self):
+		for pattern, result in self.results:
+			if pattern in self.last_command:
+				return result
+		return []
+
+# ---------------------------------- DATE TESTS ----------------------------------
+
+# test that the months are moved across the years
+def test_month_start():
+
+	today = datetime.date(2018, 1, 17)
+
+	assert_equal(lm.month_start(today), datetime.date(2018, 1, 1), "The current month is not correct.")
+	assert_equal(lm.month_start(today, 13), datetime.date(2019, 2, 1), "The following months are not correct.")
+	assert_equal(lm.month_start(today, -1), datetime.date(2017, 12, 1), "The previous months are not correct.")
+
+# test that the month of a partition is read from its name
+def test_partition_month():
+
+	assert_equal(lm.partition_month('chat', 'chat_2017_11'), datetime.date(2017, 11, 1), "The month of the partition is not correct.")
+	assert_equal(lm.partition_month('chat', 'chat_default'), None, "The default partition is not a monthly partition.")
+	assert_equal(lm.partition_month('chat', 'errors_2017_11'), None, "The partition of another table is accepted.")
+
+# ---------------------------------- MAINTENANCE TESTS ----------------------------------
+
+# test that the partitions of the current and next months are created for both tables
+def test_create_partitions():
+
+	cursor = FakeCursor([('create_monthly_partition', (True,))])
+	created_partitions = lm.create_partitions(cursor, datetime.date(2017, 12, 5), months_ahead = 1)
+
+	parameters = [ parameters for sql_command, parameters in cursor.executed ]
+	expected_parameters = [('chat', 'message_time', datetime.date(2017, 12, 1)),
+						   ('chat', 'message_time', datetime.date(2018, 1, 1)),
+						   ('errors', 'error_time', datetime.date(2017, 12, 1)),
+						   ('errors', 'error_time', datetime.date(2018, 1, 1))]
+
+	assert_equal(created_partitions, 4, "The created partitions are not counted.")
+	assert_equal(parameters, expected_parameters, "The wrong partitions are created.")
+
+# test that only the complete days after the last aggregated one are aggregated
+def test_rollup_daily_usage():
+
+	cursor = FakeCursor([('FROM daily_usage', (datetime.date(2018, 1, 10),))])
+	aggregated_days = lm.rollup_daily_usage(cursor, datetime.date(2018, 1, 14))
+
+	assert_equal(aggregated_days, 3, "The number of aggregated days is not correct.")
+	assert_equal(cursor.executed[-1], (lm.ROLLUP_COMMAND, (datetime.date(2018, 1, 11), datetime.date(2018, 1, 14))), "The wrong days are aggregated.")
+
+	cursor = FakeCursor([('FROM daily_usage', (datetime.date(2018, 1, 13),))])
+
+	assert_equal(lm.rollup_daily_usage(cursor, datetime.date(2018, 1, 14)), 0, "The current day should not be aggregated.")
+
+# test that the expired partitions are dropped, except for the chat rows not aggregated yet
+def test_drop_expired_partitions():
+
+	partitions = [('chat_2017_10',), ('chat_2017_11',), ('chat_2017_12',), ('chat_default',), ('errors_2017_10',), ('errors_2017_11',)]
+	cursor = FakeCursor([('FROM daily_usage', (datetime.date(2017, 11, 15),)),
+						 ('pg_inherits', partitions)])
+
+	dropped_partitions = lm.drop_expired_partitions(cursor, datetime.date(2018, 1, 5), 1)
+
+	assert_equal(dropped_partitions, ['chat_2017_10', 'errors_2017_10', 'errors_2017_11'], "The wrong partitions are dropped.")
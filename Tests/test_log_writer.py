@@ -0,0 +1,128 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+from contextlib import contextmanager
+import log_writer as lw
+import psycopg2
+import threading
+
+# A fake cursor, which records the executed commands
+class FakeCursor(object):
+
+	def __init__(self, executed):
+		self.executed = executed
+
+	def mogrify(self, template, row):
+		return template % tuple( repr(value) for value in row )
+
+	def execute(self, sql_command):
+		self.executed.append(sql_command)
+
+# A fake database pool, which can be made unavailable
+class FakePool(object):
+
+	def __init__(self):
+		self.executed = []
+		self.is_available = True
+		self.gate = threading.Event()
+		self.gate.set()
+
+	@contextmanager
+	def cursor(self):
+		self.gate.wait(5)
+		if not self.is_available:
+			raise psycopg2.OperationalError('The database is not reachable.')
+		yield FakeCursor(self.executed)
+
+# ---------------------------------- LOG WRITER TESTS ----------------------------------
+
+# test that wrong parameters raise an error
+def test_log_writer_wrong_parameters():
+
+	with assert_raises(ValueError):
+		lw.BatchLogWriter(FakePool(), overflow_policy = 'wrong')
+
+	with assert_raises(ValueError):
+		lw.BatchLogWriter(FakePool(), batch_size = 10, max_queued_rows = 5)
+
+	with assert_raises(ValueError):
+		lw.BatchLogWriter(FakePool()).write('preferences', (1, 'quant-ph'))
+
+# test that the rows are written with a single command for each table
+def test_log_writer_multi_row_insert():
+
+	pool = FakePool()
+	writer = lw.BatchLogWriter(pool, batch_size = 10, flush_interval = 60)
+
+	writer.write('chat', ('time', 1, 'text', '/help', None))
+	writer.write('chat', ('time', 2, 'text', '/today', None))
+	writer.write('errors', ('time', 1, 'known', 'details'))
+	writer.close()
+
+	expected_commands = ["INSERT INTO chat (message_time, user_identity, content_type, content, query_identity) VALUES ('time', 1, 'text', '/help', None),('time', 2, 'text', '/today', None);",
+						 "INSERT INTO errors (error_time, user_identity, error_type, details) VALUES ('time', 1, 'known', 'details');"]
+
+	assert_equal(sorted(pool.executed), expected_commands, "The obtained commands are different from the expected ones")
+	assert_equal(writer.statistics()['written_rows'], 3, "The number of written rows is different from the expected one")
+
+# test that the rows are written in batches of the given size
+def test_log_writer_batch_size():
+
+	pool = FakePool()
+	writer = lw.BatchLogWriter(pool, batch_size = 2, flush_interval = 60)
+
+	for identity in range(5):
+		writer.write('chat', ('time', identity, 'text', '/help', None))
+	writer.close()
+
+	assert_equal(len(pool.executed), 3, "The rows have not been written in batches")
+	assert_equal(writer.written_rows, 5, "The number of written rows is different from the expected one")
+
+# test that the rows are dropped when the queue is full
+def test_log_writer_drop_policy():
+
+	pool = FakePool()
+	pool.gate.clear()
+	dropped = []
+	writer = lw.BatchLogWriter(pool, batch_size = 1, max_queued_rows = 1, flush_interval = 60, fallback_function = lambda table, row: dropped.append(row))
+
+	writer.write('chat', ('time', 0, 'text', '/help', None))
+	# Wait for the background thread to take the first row
+	while writer.statistics()['queued_rows'] > 0:
+		pass
+	obtained_results = [writer.write('chat', ('time', identity, 'text', '/help', None)) for identity in [1, 2]]
+
+	pool.gate.set()
+	writer.close()
+
+	assert_equal(obtained_results, [True, False], "The row has not been dropped")
+	assert_equal(dropped, [('time', 2, 'text', '/help', None)], "The dropped row is different from the expected one")
+	assert_equal(writer.written_rows, 2, "The number of written rows is different from the expected one")
+
+# test that the rows which cannot be written go to the fallback function
+def test_log_writer_database_failure():
+
+	pool = FakePool()
+	pool.is_available = False
+	failed_rows = []
+	writer = lw.BatchLogWriter(pool, flush_interval = 60, fallback_function = lambda table, row: failed_rows.append((table, row)))
+
+	writer.write('errors', ('time', 1, 'unknown', 'details'))
+	writer.close()
+
+	assert_equal(failed_rows, [('errors', ('time', 1, 'unknown', 'details'))], "The failed row has not been passed to the fallback function")
+	assert_equal(writer.failed_batches, 1, "The number of failed batches is different from the expected one")
+
+# test that the rows written after closing the writer are not lost
+def test_log_writer_write_after_close():
+
+	failed_rows = []
+	writer = lw.BatchLogWriter(FakePool(), fallback_function = lambda table, row: failed_rows.append(row))
+
+	writer.write('chat', ('time', 1, 'text', '/help', None))
+	writer.close()
+	obtained_result = writer.write('chat', ('time', 2, 'text', '/help', None))
+
+	assert_equal(obtained_result, False, "The row has been accepted after closing the writer")
+	assert_equal(failed_rows, [('time', 2, 'text', '/help', None)], "The row has been lost")
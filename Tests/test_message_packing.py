@@ -0,0 +1,129 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+from HTMLParser import HTMLParser
+import message_packing as mp
+import random
+
+# A reference parser, which gives the text shown by Telegram
+class TextParser(HTMLParser):
+
+	def __init__(self):
+		HTMLParser.__init__(self)
+		self.pieces = []
+
+	def handle_data(self, data):
+		self.pieces.append(data)
+
+	def handle_entityref(self, name):
+		self.pieces.append(self.unescape('&' + name + ';'))
+
+	def handle_charref(self, name):
+		self.pieces.append(self.unescape('&#' + name + ';'))
+
+# This function gives the length of the text shown by Telegram, counting the UTF-16 code units one by one
+def reference_length(html_text):
+
+	parser = TextParser()
+	parser.feed(html_text)
+	parser.close()
+
+	return sum( 2 if ord(character) > 0xFFFF else 1 for character in u''.join(parser.pieces) )
+
+# This function builds a random item, made of text, tags, entities and emoji
+def random_item(generator):
+
+	pieces = [u'abc ', u'\xe9', u'\u4e2d', u'\n', u'&amp;', u'&lt;', u'&quot;', u'&#233;', u'&#x1F600;',
+			  u'<b>1</b>', u'<em>title</em>', u'<a href="http://arxiv.org/abs/1711.00001">link</a>', u'\U0001F600']
+
+	return u''.join( generator.choice(pieces) for number in range(generator.randint(1, 30)) )
+
+# This function gives the smallest number of messages for the items, trying all the possible cuts
+def minimum_number_messages(lengths, max_length):
+
+	minimum = [0] + [None] * len(lengths)
+
+	for end in range(1, len(lengths) + 1):
+		for start in range(end):
+			if minimum[start] == None:
+				continue
+			if end - start > 1 and sum(lengths[start:end]) > max_length:
+				continue
+			if minimum[end] == None or minimum[start] + 1 < minimum[end]:
+				minimum[end] = minimum[start] + 1
+
+	return minimum[-1]
+
+# ---------------------------------- TELEGRAM LENGTH TESTS ----------------------------------
+
+# test that the tags are not counted, the entities count as one character, and the emoji as two
+def test_telegram_length():
+
+	html_text = u'<b>1</b>. <em>Caf&#233; &amp; bar</em>\n\U0001F600'
+
+	assert_equal( mp.telegram_length(html_text), 16, "The length of the message is wrong")
+
+# test that the length is the same as the one given by a reference HTML parser, for random items
+def test_telegram_length_random():
+
+	generator = random.Random(4096)
+
+	for number in range(500):
+		item = random_item(generator)
+		assert_equal( mp.telegram_length(item), reference_length(item), "The length of " + repr(item) + " is wrong")
+
+# ---------------------------------- PACKING TESTS ----------------------------------
+
+# test that the packing never breaks an item, keeps the order, respects the limit, and gives the smallest number of messages
+def test_pack_items_random():
+
+	generator = random.Random(2017)
+
+	for number in range(300):
+		items = [ random_item(generator) for item_number in range(generator.randint(0, 15)) ]
+		max_length = generator.randint(5, 120)
+
+		groups = mp.group_items(items, max_length)
+		lengths = [ reference_length(item) for item in items ]
+
+		assert_equal( [ item for group in groups for item in group ], items, "The items are broken or reordered")
+		for group in groups:
+			if len(group) > 1:
+				assert_equal( reference_length(u''.join(group)) <= max_length, True, "A message exceeds the limit")
+		assert_equal( len(groups), minimum_number_messages(lengths, max_length), "The number of messages is not the smallest")
+		assert_equal( mp.pack_items(items, max_length), [ u''.join(group) for group in groups ], "The messages are not the joined groups")
+
+# test that an item longer than the limit is put alone in a message
+def test_pack_items_long_item():
+
+	items = [u'short', u'x' * 20, u'end']
+
+	assert_equal( mp.pack_items(items, 10), [u'short', u'x' * 20, u'end'], "The long item is not alone")
+
+# test that a single message keeps the first items which fit, and the last item
+def test_fit_items():
+
+	items = [u'<b>header</b>\n', u'<em>one</em>\n', u'<em>two</em>\n']
+
+	assert_equal( mp.fit_items(items, u'total', 19), u'<b>header</b>\n<em>one</em>\ntotal', "The message does not keep the fitting items")
+	assert_equal( mp.fit_items(items, u'total', 100), u''.join(items) + u'total', "The message does not keep all the items")
+
+# test that the number of fitting items agrees with the message of fit_items
+def test_count_fitting_items():
+
+	items = [u'<b>header</b>\n', u'<em>one</em>\n', u'<em>two</em>\n']
+
+	assert_equal( mp.count_fitting_items(items, u'total', 19), 2, "The number of fitting items is wrong")
+	assert_equal( mp.count_fitting_items(items, u'total', 100), 3, "The number of fitting items is wrong")
+	assert_equal( mp.count_fitting_items(items, u'total', 5), 0, "The number of fitting items is wrong")
+
+# test that a long item is cut as plain text, without breaking the entities, and a short one is unchanged
+def test_truncate_item():
+
+	item = u'<em>Caf\xe9 &amp; bar</em>\n' + u'x' * 20
+
+	assert_equal( mp.truncate_item(item, 100), item, "The short item is changed")
+	assert_equal( mp.truncate_item(item, 9), u'Caf\xe9 &amp; b\u2026', "The long item is not cut correctly")
+	assert_equal( mp.truncate_item(item, 6), u'Caf\xe9 \u2026', "The entity is broken")
+	assert_equal( mp.telegram_length(mp.truncate_item(u'\U0001F600' * 10, 6)) <= 6, True, "The emoji are not counted twice")
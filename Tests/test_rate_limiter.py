@@ -0,0 +1,108 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import rate_limiter as rl
+
+# A clock which moves forward only when the limiter sleeps
+class FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.
+
+	def time(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.now += seconds
+
+# ---------------------------------- RATE LIMITER TESTS ----------------------------------
+
+# test that wrong parameters raise an error
+def test_rate_limiter_wrong_parameters():
+
+	with assert_raises(ValueError):
+		rl.RateLimiter(-1)
+
+	with assert_raises(ValueError):
+		rl.RateLimiter(3, burst = 0)
+
+# test that the first request does not wait, while the following ones are spaced
+def test_rate_limiter_spacing():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(3, clock = clock.time, sleep = clock.sleep)
+
+	obtained_waits = [limiter.acquire('export.arxiv.org') for i in range(3)]
+
+	assert_equal(obtained_waits, [0., 3., 3.], "The obtained waits are different from the expected ones")
+	assert_equal(clock.now, 1006., "The obtained time is different from the expected one")
+
+# test that the caller does not wait if enough time passed since the last request
+def test_rate_limiter_no_wait():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(3, clock = clock.time, sleep = clock.sleep)
+
+	limiter.acquire('export.arxiv.org')
+	clock.now += 5
+	obtained_wait = limiter.acquire('export.arxiv.org')
+
+	assert_equal(obtained_wait, 0., "The caller waited without need")
+
+# test that different hosts are limited separately
+def test_rate_limiter_different_keys():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(3, clock = clock.time, sleep = clock.sleep)
+
+	limiter.acquire('export.arxiv.org')
+	obtained_wait = limiter.acquire('arxiv.org')
+
+	assert_equal(obtained_wait, 0., "The caller waited without need")
+
+# test that concurrent reservations get consecutive slots
+def test_rate_limiter_reservations():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(2, clock = clock.time, sleep = clock.sleep)
+
+	obtained_waits = [limiter.reserve('arxiv.org') for i in range(4)]
+
+	assert_equal(obtained_waits, [0., 2., 4., 6.], "The obtained waits are different from the expected ones")
+
+# test that the burst allows for some requests without waiting
+def test_rate_limiter_burst():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(1, burst = 3, clock = clock.time, sleep = clock.sleep)
+
+	obtained_waits = [limiter.reserve('arxiv.org') for i in range(5)]
+
+	assert_equal(obtained_waits, [0., 0., 0., 1., 2.], "The obtained waits are different from the expected ones")
+
+# test that the interval can be changed for a single key
+def test_rate_limiter_set_interval():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(3, clock = clock.time, sleep = clock.sleep)
+	limiter.set_interval(10, key = 'arxiv.org')
+
+	limiter.acquire('arxiv.org')
+	obtained_wait = limiter.acquire('arxiv.org')
+
+	assert_equal(obtained_wait, 10., "The obtained wait is different from the expected one")
+
+# test that the statistics on the waits are correct
+def test_rate_limiter_statistics():
+
+	clock = FakeClock()
+	limiter = rl.RateLimiter(3, clock = clock.time, sleep = clock.sleep)
+
+	for i in range(3):
+		limiter.acquire('export.arxiv.org')
+
+	expected_statistics = {'requests' : 3, 'waits' : 2, 'total_wait' : 6., 'average_wait' : 2., 'max_wait' : 3.}
+	obtained_statistics = limiter.statistics()
+
+	assert_equal(obtained_statistics, expected_statistics, "The obtained statistics are different from the expected ones")
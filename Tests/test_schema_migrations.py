@@ -0,0 +1,101 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import schema_migrations as sm
+import psycopg2
+
+# A fake cursor, which records the executed commands
+class FakeCursor(object):
+
+	def __init__(self, connection):
+		self.connection = connection
+
+	def execute(self, sql_command, parameters = None):
+		if sql_command == self.connection.failing_command:
+			raise psycopg2.ProgrammingError('The command failed.')
+		self.connection.executed.append(sql_command)
+		if sql_command.startswith('INSERT INTO schema_version'):
+			self.connection.pending_version = parameters[0]
+
+	def fetchone(self):
+		return (self.connection.version,)
+
+	def close(self):
+		pass
+
+# A fake connection, which keeps the version of the schema
+class FakeConnection(object):
+
+	def __init__(self, version = None, failing_command = None):
+		self.version = version
+		self.pending_version = None
+		self.failing_command = failing_command
+		self.executed = []
+		self.commits = 0
+		self.rollbacks = 0
+
+	def cursor(self):
+		return FakeCursor(self)
+
+	def commit(self):
+		self.commits += 1
+		if self.pending_version != None:
+			self.version = self.pending_version
+			self.pending_version = None
+
+	def rollback(self):
+		self.rollbacks += 1
+		self.pending_version = None
+
+test_migrations = [(2, 'second', ['CREATE second;']),
+				   (1, 'first', ['CREATE first;']),
+				   (3, 'third', ['CREATE third;'])]
+
+# ---------------------------------- MIGRATION TESTS ----------------------------------
+
+# test that a new database receives all the migrations, in order
+def test_migrate_new_database():
+
+	connection = FakeConnection()
+	applied_versions = sm.migrate(connection, migrations = test_migrations)
+
+	created = [ sql_command for sql_command in connection.executed if sql_command.startswith('CREATE ') and not 'schema_version' in sql_command ]
+
+	assert_equal(applied_versions, [1, 2, 3], "The migrations are not all applied.")
+	assert_equal(created, ['CREATE first;', 'CREATE second;', 'CREATE third;'], "The migrations are not applied in order.")
+	assert_equal(connection.version, 3, "The version of the schema is not recorded.")
+	assert_equal(connection.commits, 3, "Each migration should be committed separately.")
+
+# test that an existing database receives only the missing migrations
+def test_migrate_existing_database():
+
+	connection = FakeConnection(version = 2)
+	applied_versions = sm.migrate(connection, migrations = test_migrations)
+
+	assert_equal(applied_versions, [3], "The applied migrations are migrated again.")
+	assert_equal('CREATE first;' in connection.executed, False, "The first migration is applied again.")
+
+# test that the migrations stop at the target version
+def test_migrate_target_version():
+
+	connection = FakeConnection()
+	applied_versions = sm.migrate(connection, target_version = 2, migrations = test_migrations)
+
+	assert_equal(applied_versions, [1, 2], "The migrations do not stop at the target version.")
+
+# test that a failing migration is rolled back and leaves the previous version
+def test_migrate_failure():
+
+	connection = FakeConnection(failing_command = 'CREATE second;')
+
+	assert_raises(psycopg2.ProgrammingError, sm.migrate, connection, None, test_migrations)
+	assert_equal(connection.version, 1, "The failed migration changed the version.")
+	assert_equal(connection.rollbacks, 1, "The failed migration is not rolled back.")
+
+# test that the versions of the migrations of the Bot are unique and increasing
+def test_migrations_versions():
+
+	versions = [ version for version, description, sql_commands in sm.MIGRATIONS ]
+
+	assert_equal(versions, range(1, len(versions) + 1), "The versions of the migrations are not consecutive.")
@@ -0,0 +1,188 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import send_queue as sq
+import telepot
+import threading
+import time
+
+# A fake Telegram, which records the messages with the time they are sent
+class FakeTelegram(object):
+
+	def __init__(self, failures = {}):
+		self.sent = []
+		self.failures = dict(failures)
+		self.lock = threading.Lock()
+
+	def send(self, chat_identity, text):
+		with self.lock:
+			if (chat_identity, text) in self.failures:
+				raise self.failures.pop((chat_identity, text))
+			self.sent.append((time.time(), chat_identity, text))
+		return {'chat' : chat_identity, 'text' : text}
+
+# ---------------------------------- SEND QUEUE TESTS ----------------------------------
+
+# test that wrong parameters raise an error
+def test_send_queue_wrong_parameters():
+
+	with assert_raises(ValueError):
+		sq.SendQueue(lambda chat, text: None, chat_interval = -1)
+
+	with assert_raises(ValueError):
+		sq.SendQueue(lambda chat, text: None, number_workers = 0)
+
+# test that the messages of a chat are sent in order, spaced by the chat interval
+def test_send_queue_chat_order():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0., chat_interval = 0.05)
+
+	pending_messages = [ queue.submit(1, 'message ' + str(number)) for number in range(4) ]
+	results = [ pending_message.wait(5) for pending_message in pending_messages ]
+	queue.close()
+
+	texts = [ text for send_time, chat, text in telegram.sent ]
+	times = [ send_time for send_time, chat, text in telegram.sent ]
+
+	assert_equal( texts, ['message 0', 'message 1', 'message 2', 'message 3'], "The messages of the chat are not sent in order")
+	assert_equal( results[0], {'chat' : 1, 'text' : 'message 0'}, "The result of the message is wrong")
+	assert_equal( min( later - earlier for earlier, later in zip(times, times[1:]) ) > 0.04, True, "The messages of the chat are not spaced")
+
+# test that the messages of different chats are spaced by the global interval
+def test_send_queue_global_interval():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0.02, chat_interval = 0.)
+
+	pending_messages = [ queue.submit(chat, 'digest') for chat in range(10) ]
+	for pending_message in pending_messages:
+		pending_message.wait(5)
+	queue.close()
+
+	times = sorted( send_time for send_time, chat, text in telegram.sent )
+
+	assert_equal( len(times), 10, "Some messages have not been sent")
+	assert_equal( times[-1] - times[0] > 0.9 * 9 * 0.02, True, "The messages are sent faster than the global interval")
+
+# test that a message is sent again after retry_after, before the following messages of the same chat
+def test_send_queue_retry_after():
+
+	too_many_requests = telepot.exception.TooManyRequestsError('Too Many Requests: retry after 0.1', 429, {'parameters' : {'retry_after' : 0.1}})
+	telegram = FakeTelegram({(1, 'first') : too_many_requests})
+	queue = sq.SendQueue(telegram.send, global_interval = 0., chat_interval = 0.)
+
+	first_message = queue.submit(1, 'first')
+	second_message = queue.submit(1, 'second')
+	second_message.wait(5)
+	queue.close()
+
+	assert_equal( [ text for send_time, chat, text in telegram.sent ], ['first', 'second'], "The order of the chat is not kept after a retry")
+	assert_equal( first_message.attempts, 2, "The message has not been sent again")
+	assert_equal( queue.statistics()['retried_messages'], 1, "The retry is not counted")
+
+# test that no message of any chat is sent before retry_after, when Telegram asks to slow down
+def test_send_queue_retry_after_global():
+
+	too_many_requests = telepot.exception.TooManyRequestsError('Too Many Requests: retry after 0.2', 429, {'parameters' : {'retry_after' : 0.2}})
+	telegram = FakeTelegram({(1, 'first') : too_many_requests})
+	queue = sq.SendQueue(telegram.send, global_interval = 0., chat_interval = 0., number_workers = 1)
+
+	start_time = time.time()
+	first_message = queue.submit(1, 'first')
+	other_messages = [ queue.submit(chat, 'other') for chat in range(2, 5) ]
+	for pending_message in [first_message] + other_messages:
+		pending_message.wait(5)
+	queue.close()
+
+	times = [ send_time for send_time, chat, text in telegram.sent ]
+
+	assert_equal( len(times), 4, "Some messages have not been sent")
+	assert_equal( min(times) - start_time > 0.15, True, "The other chats do not wait for retry_after")
+
+# test that a paused queue does not send any message until the pause is over
+def test_send_queue_pause():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0., chat_interval = 0.)
+
+	start_time = time.time()
+	queue.pause(0.2)
+	queue.submit(1, 'message').wait(5)
+	queue.close()
+
+	assert_equal( telegram.sent[0][0] - start_time > 0.15, True, "The message is sent during the pause")
+
+# test that no message can be added after the queue is closed
+def test_send_queue_closed():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0.)
+
+	queue.submit(1, 'message').wait(5)
+	queue.close()
+
+	with assert_raises(RuntimeError):
+		queue.submit(1, 'late message')
+
+	assert_equal( queue.worker_threads, [], "The background threads are started again")
+
+# test that the done callbacks are called once the message is sent, or straight away if it is already done
+def test_pending_message_done_callback():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0., chat_interval = 0.)
+	callback_done = threading.Event()
+	done_messages = []
+
+	def callback(pending_message):
+		done_messages.append((pending_message.done(), pending_message.result))
+		callback_done.set()
+
+	pending_message = queue.submit(1, 'message')
+	pending_message.add_done_callback(callback)
+	callback_done.wait(5)
+	queue.close()
+
+	pending_message.add_done_callback(done_messages.append)
+
+	assert_equal( done_messages[0], (True, {'chat' : 1, 'text' : 'message'}), "The callback is not called when the message is done")
+	assert_equal( done_messages[1], pending_message, "The callback is not called straight away for a message already done")
+
+# test that the failed messages are passed to the error_function, and raise their exception
+def test_send_queue_failure():
+
+	bot_blocked = telepot.exception.BotWasBlockedError('Forbidden: bot was blocked by the user', 403, {})
+	telegram = FakeTelegram({(2, 'digest') : bot_blocked})
+	errors = []
+	queue = sq.SendQueue(telegram.send, global_interval = 0., error_function = lambda message, error: errors.append((message.chat_identity, error)))
+
+	pending_message = queue.submit(2, 'digest')
+
+	with assert_raises(telepot.exception.BotWasBlockedError):
+		pending_message.wait(5)
+
+	queue.close()
+
+	assert_equal( errors, [(2, bot_blocked)], "The failure is not passed to the error_function")
+	assert_equal( queue.statistics()['failed_messages'], 1, "The failure is not counted")
+
+# test that the chats whose next message has the lowest priority number are served first
+def test_send_queue_priority():
+
+	telegram = FakeTelegram()
+	queue = sq.SendQueue(telegram.send, global_interval = 0.05, chat_interval = 0., number_workers = 1)
+
+	# The first message occupies the worker, while the others are queued
+	queue.submit(0, 'start')
+	digest_messages = [ queue.submit(chat, 'digest', priority = 1) for chat in range(1, 4) ]
+	reply_message = queue.submit(10, 'reply')
+
+	for pending_message in digest_messages:
+		pending_message.wait(5)
+	queue.close()
+
+	texts = [ text for send_time, chat, text in telegram.sent ]
+
+	assert_equal( texts.index('reply') < texts.index('digest'), True, "The message with the lowest priority number is not sent first")
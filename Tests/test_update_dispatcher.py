@@ -0,0 +1,120 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import update_dispatcher as ud
+import threading
+import time
+
+# ---------------------------------- UPDATE DISPATCHER TESTS ----------------------------------
+
+# test that wrong parameters raise an error
+def test_update_dispatcher_wrong_parameters():
+
+	with assert_raises(ValueError):
+		ud.UpdateDispatcher(None, None, number_workers = 0)
+
+	with assert_raises(ValueError):
+		ud.UpdateDispatcher(None, None, max_queued_updates = 0)
+
+# test that the updates of the same chat are handled in order, one at a time
+def test_update_dispatcher_order_per_chat():
+
+	handled_updates = []
+	running_chats = set()
+	overlaps = []
+	lock = threading.Lock()
+
+	def handle(update):
+		chat, number = update
+		with lock:
+			if chat in running_chats:
+				overlaps.append(update)
+			running_chats.add(chat)
+		time.sleep(0.001)
+		with lock:
+			running_chats.discard(chat)
+			handled_updates.append(update)
+
+	dispatcher = ud.UpdateDispatcher(handle, lambda update: update[0], number_workers = 4)
+	dispatcher.start()
+
+	for number in range(20):
+		for chat in ['a', 'b', 'c']:
+			dispatcher.submit((chat, number))
+
+	dispatcher.stop()
+
+	assert_equal(len(handled_updates), 60, "Some updates have not been handled")
+	assert_equal(overlaps, [], "The updates of the same chat have been handled at the same time")
+	for chat in ['a', 'b', 'c']:
+		obtained_order = [number for update_chat, number in handled_updates if update_chat == chat]
+		assert_equal(obtained_order, range(20), "The updates of the same chat have been handled in the wrong order")
+
+# test that different chats are handled at the same time
+def test_update_dispatcher_concurrency():
+
+	barrier_event = threading.Event()
+	arrived = []
+
+	def handle(update):
+		arrived.append(update)
+		if len(arrived) == 2:
+			barrier_event.set()
+		barrier_event.wait(5)
+
+	dispatcher = ud.UpdateDispatcher(handle, lambda update: update, number_workers = 2)
+	dispatcher.start()
+	dispatcher.submit('a')
+	dispatcher.submit('b')
+	dispatcher.stop()
+
+	assert_equal(barrier_event.is_set(), True, "The updates of different chats have not been handled at the same time")
+
+# test that the errors of the handler do not stop the workers, and that statistics are collected
+def test_update_dispatcher_failures_statistics():
+
+	def handle(update):
+		if update % 2 == 0:
+			raise ValueError('Wrong update.')
+
+	dispatcher = ud.UpdateDispatcher(handle, lambda update: update, number_workers = 2, serialize_per_chat = False)
+	dispatcher.start()
+	for update in range(10):
+		dispatcher.submit(update)
+	dispatcher.stop()
+
+	statistics = dispatcher.statistics()
+
+	assert_equal(statistics['processed'], 10, "The number of handled updates is different from the expected one")
+	assert_equal(statistics['failures'], 5, "The number of failures is different from the expected one")
+	assert_equal(statistics['queued'], 0, "The queue is not empty")
+
+# test that the submission waits when the queue is full
+def test_update_dispatcher_queue_depth():
+
+	release_event = threading.Event()
+	dispatcher = ud.UpdateDispatcher(lambda update: release_event.wait(5), lambda update: 'chat', number_workers = 1, max_queued_updates = 1)
+	dispatcher.start()
+
+	# The first update is taken by the worker, the second one fills the queue
+	dispatcher.submit(1)
+	dispatcher.submit(2)
+
+	third_submission = threading.Thread(target = dispatcher.submit, args = (3,))
+	third_submission.start()
+	third_submission.join(0.1)
+
+	assert_equal(third_submission.is_alive(), True, "The submission did not wait for the queue")
+
+	release_event.set()
+	third_submission.join(5)
+	dispatcher.stop()
+
+	assert_equal(dispatcher.processed, 3, "The number of handled updates is different from the expected one")
+
+# test the percentiles used in the statistics
+def test_percentile():
+
+	assert_equal(ud.percentile([], 50), 0., "The obtained percentile is different from the expected one")
+	assert_equal(ud.percentile(range(101), 95), 95, "The obtained percentile is different from the expected one")
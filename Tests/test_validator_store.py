@@ -0,0 +1,118 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join('..', 'Library')))
+
+from nose.tools import assert_raises, assert_equal
+import validator_store as vs
+import arxiv_lib as al
+import requests
+import tempfile
+import shutil
+import datetime
+
+# This function builds a response with the given status, headers and body
+def fake_response(status_code, headers = {}, content = ''):
+
+	response = requests.models.Response()
+	response.status_code = status_code
+	response.headers = requests.structures.CaseInsensitiveDict(headers)
+	response._content = content
+
+	return response
+
+# A fake session, which answers with the given responses and records the headers of the requests
+class FakeSession(object):
+
+	def __init__(self, responses):
+		self.responses = list(responses)
+		self.sent_headers = []
+
+	def get(self, link, headers = None, timeout = None):
+		self.sent_headers.append(headers)
+		return self.responses.pop(0)
+
+# ---------------------------------- VALIDATOR STORE TESTS ----------------------------------
+
+# test that the request is conditional only when a response with a validator has been stored
+def test_conditional_headers():
+
+	link = 'http://export.arxiv.org/rss/quant-ph'
+	store = vs.ValidatorStore()
+
+	assert_equal( store.conditional_headers(link), {}, "The request is conditional without a stored response")
+
+	store.update(link, fake_response(200, content = '<rss/>'))
+	assert_equal( store.conditional_headers(link), {}, "The request is conditional without a validator")
+
+	store.update(link, fake_response(200, {'ETag' : '"abc"', 'Last-Modified' : 'Fri, 17 Nov 2017 01:00:00 GMT'}, '<rss/>'))
+
+	expected_headers = {'If-None-Match' : '"abc"', 'If-Modified-Since' : 'Fri, 17 Nov 2017 01:00:00 GMT'}
+	assert_equal( store.conditional_headers(link), expected_headers, "The conditional headers are wrong")
+
+# test that the stored body is used when the response has not been modified
+def test_not_modified_response():
+
+	link = 'http://export.arxiv.org/rss/quant-ph'
+	store = vs.ValidatorStore()
+	session = FakeSession([fake_response(200, {'ETag' : '"abc"', 'Content-Type' : 'text/xml; charset=utf-8'}, '<rss>feed</rss>'),
+						   fake_response(304, {'ETag' : '"abc"'})])
+
+	first_response = al.request_to_arxiv(link, session, store)
+	second_response = al.request_to_arxiv(link, session, store)
+
+	assert_equal( session.sent_headers, [{}, {'If-None-Match' : '"abc"'}], "The second request is not conditional")
+	assert_equal( second_response.status_code, 200, "The stored response has the wrong status")
+	assert_equal( second_response.content, first_response.content, "The stored body is not used")
+	assert_equal( second_response.encoding, 'utf-8', "The encoding of the stored response is lost")
+	assert_equal( store.statistics()['not_modified_responses'], 1, "The response not modified is not counted")
+
+# test that the request is sent again without the validators, when the arXiv answers 304 and no body is stored
+def test_not_modified_without_stored_body():
+
+	link = 'http://export.arxiv.org/rss/quant-ph'
+	store = vs.ValidatorStore()
+	store.entries[vs.store_key(link)] = {'headers' : {'ETag' : '"abc"'}}
+	session = FakeSession([fake_response(304, {'ETag' : '"abc"'}),
+						   fake_response(200, {'ETag' : '"abc"'}, '<rss>feed</rss>')])
+
+	response = al.request_to_arxiv(link, session, store)
+
+	assert_equal( session.sent_headers, [{'If-None-Match' : '"abc"'}, {}], "The request is not sent again without the validators")
+	assert_equal( response.content, '<rss>feed</rss>', "The empty body of the 304 response is used")
+	assert_equal( store.lookup(link)['content'], '<rss>feed</rss>', "The body of the new response is not stored")
+
+# test that the parsed feed is reused only while the validators are the same
+def test_parsed_response():
+
+	link = 'http://export.arxiv.org/rss/quant-ph'
+	store = vs.ValidatorStore()
+	response = fake_response(200, {'ETag' : '"abc"'}, '<rss/>')
+	parsed_feed = (['paper'], datetime.datetime(2018, 1, 5))
+
+	store.remember_parsed_response(link, response, parsed_feed)
+
+	assert_equal( store.parsed_response(link, fake_response(200, {'ETag' : '"abc"'})) is parsed_feed, True, "The parsed feed is not reused")
+	assert_equal( store.parsed_response(link, fake_response(200, {'ETag' : '"def"'})), None, "The parsed feed of a modified response is reused")
+	assert_equal( store.parsed_response(link, fake_response(200)), None, "The parsed feed is reused without a validator")
+	assert_equal( store.statistics()['parsed_responses'], 1, "The parsed feed is not counted")
+
+# test that the stored responses survive when the store is opened again
+def test_store_survives_restart():
+
+	link = u'http://export.arxiv.org/rss/quant-ph'
+	directory = tempfile.mkdtemp()
+	file_name = os.path.join(directory, 'feed_validators')
+
+	try:
+		store = vs.ValidatorStore(file_name)
+		store.update(link, fake_response(200, {'Last-Modified' : 'Fri, 17 Nov 2017 01:00:00 GMT'}, '<rss/>'))
+		store.close()
+
+		store = vs.ValidatorStore(file_name)
+		headers = store.conditional_headers(link)
+		stored_content = store.lookup(link)['content']
+		store.close()
+	finally:
+		shutil.rmtree(directory)
+
+	assert_equal( headers, {'If-Modified-Since' : 'Fri, 17 Nov 2017 01:00:00 GMT'}, "The validators are lost after the restart")
+	assert_equal( stored_content, '<rss/>', "The body is lost after the restart")
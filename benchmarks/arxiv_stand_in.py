@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Library')))
+import arxiv_lib as al
+import synthetic_feeds as sf
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+import threading
+import argparse
+import urlparse
+import random
+import time
+
+# This script runs a local stand-in of the arXiv, for load and latency testing. It answers like
+# export.arxiv.org/api/query and arxiv.org/rss/<category>, with recorded or synthetic feeds (see
+# synthetic_feeds.py), and can be slowed down or made to fail on purpose.
+#
+#     python arxiv_stand_in.py [--port 8080] [--latency 0.5] [--error-rate 0.05] [--timeout-rate 0.01] ...
+#
+# The Bot is pointed at the stand-in with the following fields of Bot/Data/bot_details.yaml
+#
+#     arxiv_search_link: 'http://localhost:8080/api/query?search_query='
+#     arxiv_rss_link: 'http://localhost:8080/rss/'
+#     arxiv_fair_time: 0
+
+## This class handles the requests to the stand-in (see @ref ArxivStandIn)
+class StandInHandler(BaseHTTPRequestHandler):
+
+	# The connections are kept alive, as with the real arXiv
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+
+		server = self.server
+		outcome = server.draw_outcome()
+		server.count(outcome)
+
+		delay = server.latency + server.latency_jitter * server.uniform()
+		if delay > 0:
+			time.sleep(delay)
+
+		if outcome == 'timeout':
+			# No answer is given, until the client gives up (or the stand-in is stopped)
+			server.stopping.wait(server.timeout_delay)
+			self.close_connection = True
+			return None
+
+		if outcome == 'error':
+			self.send_body(503, 'text/plain', 'Service temporarily unavailable.')
+			return None
+
+		link = urlparse.urlparse(self.path)
+
+		if link.path == '/api/query':
+			status, body = 200, server.api_content(urlparse.parse_qs(link.query))
+			content_type = 'application/atom+xml; charset=utf-8'
+		elif link.path.startswith('/rss/'):
+			status, body = server.rss_content(link.path[len('/rss/'):])
+			content_type = 'application/xml; charset=utf-8'
+			if status == 200 and self.headers.get('If-None-Match') == server.entity_tag:
+				server.count('not_modified')
+				self.send_body(304, content_type, '')
+				return None
+		else:
+			status, body, content_type = 404, 'Not found.', 'text/plain'
+
+		self.send_body(status, content_type, body, truncated = outcome == 'truncated')
+
+	## This method sends the response (only the first half of the body, if it is truncated)
+	def send_body(self, status, content_type, body, truncated = False):
+
+		self.send_response(status)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(body)))
+		if status in (200, 304):
+			self.send_header('ETag', self.server.entity_tag)
+		self.end_headers()
+
+		if truncated:
+			self.wfile.write(body[:len(body) // 2])
+			self.close_connection = True
+		else:
+			self.wfile.write(body)
+
+	def log_message(self, format, *arguments):
+
+		if self.server.verbose:
+			BaseHTTPRequestHandler.log_message(self, format, *arguments)
+
+## This class implements the stand-in of the arXiv, a threaded HTTP server.
+#
+#  The failures are drawn at random for each request: a 503 error (error_rate), no answer until
+#  the client times out (timeout_rate), or a body cut in half (truncate_rate).
+class ArxivStandIn(ThreadingMixIn, HTTPServer):
+
+	daemon_threads = True
+
+	## Class constructor
+	#
+	#  @param self The object pointer
+	#  @param port The port of the server (optional, default is 0, a free port is chosen)
+	#  @param latency The number of seconds each response is delayed (optional, default is 0)
+	#  @param latency_jitter The maximum number of seconds added at random to the latency (optional, default is 0)
+	#  @param error_rate The fraction of the requests answered with a 503 error (optional, default is 0)
+	#  @param timeout_rate The fraction of the requests which are not answered (optional, default is 0)
+	#  @param timeout_delay The number of seconds before closing the requests which are not answered (optional, default is 75)
+	#  @param truncate_rate The fraction of the responses whose body is truncated (optional, default is 0)
+	#  @param rss_entries The number of entries of the synthetic RSS feeds (optional, default is 150)
+	#  @param api_total_results The total number of results of each synthetic search (optional, default is 500)
+	#  @param rss_file A recorded RSS feed, served for all the categories (optional, default is None, the feeds are synthetic)
+	#  @param api_file A recorded Atom feed, served for all the searches (optional, default is None, the feeds are synthetic)
+	#  @param seed The seed of the random generator (optional, default is 0)
+	#  @param verbose Whether to print the requests (optional, default is False)
+	def __init__(self, port = 0, latency = 0., latency_jitter = 0., error_rate = 0., timeout_rate = 0., timeout_delay = 75.,
+				 truncate_rate = 0., rss_entries = 150, api_total_results = 500, rss_file = None, api_file = None, seed = 0, verbose = False):
+
+		HTTPServer.__init__(self, ('127.0.0.1', port), StandInHandler)
+
+		self.latency = latency
+		self.latency_jitter = latency_jitter
+		self.error_rate = error_rate
+		self.timeout_rate = timeout_rate
+		self.timeout_delay = timeout_delay
+		self.truncate_rate = truncate_rate
+		self.rss_entries = rss_entries
+		self.api_total_results = api_total_results
+		self.seed = seed
+		self.verbose = verbose
+
+		## The entity tag of the RSS feeds (the feeds never change while the stand-in runs)
+		self.entity_tag = '"stand-in-' + str(seed) + '"'
+
+		## The number of requests for each outcome
+		self.outcomes = {}
+
+		self.rss_recorded = read_file(rss_file)
+		self.api_recorded = read_file(api_file)
+		self.rss_feeds = {}
+		self.generator = random.Random(seed)
+		self.lock = threading.Lock()
+		self.stopping = threading.Event()
+		self.server_thread = None
+
+	## The link to be used as ArxivBot.arxiv_search_link
+	@property
+	def search_link(self):
+
+		return 'http://127.0.0.1:' + str(self.server_address[1]) + '/api/query?search_query='
+
+	## The link to be used as ArxivBot.arxiv_rss_link
+	@property
+	def rss_link(self):
+
+		return 'http://127.0.0.1:' + str(self.server_address[1]) + '/rss/'
+
+	## This method starts the server in a background thread.
+	#
+	#  @param self The object pointer
+	def start(self):
+
+		self.server_thread = threading.Thread(target = self.serve_forever, name = 'ArxivStandIn')
+		self.server_thread.daemon = True
+		self.server_thread.start()
+
+	## This method stops the server, and closes its socket.
+	#
+	#  @param self The object pointer
+	def stop(self):
+
+		self.stopping.set()
+		if self.server_thread != None:
+			self.shutdown()
+			self.server_thread.join()
+			self.server_thread = None
+		self.server_close()
+
+	## This method draws the outcome of a request: 'ok', 'error', 'timeout', or 'truncated'.
+	#
+	#  @param self The object pointer
+	def draw_outcome(self):
+
+		draw = self.uniform()
+
+		for outcome, rate in [('error', self.error_rate), ('timeout', self.timeout_rate), ('truncated', self.truncate_rate)]:
+			if draw < rate:
+				return outcome
+			draw -= rate
+
+		return 'ok'
+
+	## This method returns a random number between 0 and 1.
+	#
+	#  @param self The object pointer
+	def uniform(self):
+
+		with self.lock:
+			return self.generator.random()
+
+	## This method counts a request with the given outcome.
+	#
+	#  @param self The object pointer
+	#  @param outcome The outcome of the request
+	def count(self, outcome):
+
+		with self.lock:
+			self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+	## This method returns the status and the body of the RSS feed of a category.
+	#
+	#  @param self The object pointer
+	#  @param category The arXiv category
+	def rss_content(self, category):
+
+		if not al.category_exists(category):
+			return 404, 'Unknown category.'
+
+		if self.rss_recorded != None:
+			return 200, self.rss_recorded
+
+		with self.lock:
+			if category not in self.rss_feeds:
+				self.rss_feeds[category] = sf.rss_feed(category, self.rss_entries, seed = self.seed)
+			return 200, self.rss_feeds[category]
+
+	## This method returns the body of a page of search results, with the start and max_results of the query.
+	#
+	#  The results of a search depend only on its search_query, so that the pages of the same search agree.
+	#
+	#  @param self The object pointer
+	#  @param query The parsed query string of the request
+	def api_content(self, query):
+
+		if self.api_recorded != None:
+			return self.api_recorded
+
+		search_query = query.get('search_query', [''])[0]
+		start = int(query.get('start', ['0'])[0])
+		max_results = int(query.get('max_results', ['10'])[0])
+
+		total_results = self.api_total_results if len(search_query.strip()) != 0 else 0
+		search_seed = hash(search_query) % 1000003 + self.seed
+
+		return sf.api_feed(search_query.decode('utf-8'), start, max_results, total_results, seed = search_seed)
+
+## This function returns the content of a file (None if no file is given)
+def read_file(file_name):
+
+	if file_name == None:
+		return None
+
+	with open(file_name, 'rb') as f:
+		return f.read()
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'A local stand-in of the arXiv API and RSS feeds.')
+	parser.add_argument('--port', type = int, default = 8080)
+	parser.add_argument('--latency', type = float, default = 0., help = 'seconds added to each response')
+	parser.add_argument('--latency-jitter', type = float, default = 0., help = 'maximum seconds added at random')
+	parser.add_argument('--error-rate', type = float, default = 0., help = 'fraction of 503 responses')
+	parser.add_argument('--timeout-rate', type = float, default = 0., help = 'fraction of requests not answered')
+	parser.add_argument('--timeout-delay', type = float, default = 75., help = 'seconds before closing the requests not answered')
+	parser.add_argument('--truncate-rate', type = float, default = 0., help = 'fraction of truncated bodies')
+	parser.add_argument('--rss-entries', type = int, default = 150, help = 'entries of the synthetic RSS feeds')
+	parser.add_argument('--api-total-results', type = int, default = 500, help = 'results of each synthetic search')
+	parser.add_argument('--rss-file', help = 'a recorded RSS feed, served for all the categories')
+	parser.add_argument('--api-file', help = 'a recorded Atom feed, served for all the searches')
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--verbose', action = 'store_true', help = 'print the requests')
+	arguments = parser.parse_args()
+
+	stand_in = ArxivStandIn(arguments.port, arguments.latency, arguments.latency_jitter, arguments.error_rate,
+							arguments.timeout_rate, arguments.timeout_delay, arguments.truncate_rate, arguments.rss_entries,
+							arguments.api_total_results, arguments.rss_file, arguments.api_file, arguments.seed, arguments.verbose)
+
+	print 'Serving the arXiv stand-in on ' + stand_in.search_link + ' and ' + stand_in.rss_link
+
+	try:
+		stand_in.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+	stand_in.server_close()
+	print 'Requests : ' + str(stand_in.outcomes)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Library')))
+import arxiv_lib as al
+import requests
+import timeit
+
+# This script measures the time needed to prepare the authors of an RSS entry, comparing
+# arxiv_lib.normalise_authors_RSS with the previous implementation (which cut the string and
+# removed the hyper links with BeautifulSoup).
+#
+#     python bench_authors_RSS.py [repetitions]
+
+## The previous implementation of arxiv_lib.prepare_authors_field_RSS
+def normalise_authors_BeautifulSoup(authors_string, max_number_authors):
+
+	end_string = al.authors_count_same_string(authors_string, max_number_authors)
+	if end_string != -1:
+		authors_string = authors_string[:end_string] + u', et al.'
+
+	return al.remove_hyperlinks(authors_string)
+
+## This function returns the author strings of the entries of the RSS file in the Tests folder
+def recorded_authors():
+
+	response = requests.models.Response()
+	with open(os.path.join(os.path.dirname(__file__), '..', 'Tests', 'Data', 'text_response_test_rss.txt'), 'rb') as f:
+		response._content = f.read()
+
+	return [ entry['author'] for entry in al.parse_response(response, streaming = True)['entries'] ]
+
+## This function returns the author string of a large collaboration, with the given number of authors
+def collaboration_authors(number_authors):
+
+	link = u'<a href="http://arxiv.org/find/hep-ex/1/au:+Author_{0}/0/1/0/all/0/1">Author Number{0}</a>'
+
+	return u', '.join( link.format(index) for index in range(number_authors) )
+
+repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+max_number_authors = 5
+
+entries = [ ('recorded entry ' + str(index), authors) for index, authors in enumerate(recorded_authors()) ]
+entries += [('collaboration (30)', collaboration_authors(30)), ('collaboration (3000)', collaboration_authors(3000))]
+
+print '%-22s %8s %18s %18s %10s' % ('entry', 'length', 'BeautifulSoup (us)', 'normaliser (us)', 'speed-up')
+
+for name, authors in entries:
+	assert normalise_authors_BeautifulSoup(authors, max_number_authors) == al.normalise_authors_RSS(authors, max_number_authors)
+	old_time = min(timeit.repeat(lambda: normalise_authors_BeautifulSoup(authors, max_number_authors), number = repetitions, repeat = 3)) / repetitions
+	new_time = min(timeit.repeat(lambda: al.normalise_authors_RSS(authors, max_number_authors), number = repetitions, repeat = 3)) / repetitions
+	print '%-22s %8d %18.2f %18.2f %9.0fx' % (name, len(authors), 1e6 * old_time, 1e6 * new_time, old_time / new_time)
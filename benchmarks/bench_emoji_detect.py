@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Library')))
+import emoji_detect as emjd
+from emoji import UNICODE_EMOJI
+import timeit
+
+# This script compares the time needed by emoji_detect.detect_emoji with the one needed
+# by the previous implementation, which searched every emoji in the message.
+#
+#     python bench_emoji_detect.py [repetitions]
+
+## The previous implementation of emoji_detect.detect_emoji
+def detect_emoji_loop(text_msg):
+
+	for emoji in UNICODE_EMOJI:
+		if text_msg.find(emoji) != -1:
+			return True
+
+	return False
+
+## Messages of realistic length, with and without emoji (the worst case for the loop is a message without emoji)
+MESSAGES = [('command', u'/today quant-ph'),
+			('search', u'/search au:Einstein ti:electrodynamics of moving bodies abs:relativity'),
+			('feedback', u'/feedback ' + u'The bot is very useful, but the results of the searches could be sorted by date. ' * 6),
+			('feedback with emoji', u'/feedback ' + u'The bot is very useful! ' * 20 + u'\U0001F600')]
+
+repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+print 'Emoji in the list : ' + str(len(UNICODE_EMOJI))
+print '%-20s %8s %14s %14s %10s' % ('message', 'length', 'loop (us)', 'matcher (us)', 'speed-up')
+
+for name, message in MESSAGES:
+	assert detect_emoji_loop(message) == emjd.detect_emoji(message)
+	loop_time = min(timeit.repeat(lambda: detect_emoji_loop(message), number = repetitions, repeat = 3)) / repetitions
+	matcher_time = min(timeit.repeat(lambda: emjd.detect_emoji(message), number = repetitions, repeat = 3)) / repetitions
+	print '%-20s %8d %14.2f %14.2f %9.0fx' % (name, len(message), 1e6 * loop_time, 1e6 * matcher_time, loop_time / matcher_time)
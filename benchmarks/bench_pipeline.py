@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Library')))
+import arxiv_lib as al
+import arxiv_bot as ab
+import emoji_detect as emjd
+import synthetic_feeds as sf
+import requests
+import datetime as dt
+import platform
+import argparse
+import timeit
+import json
+
+# This script measures the hot path of the Bot, offline: the parsing of the feeds, the review of
+# the entries, the removal of the hyper links from the authors, the detection of the emoji, and the
+# rendering and splitting of the messages. The feeds are the recorded ones in Tests/Data, and
+# synthetic ones of several sizes (see synthetic_feeds.py).
+#
+# The results (seconds per call) can be written to a JSON file, and compared with a baseline
+# written in the same way. The script exits with status 1 if a benchmark is slower than the
+# baseline by more than the threshold.
+#
+#     python bench_pipeline.py --output baseline.json
+#     python bench_pipeline.py --baseline baseline.json [--threshold 0.25] [--only parse_response]
+
+## The folder with the recorded feeds
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'Tests', 'Data')
+
+## The sizes of the synthetic feeds (number of entries of the RSS feed, and of the page of the API)
+FEED_SIZES = [('single', 1, 1), ('category', 150, 100), ('oversized', 2000, 2000)]
+
+## The messages used for the detection of the emoji
+MESSAGES = [u'/today quant-ph',
+			u'/search au:Einstein ti:electrodynamics of moving bodies abs:relativity',
+			u'/feedback ' + u'The bot is very useful, but the results of the searches could be sorted by date. ' * 6,
+			u'/feedback ' + u'The bot is very useful! ' * 20 + u'\U0001F600']
+
+## This function returns a Response object with the given content, as returned by arxiv_lib.request_to_arxiv
+def make_response(content):
+
+	response = requests.models.Response()
+	response._content = content
+	response.encoding = 'utf-8'
+	response.status_code = 200
+
+	return response
+
+## This function returns the feeds of the benchmarks, as a list of (name, feed type, content)
+def benchmark_feeds():
+
+	feeds = []
+
+	with open(os.path.join(DATA_FOLDER, 'text_response_test_rss.txt'), 'rb') as f:
+		feeds.append(('recorded', 'RSS', f.read()))
+
+	with open(os.path.join(DATA_FOLDER, 'text_response_test_advanced_search.txt'), 'rb') as f:
+		feeds.append(('recorded', 'API', f.read()))
+
+	for name, rss_entries, api_entries in FEED_SIZES:
+		feeds.append((name, 'RSS', sf.rss_feed('quant-ph', rss_entries)))
+		feeds.append((name, 'API', sf.api_feed('all:quantum', 0, api_entries, 10 * api_entries)))
+
+	return feeds
+
+## This function returns the seconds needed by a call of the function (the best of three measures)
+#
+#  The number of calls of each measure is increased until the measure lasts at least min_time seconds.
+def measure(function, min_time):
+
+	timer = timeit.Timer(function)
+	number = 1
+
+	while True:
+		if timer.timeit(number) >= min_time or number >= 10 ** 6:
+			break
+		number *= 2
+
+	return min(timer.repeat(repeat = 3, number = number)) / number
+
+## This function returns the list of the benchmarks, as (name, function)
+def benchmark_functions(bot):
+
+	benchmarks = []
+	feed_date = dt.date(2018, 1, 5)
+
+	for name, feed_type, content in benchmark_feeds():
+		prefix = name + '/' + feed_type + '/'
+		response = make_response(content)
+		dictionary = al.parse_response(response, streaming = True)
+		papers = al.review_response(dictionary, bot.max_number_authors, feed_type)
+		for paper in papers:
+			paper.fragment
+
+		benchmarks.append((prefix + 'parse_response[streaming]', lambda response = response: al.parse_response(response, streaming = True)))
+		benchmarks.append((prefix + 'parse_response[feedparser]', lambda response = response: al.parse_response(response, streaming = False)))
+		benchmarks.append((prefix + 'review_response', lambda dictionary = dictionary, feed_type = feed_type:
+							[ paper.as_dict() for paper in al.review_response(dictionary, bot.max_number_authors, feed_type) ]))
+
+		if feed_type == 'RSS':
+			authors = [ entry['author'] for entry in dictionary['entries'] if 'author' in entry ]
+			benchmarks.append((prefix + 'remove_hyperlinks', lambda authors = authors: [ al.remove_hyperlinks(string) for string in authors ]))
+			benchmarks.append((prefix + 'strip_hyperlinks', lambda authors = authors: [ al.strip_hyperlinks(string) for string in authors ]))
+			benchmarks.append((prefix + 'render[first]', lambda papers = papers: render_rss(bot, papers, feed_date, True)))
+			benchmarks.append((prefix + 'render[cached]', lambda papers = papers: render_rss(bot, papers, feed_date, False)))
+		else:
+			page = papers[:bot.max_api_result_number]
+			benchmarks.append((prefix + 'render[first]', lambda page = page, papers = papers: render_api(bot, page, len(papers), True)))
+			benchmarks.append((prefix + 'render[cached]', lambda page = page, papers = papers: render_api(bot, page, len(papers), False)))
+
+	for index, message in enumerate(MESSAGES):
+		benchmarks.append(('messages/' + str(index) + '/detect_emoji', lambda message = message: emjd.detect_emoji(message)))
+
+	return benchmarks
+
+## This function renders and splits the messages of an RSS feed (all the papers, to stress the splitting)
+def render_rss(bot, papers, feed_date, first_reply):
+
+	if first_reply:
+		for paper in papers:
+			paper.rendered_fragment = None
+
+	return bot.prepare_messages_rss(papers, 0, 'quant-ph', feed_date)
+
+## This function renders the message of a page of results of the API
+def render_api(bot, page, total_results, first_reply):
+
+	if first_reply:
+		for paper in page:
+			paper.rendered_fragment = None
+
+	return bot.prepare_message_api(['quantum'], 0, page, total_results)
+
+## This function compares the results with the baseline, prints the table, and returns the names of the regressions
+def compare(results, baseline, threshold):
+
+	regressions = []
+
+	print '%-46s %14s %14s %8s' % ('benchmark', 'baseline (us)', 'current (us)', 'ratio')
+
+	for name in sorted(results):
+		current = results[name]
+		if name not in baseline:
+			print '%-46s %14s %14.2f %8s' % (name, '-', 1e6 * current, '-')
+			continue
+		ratio = current / baseline[name]
+		flag = ''
+		if ratio > 1 + threshold:
+			regressions.append(name)
+			flag = '  REGRESSION'
+		print '%-46s %14.2f %14.2f %8.2f%s' % (name, 1e6 * baseline[name], 1e6 * current, ratio, flag)
+
+	return regressions
+
+parser = argparse.ArgumentParser(description = 'Offline benchmarks of the parse, review and render pipeline of the Bot.')
+parser.add_argument('--output', help = 'the JSON file where the results are written')
+parser.add_argument('--baseline', help = 'the JSON file with the results to compare with')
+parser.add_argument('--threshold', type = float, default = 0.25, help = 'the relative slow-down counted as a regression (default is 0.25)')
+parser.add_argument('--min-time', type = float, default = 0.05, help = 'the minimum duration of each measure, in seconds (default is 0.05)')
+parser.add_argument('--only', default = '', help = 'run only the benchmarks whose name contains this string')
+arguments = parser.parse_args()
+
+bot = ab.ArxivBot('123:offline', 'benchmark', 'benchmark', 'benchmark')
+
+results = {}
+for name, function in benchmark_functions(bot):
+	if arguments.only in name:
+		results[name] = measure(function, arguments.min_time)
+
+bot.close()
+
+if arguments.output != None:
+	with open(arguments.output, 'w') as f:
+		json.dump({'python' : platform.python_version(),
+				   'platform' : platform.platform(),
+				   'date' : dt.datetime.utcnow().isoformat(),
+				   'results' : results}, f, indent = 2, sort_keys = True)
+
+baseline = {}
+if arguments.baseline != None:
+	with open(arguments.baseline) as f:
+		baseline = json.load(f)['results']
+
+regressions = compare(results, baseline, arguments.threshold)
+
+if len(regressions) > 0:
+	print str(len(regressions)) + ' benchmarks are slower than the baseline by more than ' + str(int(100 * arguments.threshold)) + '%.'
+	sys.exit(1)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Library')))
+import arxiv_bot as ab
+import arxiv_lib as al
+import update_dispatcher as ud
+import send_queue as sq
+import arxiv_stand_in as si
+import psycopg2
+import threading
+import argparse
+import random
+import time
+import yaml
+import json
+
+# This script drives ArxivBot.handle with the updates of many synthetic users, to find the saturation
+# point of a deployment. The updates (chat messages and callback queries) arrive at random times, at
+# the given average rate, and are handled by an update_dispatcher.UpdateDispatcher as in Bot/main.py.
+# Telegram is replaced by an in-process recorder, and the arXiv by a local stand-in (see
+# arxiv_stand_in.py). The database is the one of the details file, so a test database should be used:
+# the synthetic users write their logs and preferences there.
+#
+#     python load_generator.py --details ../Bot/Data/bot_details.yaml --users 500 --rate 50 --duration 60
+#
+# The report gives the throughput, the percentiles of two latencies of each command, and the connections
+# to the database. The handler latency goes from the arrival of the update to the end of ArxivBot.handle
+# (the worker is then free for the next update). The delivery latency goes from the arrival of the update
+# to the last of its messages sent to Telegram, and is recorded by a callback of the queued messages, so
+# that the workers do not wait for the send queue.
+
+## The default mix of the commands, in the form {command : weight}
+COMMAND_MIX = {'today' : 40, 'today_favourite' : 10, 'search' : 25, 'next_page' : 15, 'set' : 5, 'help' : 5}
+
+## The categories chosen by the synthetic users
+CATEGORIES = ['quant-ph', 'hep-th', 'gr-qc', 'cond-mat.str-el', 'math.DS', 'cs.LG', 'stat.ML', 'astro-ph.CO']
+
+## The keywords of the synthetic searches
+KEYWORDS = [u'quantum', u'entanglement', u'thermodynamics', u'black', u'holes', u'neural', u'networks', u'gauge', u'lattice']
+
+## This class replaces Telegram with an in-process recorder, and keeps track of the messages of the update being handled
+class RecordingBot(ab.ArxivBot):
+
+	def __init__(self, *arguments, **keywords):
+
+		super(RecordingBot, self).__init__(*arguments, **keywords)
+
+		## The number of messages sent, and of the other calls to Telegram
+		self.telegram_calls = {'sendMessage' : 0, 'editMessageText' : 0, 'editMessageReplyMarkup' : 0, 'answerCallbackQuery' : 0}
+
+		self.calls_lock = threading.Lock()
+		self.current_update = threading.local()
+
+	## This method collects the messages of the update being handled, so that their sending can be waited for
+	def sendMessage(self, chat_id, text, **keywords):
+
+		pending_message = super(RecordingBot, self).sendMessage(chat_id, text, **keywords)
+		getattr(self.current_update, 'pending_messages', []).append(pending_message)
+
+		return pending_message
+
+	def send_directly(self, chat_identity, message, **keywords):
+
+		return self.record('sendMessage')
+
+	def editMessageText(self, msg_identifier, text, **keywords):
+
+		return self.record('editMessageText')
+
+	def editMessageReplyMarkup(self, msg_identifier, **keywords):
+
+		return self.record('editMessageReplyMarkup')
+
+	def answerCallbackQuery(self, callback_query_id, **keywords):
+
+		return self.record('answerCallbackQuery')
+
+	def record(self, method):
+
+		with self.calls_lock:
+			self.telegram_calls[method] += 1
+			return {'message_id' : self.telegram_calls[method]}
+
+	## This method handles an update, and returns the list of the messages it sent
+	def handle_and_collect(self, update):
+
+		self.current_update.pending_messages = []
+
+		try:
+			self.handle(update)
+		finally:
+			pending_messages = self.current_update.pending_messages
+			del self.current_update.pending_messages
+
+		return pending_messages
+
+## This class builds the updates of the synthetic users, as Telegram would send them
+class UpdateFactory(object):
+
+	def __init__(self, number_users, command_mix, seed):
+
+		self.users = [ 10 ** 9 + index for index in range(number_users) ]
+		self.commands = sorted(command_mix)
+		self.weights = [ command_mix[command] for command in self.commands ]
+		self.generator = random.Random(seed)
+		self.last_searches = {}
+		self.counter = 0
+
+	## This method returns a random command and the update of a random user
+	def next_update(self):
+
+		user = self.generator.choice(self.users)
+		command = self.choose_command()
+		self.counter += 1
+
+		if command == 'next_page':
+			keywords = self.last_searches.get(user) or self.random_keywords()
+			return command, self.callback_query(user, keywords, 'search next ' + str(10 * self.generator.randint(1, 4)))
+
+		if command == 'today':
+			text = u'/today ' + self.generator.choice(CATEGORIES)
+		elif command == 'today_favourite':
+			text = u'/today'
+		elif command == 'search':
+			keywords = self.random_keywords()
+			self.last_searches[user] = keywords
+			text = u'/search ' + u' '.join(keywords)
+		elif command == 'set':
+			text = u'/set ' + self.generator.choice(CATEGORIES)
+		else:
+			text = u'/help'
+
+		return command, self.chat_message(user, text)
+
+	def choose_command(self):
+
+		draw = self.generator.uniform(0, sum(self.weights))
+
+		for command, weight in zip(self.commands, self.weights):
+			if draw < weight:
+				return command
+			draw -= weight
+
+		return self.commands[-1]
+
+	def random_keywords(self):
+
+		return self.generator.sample(KEYWORDS, self.generator.randint(1, 3))
+
+	def chat_message(self, user, text):
+
+		return {'message_id' : self.counter,
+				'from' : {'id' : user, 'is_bot' : False, 'first_name' : 'User'},
+				'chat' : {'id' : user, 'type' : 'private', 'first_name' : 'User'},
+				'date' : int(time.time()),
+				'text' : text}
+
+	## This method returns the callback query of a button below the results of a search (the text is read by find_current_keywords)
+	def callback_query(self, user, keywords, data):
+
+		results_message = self.chat_message(user, u'Your search keywords are:\n' + u' '.join(keywords) + u'\n\n<b>1</b>. ...')
+
+		return {'id' : str(self.counter),
+				'from' : {'id' : user, 'is_bot' : False, 'first_name' : 'User'},
+				'message' : results_message,
+				'chat_instance' : str(user),
+				'data' : data}
+
+## This class samples the connections to the database, while the load is running
+class ConnectionMonitor(object):
+
+	def __init__(self, connection_parameters, interval = 1.):
+
+		self.connection_parameters = connection_parameters
+		self.interval = interval
+		self.samples = []
+		self.stopping = threading.Event()
+		self.monitor_thread = threading.Thread(target = self.work, name = 'ConnectionMonitor')
+		self.monitor_thread.daemon = True
+
+	def start(self):
+
+		self.monitor_thread.start()
+
+	def stop(self):
+
+		self.stopping.set()
+		self.monitor_thread.join()
+
+	def work(self):
+
+		try:
+			connection = psycopg2.connect(**self.connection_parameters)
+		except psycopg2.Error as error:
+			print 'The connections to the database are not monitored: ' + str(error).strip()
+			return None
+
+		connection.autocommit = True
+
+		try:
+			while not self.stopping.wait(self.interval):
+				with connection.cursor() as cursor:
+					cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()")
+					self.samples.append(cursor.fetchone()[0])
+		finally:
+			connection.close()
+
+## This class records the delivery latency of an update, when the last of its messages is done
+class DeliveryTracker(object):
+
+	def __init__(self, command, arrival_time, number_messages):
+
+		self.command = command
+		self.arrival_time = arrival_time
+		self.remaining_messages = number_messages
+		self.is_failed = False
+		self.lock = threading.Lock()
+
+	## This method is the done callback of each message of the update (see send_queue.PendingMessage.add_done_callback)
+	def message_done(self, pending_message):
+
+		with self.lock:
+			self.remaining_messages -= 1
+			self.is_failed = self.is_failed or pending_message.exception != None
+			if self.remaining_messages > 0:
+				return None
+
+		record_latency(delivery_latencies, delivery_failures, self.command, time.time() - self.arrival_time, self.is_failed)
+
+## This function records the latency of a command, and counts it as a failure if needed
+def record_latency(command_latencies, command_failures, command, latency, is_failed):
+
+	with results_lock:
+		command_latencies.setdefault(command, []).append(latency)
+		if is_failed:
+			command_failures[command] = command_failures.get(command, 0) + 1
+
+## This function returns the percentiles of a list of latencies
+def latency_summary(latencies):
+
+	sorted_latencies = sorted(latencies)
+
+	return {'count' : len(sorted_latencies),
+			'p50' : ud.percentile(sorted_latencies, 50),
+			'p95' : ud.percentile(sorted_latencies, 95),
+			'p99' : ud.percentile(sorted_latencies, 99),
+			'max' : sorted_latencies[-1] if len(sorted_latencies) > 0 else 0.}
+
+## This function parses the mix of the commands, given as 'today=40,search=25,...'
+def parse_mix(mix_string):
+
+	command_mix = {}
+
+	for item in mix_string.split(','):
+		command, weight = item.split('=')
+		if command not in COMMAND_MIX:
+			raise ValueError('Unknown command in the mix: ' + command)
+		command_mix[command] = float(weight)
+
+	return command_mix
+
+parser = argparse.ArgumentParser(description = 'Synthetic multi-user load on ArxivBot.handle.')
+parser.add_argument('--details', default = os.path.join(os.path.dirname(__file__), '..', 'Bot', 'Data', 'bot_details.yaml'),
+					help = 'the details file of the Bot (only the database fields are used)')
+parser.add_argument('--users', type = int, default = 100, help = 'number of synthetic users')
+parser.add_argument('--rate', type = float, default = 10., help = 'average number of updates per second')
+parser.add_argument('--duration', type = float, default = 30., help = 'seconds during which the updates arrive')
+parser.add_argument('--workers', type = int, default = 8, help = 'number of workers of the dispatcher (1 is the serial mode)')
+parser.add_argument('--mix', default = ','.join( command + '=' + str(weight) for command, weight in sorted(COMMAND_MIX.items()) ),
+					help = 'weights of the commands')
+parser.add_argument('--telegram-rate', type = float, default = 30., help = 'messages per second sent to Telegram')
+parser.add_argument('--telegram-chat-rate', type = float, default = 1., help = 'messages per second sent to the same chat')
+parser.add_argument('--arxiv-latency', type = float, default = 0.3, help = 'seconds added to each response of the arXiv stand-in')
+parser.add_argument('--arxiv-error-rate', type = float, default = 0., help = 'fraction of 503 responses of the arXiv stand-in')
+parser.add_argument('--rss-entries', type = int, default = 150, help = 'entries of the RSS feeds of the arXiv stand-in')
+parser.add_argument('--seed', type = int, default = 0)
+parser.add_argument('--output', help = 'the JSON file where the report is written')
+arguments = parser.parse_args()
+
+with open(arguments.details, 'r') as file_input:
+	detail = yaml.load(file_input)
+
+stand_in = si.ArxivStandIn(latency = arguments.arxiv_latency, error_rate = arguments.arxiv_error_rate,
+						   rss_entries = arguments.rss_entries, seed = arguments.seed)
+stand_in.start()
+
+bot = RecordingBot('123:load', detail['database_name'], detail['database_user'], detail['database_password'],
+				   db_min_connections = detail.get('database_min_connections', 1),
+				   db_max_connections = detail.get('database_max_connections', 10))
+bot.arxiv_search_link = stand_in.search_link
+bot.arxiv_rss_link = stand_in.rss_link
+bot.arxiv_fair_time = 0
+al.RATE_LIMITER.set_interval(0)
+bot.set_send_queue(sq.SendQueue(bot.send_directly,
+								global_interval = 1. / arguments.telegram_rate,
+								chat_interval = 1. / arguments.telegram_chat_rate,
+								error_function = bot.handle_send_error))
+
+handler_latencies = {}
+handler_failures = {}
+delivery_latencies = {}
+delivery_failures = {}
+results_lock = threading.Lock()
+
+# Each update is submitted together with its command and arrival time
+def handle_timed_update(timed_update):
+
+	command, update, arrival_time = timed_update
+	is_failed = False
+
+	try:
+		pending_messages = bot.handle_and_collect(update)
+	except Exception:
+		pending_messages = []
+		is_failed = True
+
+	latency = time.time() - arrival_time
+	record_latency(handler_latencies, handler_failures, command, latency, is_failed)
+
+	# The updates without queued messages (for example, the edits of a search) are delivered when handled
+	if len(pending_messages) == 0:
+		record_latency(delivery_latencies, delivery_failures, command, latency, is_failed)
+		return None
+
+	tracker = DeliveryTracker(command, arrival_time, len(pending_messages))
+	for pending_message in pending_messages:
+		pending_message.add_done_callback(tracker.message_done)
+
+dispatcher = ud.UpdateDispatcher(handle_timed_update,
+								 lambda timed_update: bot.update_chat_identity(timed_update[1]),
+								 number_workers = arguments.workers)
+monitor = ConnectionMonitor(bot.database_pool.connection_parameters)
+factory = UpdateFactory(arguments.users, parse_mix(arguments.mix), arguments.seed)
+arrivals = random.Random(arguments.seed + 1)
+
+dispatcher.start()
+monitor.start()
+
+start_time = time.time()
+next_arrival = start_time
+submitted = 0
+
+# The updates arrive at random (a Poisson process), whether or not the Bot keeps up
+while True:
+	next_arrival += arrivals.expovariate(arguments.rate)
+	if next_arrival - start_time > arguments.duration:
+		break
+	time.sleep(max(next_arrival - time.time(), 0))
+	command, update = factory.next_update()
+	dispatcher.submit((command, update, time.time()))
+	submitted += 1
+
+dispatcher.stop()
+elapsed_time = time.time() - start_time
+
+monitor.stop()
+dispatcher_statistics = dispatcher.statistics()
+pool_statistics = bot.database_pool.statistics()
+# The send queue is closed after the queued messages are sent, so all the deliveries are recorded
+bot.close()
+stand_in.stop()
+
+handled = sum( len(command_latencies) for command_latencies in handler_latencies.itervalues() )
+report = {'submitted_updates' : submitted,
+		  'handled_updates' : handled,
+		  'elapsed_time' : elapsed_time,
+		  'throughput' : handled / elapsed_time,
+		  'commands' : dict( (command, {'handler' : latency_summary(command_latencies),
+										'delivery' : latency_summary(delivery_latencies.get(command, []))})
+							 for command, command_latencies in handler_latencies.items() ),
+		  'failures' : {'handler' : handler_failures, 'delivery' : delivery_failures},
+		  'dispatcher' : dispatcher_statistics,
+		  'telegram_calls' : bot.telegram_calls,
+		  'arxiv_requests' : stand_in.outcomes,
+		  'database_pool' : pool_statistics,
+		  'database_connections' : {'max' : max(monitor.samples) if len(monitor.samples) > 0 else None,
+									'last' : monitor.samples[-1] if len(monitor.samples) > 0 else None}}
+
+print 'Updates : ' + str(submitted) + ' submitted, ' + str(handled) + ' handled in ' + '%.1f' % elapsed_time + ' s (' + '%.1f' % report['throughput'] + ' per second)'
+for latency, command_failures in [('handler', handler_failures), ('delivery', delivery_failures)]:
+	print '%-16s %8s %10s %10s %10s %10s %9s' % (latency + ' latency', 'count', 'p50 (s)', 'p95 (s)', 'p99 (s)', 'max (s)', 'failures')
+	for command, summaries in sorted(report['commands'].items()):
+		summary = summaries[latency]
+		print '%-16s %8d %10.3f %10.3f %10.3f %10.3f %9d' % (command, summary['count'], summary['p50'], summary['p95'], summary['p99'], summary['max'], command_failures.get(command, 0))
+print 'Dispatcher : median wait ' + '%.3f' % dispatcher_statistics['median_wait'] + ' s, p95 wait ' + '%.3f' % dispatcher_statistics['p95_wait'] + ' s'
+print 'Telegram : ' + str(bot.telegram_calls)
+print 'arXiv stand-in : ' + str(stand_in.outcomes)
+print 'Database pool : ' + str(pool_statistics)
+print 'Database connections : ' + str(report['database_connections'])
+
+if arguments.output != None:
+	with open(arguments.output, 'w') as f:
+		json.dump(report, f, indent = 2, sort_keys = True)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from xml.sax.saxutils import escape
+import datetime as dt
+import random
+
+# This module builds synthetic arXiv feeds (the RSS feed of a category, and the Atom feed of the
+# API), with the same structure of the recorded ones in Tests/Data. The feeds are used by the
+# benchmarks and by the local stand-in of the arXiv, so that they can run offline.
+#
+# The content is random but reproducible: the same seed always gives the same feed.
+
+## The words used to build the titles
+TITLE_WORDS = [u'quantum', u'thermodynamics', u'entanglement', u'channels', u'resource', u'theory', u'bounds',
+			   u'estimation', u'Schr\xf6dinger', u'equation', u'black', u'holes', u'lattice', u'gauge', u'random',
+			   u'matrices', u'neural', u'networks', u'inference', u'dynamical', u'systems', u'$\\alpha$-divergences']
+
+## The names used to build the authors (some with accents, written as character references in the RSS feeds)
+AUTHOR_NAMES = [u'Carlo Sparaciari', u'L\xeddia del Rio', u'Mario Rossi', u'Anna Bianchi', u'Giuseppe Verdi',
+				u'Philippe Faist', u'Nelly Ng', u'Jonathan Oppenheim', u'Bj\xf6rn M\xfcller', u'Zo\xeb Chen']
+
+## The fraction of the RSS entries which are updates of older papers
+UPDATED_FRACTION = 0.3
+
+## The fraction of the entries written by a large collaboration
+COLLABORATION_FRACTION = 0.02
+
+## The header of the RSS feeds (the category is added with format)
+RSS_HEADER = u'''<?xml version="1.0" encoding="UTF-8"?>
+
+<rdf:RDF
+ xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+ xmlns="http://purl.org/rss/1.0/"
+ xmlns:content="http://purl.org/rss/1.0/modules/content/"
+ xmlns:taxo="http://purl.org/rss/1.0/modules/taxonomy/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/"
+ xmlns:syn="http://purl.org/rss/1.0/modules/syndication/"
+ xmlns:admin="http://webns.net/mvcb/"
+>
+
+<channel rdf:about="http://arxiv.org/">
+<title>{0} updates on arXiv.org</title>
+<link>http://arxiv.org/</link>
+<description rdf:parseType="Literal">{0} updates on the arXiv.org e-print archive</description>
+<dc:language>en-us</dc:language>
+<dc:date>{1}</dc:date>
+<dc:publisher>www-admin@arxiv.org</dc:publisher>
+<items>
+ <rdf:Seq>
+'''
+
+## The header of the Atom feeds of the API
+API_HEADER = u'''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title type="html">ArXiv Query: search_query={0}&amp;id_list=&amp;start={1}&amp;max_results={2}</title>
+  <id>http://arxiv.org/api/synthetic</id>
+  <updated>{3}</updated>
+  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{4}</opensearch:totalResults>
+  <opensearch:startIndex xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{1}</opensearch:startIndex>
+  <opensearch:itemsPerPage xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">{2}</opensearch:itemsPerPage>
+'''
+
+## This function returns a random title
+def random_title(generator):
+
+	words = [ generator.choice(TITLE_WORDS) for number in range(generator.randint(4, 14)) ]
+
+	return u' '.join(words).capitalize()
+
+## This function returns a random list of authors
+def random_authors(generator):
+
+	if generator.random() < COLLABORATION_FRACTION:
+		return [ u'Author Number' + unicode(index) for index in range(generator.randint(100, 3000)) ]
+
+	return [ generator.choice(AUTHOR_NAMES) for number in range(generator.randint(1, 8)) ]
+
+## This function returns a random abstract
+def random_abstract(generator):
+
+	return u' '.join( generator.choice(TITLE_WORDS) for number in range(generator.randint(80, 250)) )
+
+## This function writes the non-ASCII characters as character references (as in the RSS feeds of the arXiv)
+def character_references(text):
+
+	return u''.join( character if ord(character) < 128 else u'&#x%x;' % ord(character) for character in text )
+
+## This function returns the identifier of the index-th paper
+def paper_identifier(index):
+
+	return u'1801.%05d' % (index + 1)
+
+## This function returns the RSS feed of a category (UTF-8 encoded), with the given number of entries
+#
+#  @param category The arXiv category of the feed
+#  @param number_entries The number of entries in the feed
+#  @param seed The seed of the random generator (optional, default is 0)
+#  @param feed_date The date of the feed (optional, default is 5 January 2018)
+def rss_feed(category, number_entries, seed = 0, feed_date = dt.date(2018, 1, 5)):
+
+	generator = random.Random(seed)
+	pieces = [RSS_HEADER.format(escape(category), feed_date.strftime('%Y-%m-%dT20:30:00-05:00'))]
+
+	for index in range(number_entries):
+		pieces.append(u'  <rdf:li rdf:resource="http://arxiv.org/abs/' + paper_identifier(index) + u'" />\n')
+
+	pieces.append(u' </rdf:Seq>\n</items>\n</channel>\n')
+
+	for index in range(number_entries):
+		identifier = paper_identifier(index)
+		updated = u' UPDATED' if generator.random() < UPDATED_FRACTION else u''
+		title = random_title(generator) + u'. (arXiv:' + identifier + u'v1 [' + category + u']' + updated + u')'
+		authors = u', '.join( u'<a href="http://arxiv.org/find/' + category + u'/1/au:+' + name.split()[-1] + u'/0/1/0/all/0/1">'
+							  + character_references(name) + u'</a>' for name in random_authors(generator) )
+
+		pieces.append(u'<item rdf:about="http://arxiv.org/abs/' + identifier + u'">\n')
+		pieces.append(u'<title>' + escape(title) + u'</title>\n')
+		pieces.append(u'<link>http://arxiv.org/abs/' + identifier + u'</link>\n')
+		pieces.append(u'<description rdf:parseType="Literal">' + escape(u'<p>' + random_abstract(generator) + u'</p>') + u'\n</description>\n')
+		pieces.append(u'<dc:creator> ' + escape(authors) + u'</dc:creator>\n')
+		pieces.append(u'</item>\n')
+
+	pieces.append(u'</rdf:RDF>\n')
+
+	return u''.join(pieces).encode('utf-8')
+
+## This function returns a page of the Atom feed of the API (UTF-8 encoded)
+#
+#  The entries are numbered from start, and the page stops at total_results.
+#
+#  @param search_query The search query (as in the link of the API)
+#  @param start The index of the first result
+#  @param max_results The maximum number of results in the page
+#  @param total_results The total number of results of the search
+#  @param seed The seed of the random generator (optional, default is 0)
+def api_feed(search_query, start, max_results, total_results, seed = 0):
+
+	number_entries = max(min(max_results, total_results - start), 0)
+	pieces = [API_HEADER.format(escape(search_query), start, max_results, u'2018-01-05T00:00:00-05:00', total_results)]
+
+	for index in range(start, start + number_entries):
+		# Each entry has its own generator, so that the pages of the same search agree
+		generator = random.Random(seed * 1000003 + index)
+		identifier = paper_identifier(index)
+		published = dt.date(2017, 1, 1) + dt.timedelta(days = index % 365)
+
+		pieces.append(u'  <entry>\n')
+		pieces.append(u'    <id>http://arxiv.org/abs/' + identifier + u'v1</id>\n')
+		pieces.append(u'    <published>' + published.strftime('%Y-%m-%d') + u'T15:44:29Z</published>\n')
+		pieces.append(u'    <title>' + escape(random_title(generator)) + u'</title>\n')
+		pieces.append(u'    <summary>' + escape(random_abstract(generator)) + u'</summary>\n')
+		for name in random_authors(generator):
+			pieces.append(u'    <author>\n      <name>' + escape(name) + u'</name>\n    </author>\n')
+		pieces.append(u'    <link href="http://arxiv.org/abs/' + identifier + u'v1" rel="alternate" type="text/html"/>\n')
+		pieces.append(u'  </entry>\n')
+
+	pieces.append(u'</feed>\n')
+
+	return u''.join(pieces).encode('utf-8')
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+import os
+import yaml
+import sys
+sys.path.append(os.path.abspath('Library'))
+import database_pool as dp
+import log_maintenance as lm
+
+# This script runs the maintenance of the chat and error logs of ArXivBot:
+#
+# 1. it creates the monthly partitions of the 'chat' and 'errors' tables for the next months,
+# 2. it aggregates the chat rows of the past days into the 'daily_usage' table,
+# 3. it drops the partitions older than the retention period.
+#
+# The script can be run daily, for example with cron. The retention period (in months) is
+# read from the optional field 'log_retention_months' of the yaml file (default is 12).
+
+# NOTE : The script uses the details of the database stored in the file 'bot_details.yaml',
+#		 and the database has to be migrated first (see migrations.py).
+
+yamlfile_details = 'bot_details.yaml'
+
+with open(os.path.join('Bot', 'Data', yamlfile_details), 'r') as file_input:
+	detail = yaml.load(file_input)
+
+database_pool = dp.DatabasePool({'dbname' : detail['database_name'], 'user' : detail['database_user'], 'password' : detail['database_password']},
+								max_connections = 1)
+
+maintenance_failed = False
+
+try:
+	report = lm.run_maintenance(database_pool, retention_months = detail.get('log_retention_months', 12))
+	print "Partitions created : " + str(report['created_partitions'])
+	print "Days aggregated in daily_usage : " + str(report['aggregated_days'])
+	print "Partitions dropped : " + ', '.join(report['dropped_partitions'])
+except Exception as E:
+	print "ERROR: The maintenance failed."
+	print E
+	maintenance_failed = True
+finally:
+	database_pool.close()
+
+if maintenance_failed:
+	sys.exit(1)
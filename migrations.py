@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+import psycopg2
+import os
+import yaml
+import sys
+sys.path.append(os.path.abspath('Library'))
+import schema_migrations as sm
+
+# This script upgrades the database of ArXivBot to the latest version of the schema.
+# The migrations already applied are recorded in the table 'schema_version', so the
+# script can be run on a new database (created with postgres_script.py) as well as
+# on an existing one, which is upgraded in place.
+#
+# Optionally, the version to be reached can be passed as argument:
+#
+#     python migrations.py [version]
+
+# NOTE : The script uses the details of the database stored in the file 'bot_details.yaml'.
+#		 See the example yaml file in the ./Bot/Data/ folder.
+
+yamlfile_details = 'bot_details.yaml'
+
+with open(os.path.join('Bot', 'Data', yamlfile_details), 'r') as file_input:
+	detail = yaml.load(file_input)
+
+target_version = None
+if len(sys.argv) > 1:
+	target_version = int(sys.argv[1])
+
+try:
+	conn = psycopg2.connect(dbname = detail['database_name'], user = detail['database_user'], password = detail['database_password'])
+	print "Connection to the database established."
+except:
+	print "ERROR: Impossible to connect to the database. Please check the details in the yaml file."
+	sys.exit(1)
+
+def report_migration(version, description):
+	print "Applying migration " + str(version) + " : " + description
+
+migration_failed = False
+
+try:
+	applied_versions = sm.migrate(conn, target_version, report_function = report_migration)
+	if len(applied_versions) == 0:
+		print "The database is already up to date."
+	else:
+		print "The database has been migrated to version " + str(applied_versions[-1]) + "."
+except psycopg2.Error as PGE:
+	print "ERROR: The migration failed, and the database has been left at the previous version."
+	print PGE
+	migration_failed = True
+finally:
+	conn.close()
+
+# The exit status tells the deploy scripts (and cron) whether the migration failed
+if migration_failed:
+	sys.exit(1)
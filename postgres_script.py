@@ -4,18 +4,23 @@ import psycopg2
 import os
 import yaml
 import sys
+sys.path.append(os.path.abspath('Library'))
+import schema_migrations as sm
 
 # This script will create a new user and database, and will create the tables
 # needed for ArXivBot to work in this database. The tables are the following:
 #
 # 1. - Name : preferences
-# 	 - Columns : ( user_identity integer , category text)
+# 	 - Columns : ( user_identity bigint PRIMARY KEY , category text)
 # 2. - Name : feedbacks
-# 	 - Columns : ( message_time timestamp , user_identity integer , comment text )
+# 	 - Columns : ( message_time timestamp , user_identity bigint , comment text )
 # 3. - Name : errors
 # 	 - Columns : (error_time timestamp, user_identity bigint, error_type text, details text)
 # 4. - Name : chat
-# 	 - Columns : (message_time timestamp , user_identity integer, content_type text, content text, query_identity bigint)
+# 	 - Columns : (message_time timestamp , user_identity bigint, content_type text, content text, query_identity bigint)
+#
+# The tables are created by the migrations in Library/schema_migrations.py (see also migrations.py,
+# which upgrades an existing database).
 
 # NOTE 1 : You need to specify the user which can create a new user and a new database on your local server.
 #		   For example, you could use the superuser credentials to do this:
@@ -90,31 +95,16 @@ except:
 	print "ERROR: Impossible to connect to PostgreSQL with the new user. Please check the existing user had privileges to create new users."
 	sys.exit()
 
-new_cur = new_conn.cursor()
-
-# Create the four tables we need.
+# Create the four tables we need, applying all the migrations.
 
 try:
-	sql_command = "CREATE TABLE preferences ( user_identity integer , category text);"
-	new_cur.execute(sql_command)
-	print "Table 'preferences' created."
-	sql_command = "CREATE TABLE feedbacks ( message_time timestamp , user_identity integer , comment text );"
-	new_cur.execute(sql_command)
-	print "Table 'feedbacks' created."
-	sql_command = "CREATE TABLE errors (error_time timestamp, user_identity bigint, error_type text, details text);"
-	new_cur.execute(sql_command)
-	print "Table 'errors' created."
-	sql_command = "CREATE TABLE chat (message_time timestamp , user_identity integer, content_type text, content text, query_identity bigint);"
-	new_cur.execute(sql_command)
-	print "Table 'chat' created."
+	sm.migrate(new_conn)
+	print "Tables created."
 except:
 	print "ERROR: Impossible to create the tables. Please check the privileges of the new user."
-	new_cur.close()
 	new_conn.close()
 	sys.exit()
 
 # Close connection with new user.
 
-new_conn.commit()
-new_cur.close()
 new_conn.close()
\ No newline at end of file